@@ -0,0 +1,256 @@
+"""
+Pipelined capture on asyncio
+
+The synchronous loop polls, parses, dedups, links replies and writes in
+series, so a slow write or a long reply lookup delays the next poll. Here
+each step is a stage with its own task, connected by bounded queues:
+
+  capture -> parse -> dedup -> link -> persist
+
+Capture and persist run their blocking calls in executors (one thread for
+WebDriver, which isn't thread-safe, and one for writes); the middle
+stages run on the event loop thread, so only that thread adds to the
+dedup set and touches the reply index. Capture does read the dedup set
+from the WebDriver thread: per-element extraction skips reply lookups for
+known messages. KnownMessageSet locks around lookups and updates for
+that, and a message added just after capture checked it is still dropped
+by the dedup stage. Capture never waits on a
+full queue: its batches are held in a backlog until the parse queue has
+room, since a blocked capture would let messages scroll out unseen.
+"""
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Passed down the stages to shut them down in order
+_STOP = object()
+
+
+class _Batch:
+    """One capture: raw snapshot items or parsed entries, and whether it anchored"""
+
+    def __init__(self, items, parsed, anchored):
+        self.items = items
+        self.parsed = parsed
+        self.anchored = anchored
+
+
+class _Stage:
+    def __init__(self, name, maxsize):
+        self.name = name
+        self.queue = asyncio.Queue(maxsize)
+        self.processed = 0
+        self.busy = 0.0  # Seconds spent processing
+
+
+class AsyncPipeline:
+    def __init__(self, scraper, scheduler=None, push_mode=False, queue_size=8, push_timeout=5.0,
+                 max_consecutive_errors=5, failover=None, on_messages=None, maintain=None,
+                 report_interval=60.0):
+        """
+        Run a ChatScraper's capture as concurrent stages
+
+        Args:
+            scraper (ChatScraper): Scraper whose driver, dedup set and logs are used
+            scheduler (PollScheduler, optional): Poll interval and error backoff; a
+                default one if None
+            push_mode (bool, optional): Drain the chat observer instead of polling;
+                start_push_capture() must have been called
+            queue_size (int, optional): Batches each queue holds before the stage
+                feeding it waits
+            push_timeout (float, optional): Seconds each observer drain waits
+            max_consecutive_errors (int, optional): Failed captures before failing over
+            failover (callable, optional): Moves the scraper to a new browser and
+                returns the messages it replayed; called with the pipeline drained
+            on_messages (callable, optional): Called with each persisted batch of new
+                messages
+            maintain (callable, optional): Called after every capture, e.g. DriverPool.maintain
+            report_interval (float, optional): Seconds between queue depth reports,
+                None for none
+        """
+        if scheduler is None:
+            from poll_scheduler import PollScheduler
+            scheduler = PollScheduler()
+        self.scraper = scraper
+        self.scheduler = scheduler
+        self.push_mode = push_mode
+        self.push_timeout = push_timeout
+        self.max_consecutive_errors = max_consecutive_errors
+        self.failover = failover
+        self.on_messages = on_messages
+        self.maintain = maintain
+        self.report_interval = report_interval
+
+        self.stages = [_Stage(name, queue_size) for name in ("parse", "dedup", "link", "persist")]
+        self.backlog = deque()  # Captured batches waiting for room in the parse queue
+        self.captures = 0
+        self.consecutive_errors = 0
+        self._stop = None
+        self._driver_executor = None
+        self._io_executor = None
+
+    def depths(self):
+        """
+        Current queue depths
+
+        Returns:
+            dict: Batches waiting for each stage, "capture" being the backlog
+                held back by a full parse queue
+        """
+        depths = {"capture": len(self.backlog)}
+        for stage in self.stages:
+            depths[stage.name] = stage.queue.qsize()
+        return depths
+
+    def report(self):
+        """Print queue depths and time spent per stage"""
+        stages = ", ".join(
+            f"{stage.name} {stage.queue.qsize()} queued/{stage.processed} done/{stage.busy:.1f}s"
+            for stage in self.stages
+        )
+        print(f"Pipeline: {self.captures} captures, {len(self.backlog)} in backlog; {stages}")
+
+    def stop(self):
+        """Ask run() to finish the current capture, drain the stages and return"""
+        if self._stop is not None:
+            self._stop.set()
+
+    async def run(self):
+        """Capture until stop() is called, then wait for every captured message to be written"""
+        self._stop = asyncio.Event()
+        self._driver_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="webdriver")
+        self._io_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="persist")
+        parse, dedup, link, persist = self.stages
+        workers = [
+            asyncio.create_task(self._run_stage(parse, self._parse, dedup)),
+            asyncio.create_task(self._run_stage(dedup, self._dedup, link)),
+            asyncio.create_task(self._run_stage(link, self._link, persist)),
+            asyncio.create_task(self._run_stage(persist, self._persist, None)),
+        ]
+        reporter = asyncio.create_task(self._report_periodically()) if self.report_interval else None
+        try:
+            await self._capture_loop()
+        finally:
+            # Anything already captured still goes through to disk
+            self.backlog.append(_STOP)
+            while self.backlog:
+                await parse.queue.put(self.backlog.popleft())
+            await asyncio.gather(*workers, return_exceptions=True)
+            if reporter is not None:
+                reporter.cancel()
+            self._driver_executor.shutdown(wait=True)
+            self._io_executor.shutdown(wait=True)
+
+    async def _report_periodically(self):
+        while True:
+            await asyncio.sleep(self.report_interval)
+            self.report()
+
+    async def _in_driver(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._driver_executor, func, *args)
+
+    async def _wait(self, seconds):
+        """Sleep, waking early if stop() is called"""
+        try:
+            await asyncio.wait_for(self._stop.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _capture_loop(self):
+        parse = self.stages[0]
+        while not self._stop.is_set():
+            error_delay = None
+            try:
+                if self.push_mode:
+                    items, parsed = await self._in_driver(self.scraper.capture_pushed, self.push_timeout)
+                else:
+                    items, parsed = await self._in_driver(self.scraper.capture)
+                self.captures += 1
+                self.consecutive_errors = 0
+                if items or not self.push_mode:
+                    self.backlog.append(_Batch(items, parsed, self.scraper._anchored))
+            except Exception as e:
+                self.consecutive_errors += 1
+                print(f"Error capturing messages (attempt {self.consecutive_errors}): {str(e)}")
+                error_delay = self.scheduler.error_delay(self.consecutive_errors)
+                if self.consecutive_errors >= self.max_consecutive_errors and self.failover is not None:
+                    await self._failover()
+
+            while self.backlog and not parse.queue.full():
+                parse.queue.put_nowait(self.backlog.popleft())
+            if self.maintain is not None:
+                self.maintain()
+
+            if error_delay is not None:
+                await self._wait(error_delay)
+            elif not self.push_mode:
+                await self._wait(self.scheduler.interval)
+
+    async def drain(self):
+        """Wait until every captured batch has been written"""
+        while self.backlog:
+            await self.stages[0].queue.put(self.backlog.popleft())
+        for stage in self.stages:
+            await stage.queue.join()
+
+    async def _failover(self):
+        print(f"Too many consecutive errors ({self.consecutive_errors}), switching to standby browser...")
+        # Failover replays the scrollback through the scraper directly, so
+        # nothing else may touch its state meanwhile
+        await self.drain()
+        try:
+            replayed = await self._in_driver(self.failover)
+            print(f"Recovered {len(replayed)} messages from scrollback")
+            self.consecutive_errors = 0
+            if replayed and self.on_messages is not None:
+                self.on_messages(replayed)
+        except Exception as e:
+            print(f"Failover failed, will retry: {str(e)}")
+
+    async def _run_stage(self, stage, func, next_stage):
+        while True:
+            batch = await stage.queue.get()
+            try:
+                if batch is _STOP:
+                    if next_stage is not None:
+                        await next_stage.queue.put(_STOP)
+                    return
+                start = time.perf_counter()
+                try:
+                    result = func(batch)
+                    if asyncio.iscoroutine(result):
+                        result = await result
+                except Exception as e:
+                    print(f"Error in {stage.name} stage: {str(e)}")
+                    continue
+                finally:
+                    stage.busy += time.perf_counter() - start
+                stage.processed += 1
+                if result is not None and next_stage is not None:
+                    await next_stage.queue.put(result)
+            finally:
+                stage.queue.task_done()
+
+    def _parse(self, batch):
+        if not batch.parsed:
+            batch.items = self.scraper._entries_from_snapshot(batch.items)
+            batch.parsed = True
+        return batch
+
+    def _dedup(self, batch):
+        unseen = self.scraper._dedup_entries(batch.items)
+        if not self.push_mode:
+            self.scraper._record_poll(len(batch.items), len(unseen), batch.anchored)
+            last_poll = self.scraper.last_poll
+            self.scheduler.record_poll(last_poll["new"], last_poll["seen"], last_poll["anchored"], last_poll["gap"])
+        return unseen or None
+
+    def _link(self, unseen):
+        return self.scraper._link_entries(unseen)
+
+    async def _persist(self, new_messages):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._io_executor, self.scraper._save_to_master_log, new_messages)
+        if self.on_messages is not None:
+            self.on_messages(new_messages)
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+Backfill chat history by scrolling the chat container upward
+
+Live capture only sees what is on screen while the scraper runs. This
+scrolls the container up a page at a time, extracts each page with the
+scraper's own parser and writes the messages that aren't in the master
+log yet, until it reaches history that was already archived (or the top
+of the chat).
+
+Scrolling starts from the newest messages. The first page is the live
+window the scraper already captures, so it is passed over; after that the
+run stops at the first page where every message is already archived,
+which is where the gap ends (or, with no gap, right away).
+
+Backfilled history is older than everything the live scraper appends, so
+it goes to its own log, backfill_<time>.jsonl, never to the master log.
+The log is put in chronological order when a run ends; merge it into the
+master log with chat_logs/merge_sessions.py while the scraper is stopped.
+Records are flagged "backfilled". The chat only shows times, so dates are
+worked out walking back from today, going back a day whenever a message
+is later in the day than the one after it; a quiet spell of a day or more
+can't be seen and leaves older dates a day late.
+
+A checkpoint is saved after every page. An interrupted run can't restore
+the scroll position after a reload, so resuming scrolls back past the
+oldest message the last run reached without stopping there, then carries
+on writing to the same log.
+
+Usage: python backfill.py [--max-pages N] [--page-delay S] [--restart]
+"""
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+from html_snapshot import build_record, link_entry
+from message_ids import digest_to_key, message_digest, record_digest
+from reply_index import ReplyIndex
+from storage import JsonlMessageStore, iter_records, write_records
+
+# Scroll the container up by a fraction of its height. If it is already at
+# the top, report whether older messages loaded in (the height grew).
+BACKFILL_SCROLL_JS = """
+const container = arguments[0];
+const fraction = arguments[1];
+const atTop = container.scrollTop <= 0;
+const height = container.scrollHeight;
+container.scrollTop = Math.max(0, container.scrollTop - container.clientHeight * fraction);
+return {atTop: atTop, height: height, top: container.scrollTop};
+"""
+
+BACKFILL_HEIGHT_JS = "return arguments[0].scrollHeight;"
+
+
+def _minutes(timestamp):
+    """Minutes since midnight of a chat time like "5:03 PM", or None"""
+    try:
+        moment = datetime.strptime(timestamp.strip(), "%I:%M %p")
+    except (AttributeError, ValueError):
+        return None
+    return moment.hour * 60 + moment.minute
+
+
+class Backfiller:
+    def __init__(self, scraper, output_path, checkpoint_path=None, page_delay=1.0, load_timeout=10.0,
+                 scroll_fraction=0.9, max_pages=None, now=None):
+        """
+        Scroll back through a ChatScraper's chat and archive the history it hasn't seen
+
+        Args:
+            scraper (ChatScraper): Logged-in scraper on the chat page; its dedup set
+                tells which messages are archived and is left unchanged
+            output_path (str): JSON Lines log for the backfilled records; a resumed
+                run keeps the one in the checkpoint
+            checkpoint_path (str, optional): Where to save progress, None for no checkpoints
+            page_delay (float, optional): Minimum seconds between pages, to go easy on the site
+            load_timeout (float, optional): Seconds to wait at the top of the container
+                for older messages to load in
+            scroll_fraction (float, optional): Part of the visible height scrolled per
+                page; below 1 so consecutive pages overlap
+            max_pages (int, optional): Stop after this many pages
+            now (datetime, optional): When the newest message was sent by, for
+                dating records; the current time if None
+        """
+        self.scraper = scraper
+        self.output_path = output_path
+        self.checkpoint_path = checkpoint_path
+        self.page_delay = page_delay
+        self.load_timeout = load_timeout
+        self.scroll_fraction = scroll_fraction
+        self.max_pages = max_pages
+
+        self.stats = {"pages": 0, "scanned": 0, "new": 0, "known": 0, "written": 0, "seconds": 0.0}
+        self.stopped_because = None
+        self._seen = set()  # Digests in the backfill log or first seen in this run
+        self._oldest = None  # msg_key of the oldest message reached
+        self._resume_after = None  # msg_key to scroll past before stopping is allowed
+        self._pending = []  # (entry, msg_id, digest) of the page waiting for its older neighbour
+
+        # Walking back from the newest message: the day being read and the
+        # time of the last non-reply message dated
+        now = now or datetime.now()
+        self._day = now.date()
+        self._minutes = now.hour * 60 + now.minute
+        self._dates = {}  # Digest -> (day, minutes) of every message dated so far
+
+        self._store = None
+        self._page_sizes = []  # Records written per page this run, newest page first
+
+    def load_checkpoint(self):
+        """Pick up an unfinished run from the checkpoint, if there is one"""
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return
+        with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+        if checkpoint.get("complete"):
+            return
+        self.output_path = checkpoint.get("output") or self.output_path
+        self._resume_after = checkpoint.get("oldest")
+        if self._resume_after:
+            print(f"Resuming backfill, scrolling back past {self._resume_after} first")
+
+    def save_checkpoint(self, complete=False):
+        if not self.checkpoint_path:
+            return
+        checkpoint = {
+            "updated": time.strftime('%Y-%m-%d %H:%M:%S'),
+            "complete": complete,
+            "output": self.output_path,
+            # An unfinished resume hasn't got any further than the last run
+            "oldest": self._resume_after or self._oldest,
+            "stopped_because": self.stopped_because,
+            "stats": self.stats,
+        }
+        temp_path = f"{self.checkpoint_path}.temp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f, indent=2)
+        os.replace(temp_path, self.checkpoint_path)
+
+    def _container(self):
+        self.scraper._activate()
+        return self.scraper._wait_for_chat_container()
+
+    def scroll_up(self, container):
+        """
+        Scroll one page up
+
+        Returns:
+            bool: False if the container was already at the top and nothing older loaded
+        """
+        driver = self.scraper.driver
+        state = driver.execute_script(BACKFILL_SCROLL_JS, container, self.scroll_fraction)
+        if not state["atTop"]:
+            return True
+        deadline = time.monotonic() + self.load_timeout
+        while time.monotonic() < deadline:
+            time.sleep(0.25)
+            if driver.execute_script(BACKFILL_HEIGHT_JS, container) > state["height"]:
+                return True
+        return False
+
+    def read_page(self, container):
+        """Extract every message currently in the container, oldest first"""
+        scraper = self.scraper
+        if scraper.extraction_mode == "js":
+            try:
+                return scraper._snapshot_messages_js(container)
+            except Exception as e:
+                print(f"JavaScript snapshot failed, falling back to per-element extraction: {str(e)}")
+        return scraper._extract_entries_by_element(container)
+
+    def _load_output(self):
+        """Open the backfill log, remembering what an earlier run already wrote to it"""
+        if os.path.exists(self.output_path):
+            for msg in iter_records(self.output_path):
+                digest = int(msg["msg_key"], 16) if msg.get("msg_key") else record_digest(msg)
+                self._seen.add(digest)
+                day = datetime.strptime(msg["date"], "%Y%m%d").date()
+                self._dates[digest] = (day, None if msg.get("isReply") else _minutes(msg["timestamp"]))
+        self._store = JsonlMessageStore(self.output_path, sidecar=False)
+
+    def _date_page(self, entries, digests):
+        """Date a page's messages, walking back from the newest"""
+        for entry, digest in zip(reversed(entries), reversed(digests)):
+            if digest in self._dates:
+                # Already dated (the overlap with the last page, or a record
+                # from an earlier run), so carry on from there
+                day, minutes = self._dates[digest]
+                self._day = day
+                if minutes is not None:
+                    self._minutes = minutes
+                continue
+            minutes = None
+            if not entry["is_reply"]:
+                # A reply may show the time of the message it quotes
+                minutes = _minutes(entry["timestamp"])
+                if minutes is not None:
+                    if minutes > self._minutes:
+                        self._day -= timedelta(days=1)
+                    self._minutes = minutes
+            self._dates[digest] = (self._day, minutes)
+
+    def process_page(self, entries):
+        """
+        Dedup one page and write the page before it
+
+        Returns:
+            tuple: (new, archived) entry counts for the page
+        """
+        scraper = self.scraper
+        archived = 0
+        unseen = []
+        msg_ids = [scraper._entry_id(entry) for entry in entries]
+        digests = [message_digest(msg_id) for msg_id in msg_ids]
+        self._date_page(entries, digests)
+        for entry, msg_id, digest in zip(entries, msg_ids, digests):
+            if digest in self._seen:
+                continue  # Overlap with the previous page, or already backfilled
+            self._seen.add(digest)
+            if scraper._is_known(digest):
+                archived += 1
+                continue
+            entry = dict(entry, date=self._dates[digest][0].strftime('%Y%m%d'))
+            unseen.append((entry, msg_id, digest))
+
+        if digests:
+            keys = [digest_to_key(digest) for digest in digests]
+            self._oldest = keys[0]
+            if self._resume_after in keys:
+                self._resume_after = None
+
+        self.stats["pages"] += 1
+        self.stats["scanned"] += len(entries)
+        self.stats["new"] += len(unseen)
+        self.stats["known"] += archived
+
+        # A page's replies can point into the next older page, so it is
+        # written only once that page has been read
+        self._write(self._pending, unseen)
+        self._pending = unseen
+        return len(unseen), archived
+
+    def _write(self, page, older_page):
+        if not page:
+            return
+        readable_ids = self.scraper.readable_ids
+        # Local reply index over the two pages, oldest first, so replies
+        # resolve to earlier messages and live state is left alone
+        reply_index = ReplyIndex(self.scraper._generate_message_id)
+        records = []
+        for entry, msg_id, digest in older_page:
+            reply_index.add(build_record(entry, msg_id, digest, readable_ids=readable_ids))
+        for entry, msg_id, digest in page:
+            record = link_entry(entry, msg_id, digest, reply_index, readable_ids)
+            record["backfilled"] = True
+            records.append(record)
+        self._store.append(records)
+        self._page_sizes.append(len(records))
+        self.stats["written"] += len(records)
+
+    def _finish_output(self):
+        """
+        Put the backfill log in chronological order
+
+        Pages are appended newest first, each oldest first, after whatever an
+        earlier run wrote (all of it newer), so reversing the page order
+        restores time order. This reads the backfill log once, which holds
+        only the gap, not the whole history.
+        """
+        self._store.close()
+        if not self._page_sizes:
+            return
+        records = list(iter_records(self.output_path))
+        earlier = len(records) - sum(self._page_sizes)
+        pages = []
+        end = len(records)
+        for size in reversed(self._page_sizes):
+            pages.append(records[end - size:end])
+            end -= size
+        write_records(self.output_path, [msg for page in pages for msg in page] + records[:earlier])
+        self._page_sizes = []
+
+    def run(self):
+        """
+        Backfill until archived history, the top of the chat or max_pages
+
+        Returns:
+            dict: pages, scanned, new, known (already archived), written and
+                seconds, plus messages_per_second and pages_per_second
+        """
+        self.load_checkpoint()
+        self._load_output()
+        start = time.monotonic()
+        try:
+            container = self._container()
+            while True:
+                page_start = time.monotonic()
+                new, archived = self.process_page(self.read_page(container))
+                print(f"Page {self.stats['pages']}: {new} new, {archived} already archived "
+                      f"({self.stats['new']} new so far)")
+
+                # The first page is the live window; below it, a page with
+                # nothing new is history that was already archived
+                if not new and archived and self.stats["pages"] > 1 and self._resume_after is None:
+                    self.stopped_because = "reached archived history"
+                    break
+                if self.max_pages is not None and self.stats["pages"] >= self.max_pages:
+                    self.stopped_because = "max pages"
+                    break
+
+                self.save_checkpoint()
+                if not self.scroll_up(container):
+                    self.stopped_because = "top of chat"
+                    break
+                # Rate limit, counting the time spent reading the page
+                time.sleep(max(0.0, self.page_delay - (time.monotonic() - page_start)))
+        finally:
+            # Nothing older is coming, so the held page can be written
+            self._write(self._pending, [])
+            self._pending = []
+            self._finish_output()
+            self.stats["seconds"] = time.monotonic() - start
+            self.save_checkpoint(complete=self.stopped_because in ("reached archived history", "top of chat"))
+
+        seconds = max(self.stats["seconds"], 1e-9)
+        return dict(self.stats, messages_per_second=self.stats["scanned"] / seconds,
+                    pages_per_second=self.stats["pages"] / seconds)
+
+
+def print_stats(stats, stopped_because):
+    print(f"\nStopped: {stopped_because}")
+    print(f"Pages read: {stats['pages']}")
+    print(f"Messages scanned: {stats['scanned']} ({stats['messages_per_second']:.1f}/s, "
+          f"{stats['pages_per_second']:.2f} pages/s)")
+    print(f"New messages written: {stats['written']}")
+    print(f"Already archived: {stats['known']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill chat history by scrolling the chat upward")
+    parser.add_argument("--max-pages", type=int, default=None, help="Stop after this many pages")
+    parser.add_argument("--page-delay", type=float, default=1.0, help="Minimum seconds between pages")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint of an unfinished run")
+    args = parser.parse_args()
+
+    from chatscraper import ChatScraper
+    from config import GODEL_URL, GODEL_USERNAME, GODEL_PASSWORD, LOG_DIRECTORY
+
+    scraper = ChatScraper(GODEL_URL, GODEL_USERNAME, GODEL_PASSWORD, LOG_DIRECTORY)
+    checkpoint_path = os.path.join(LOG_DIRECTORY, "backfill_checkpoint.json")
+    if args.restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    try:
+        scraper.login()
+        scraper.navigate_to_chat()
+        output_path = os.path.join(LOG_DIRECTORY, f"backfill_{time.strftime('%Y%m%d_%H%M%S')}.jsonl")
+        backfiller = Backfiller(scraper, output_path, checkpoint_path, page_delay=args.page_delay,
+                                max_pages=args.max_pages)
+        stats = backfiller.run()
+        print_stats(stats, backfiller.stopped_because)
+        if stats["written"]:
+            print(f"Backfilled messages are in {backfiller.output_path}; with the scraper stopped, merge them "
+                  f"with: python chat_logs/merge_sessions.py {scraper.master_log} {backfiller.output_path} "
+                  f"-o <merged log>")
+    except KeyboardInterrupt:
+        print("\nBackfill interrupted, run again to resume")
+    finally:
+        scraper.close()
+
+
+if __name__ == "__main__":
+    main()
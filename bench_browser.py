@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Measure the memory and CPU of a capture browser under each profile
+
+Starts Chrome with the default and the lean profile in turn, loads the
+chat, waits for it to settle and then samples the whole browser process
+tree (chromedriver, Chrome and its renderer/GPU/utility children) for a
+while. Reads /proc, so it runs on Linux only.
+
+Usage: python bench_browser.py [--url URL] [--settle S] [--seconds S] [--headless]
+"""
+import argparse
+import os
+import time
+
+from browser_profile import PROFILES, chrome_profile, start_chrome
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+
+def _process_stats():
+    """pid -> (parent pid, CPU seconds, RSS bytes) for every process"""
+    stats = {}
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat") as f:
+                # The command name can contain spaces, fields start after it
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        ppid = int(fields[1])
+        cpu = (int(fields[11]) + int(fields[12])) / _CLOCK_TICKS
+        rss = int(fields[21]) * _PAGE_SIZE
+        stats[int(name)] = (ppid, cpu, rss)
+    return stats
+
+
+def tree_usage(root_pid):
+    """
+    Total CPU seconds and RSS of a process and all its descendants
+
+    Returns:
+        tuple: (cpu seconds, rss bytes, process count)
+    """
+    stats = _process_stats()
+    children = {}
+    for pid, (ppid, _, _) in stats.items():
+        children.setdefault(ppid, []).append(pid)
+    cpu = rss = count = 0
+    pending = [root_pid]
+    while pending:
+        pid = pending.pop()
+        if pid not in stats:
+            continue
+        cpu += stats[pid][1]
+        rss += stats[pid][2]
+        count += 1
+        pending.extend(children.get(pid, []))
+    return cpu, rss, count
+
+
+def measure(profile, url, headless, settle, seconds):
+    driver = start_chrome(chrome_profile(profile, headless))
+    try:
+        root = driver.service.process.pid
+        driver.get(url)
+        time.sleep(settle)
+
+        cpu_start, _, _ = tree_usage(root)
+        peak_rss = 0
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            _, rss, processes = tree_usage(root)
+            peak_rss = max(peak_rss, rss)
+            time.sleep(1)
+        cpu_end, rss, processes = tree_usage(root)
+        return {"rss": rss, "peak_rss": peak_rss, "cpu_percent": (cpu_end - cpu_start) / seconds * 100,
+                "processes": processes}
+    finally:
+        driver.quit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default=None, help="Page to load (default: GODEL_URL from config.py)")
+    parser.add_argument("--settle", type=float, default=20.0, help="Seconds to let the page load first")
+    parser.add_argument("--seconds", type=float, default=60.0, help="Seconds to sample for")
+    parser.add_argument("--headless", action="store_true", help="Run both profiles headless")
+    args = parser.parse_args()
+
+    url = args.url
+    if url is None:
+        from config import GODEL_URL
+        url = GODEL_URL
+
+    print(f"{'profile':<8} {'RSS MB':>8} {'peak MB':>8} {'CPU %':>7} {'procs':>6}")
+    for profile in PROFILES:
+        usage = measure(profile, url, args.headless, args.settle, args.seconds)
+        print(f"{profile:<8} {usage['rss'] / 1e6:>8.0f} {usage['peak_rss'] / 1e6:>8.0f} "
+              f"{usage['cpu_percent']:>7.1f} {usage['processes']:>6}")
+
+
+if __name__ == "__main__":
+    main()
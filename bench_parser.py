@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark offline parsing of saved chat HTML, no browser needed
+
+Builds synthetic chat containers of increasing size from the message
+elements in saved snapshots (each copy given different text so nothing is
+deduplicated) and times html_snapshot.parse_snapshot on them.
+
+Usage: python bench_parser.py [snapshot ...] [--messages N ...]
+"""
+import argparse
+import html as html_escape
+import os
+import time
+
+from html_snapshot import PRIMARY_CLASS, entries_from_items, extract_item, find_message_nodes, parse_html, parse_snapshot
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SNAPSHOTS = [
+    os.path.join(SCRIPT_DIR, "chathtml.txt"),
+    os.path.join(SCRIPT_DIR, "chat_logs", "examplemsg6-17-25.txt"),
+]
+
+CONTAINER_OPEN = ('<div class="absolute flex bg-[#121212] flex-col top-[50px] right-0 left-0 bottom-0 pt-[10px] '
+                  'px-[10px] m-0 overflow-x-hidden overflow-y-scroll">')
+
+
+def to_html(node):
+    """Serialize a parsed Node back to HTML"""
+    if isinstance(node, str):
+        return html_escape.escape(node, quote=False)
+    attrs = "".join(f' {name}="{html_escape.escape(value)}"' for name, value in node.attrs.items())
+    children = "".join(to_html(child) for child in node.children)
+    return f"<{node.tag}{attrs}>{children}</{node.tag}>"
+
+
+def message_templates(paths):
+    """
+    Outer HTML of each complete message in the snapshots, with a {n} slot in its text
+
+    The primary and fallback selectors can't be mixed in one container (the
+    fallback is only used when nothing matches the primary one), so only
+    messages of the more common kind are returned.
+    """
+    templates = {True: [], False: []}
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            root = parse_html(f.read())
+        for node in find_message_nodes(root):
+            entries = entries_from_items([extract_item(node)])
+            message = to_html(node)
+            content = html_escape.escape(entries[0]["content"], quote=False) if entries else None
+            # A message cut off at the end of a snapshot has no text of its own
+            if content and content in message:
+                # Message IDs only use the start of the text, so that's where the number goes
+                message = message.replace(content, "#{n} " + content, 1)
+                templates[PRIMARY_CLASS in node.get("class")].append(message)
+    return max(templates.values(), key=len)
+
+
+def build_container(templates, count):
+    parts = [CONTAINER_OPEN]
+    for n in range(count):
+        parts.append(templates[n % len(templates)].replace("{n}", str(n)))
+    parts.append("</div>")
+    return "".join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("snapshots", nargs="*", help="Saved chat HTML to take messages from")
+    parser.add_argument("--messages", type=int, nargs="+", default=[100, 1000, 10000],
+                        help="Messages per synthetic container")
+    args = parser.parse_args()
+
+    templates = message_templates(args.snapshots or DEFAULT_SNAPSHOTS)
+    if not templates:
+        print("No complete messages found in the snapshots")
+        return
+    print(f"{len(templates)} message templates")
+
+    print(f"{'messages':>9} {'KB':>8} {'parse ms':>9} {'msgs/s':>9} {'MB/s':>6}")
+    for count in args.messages:
+        html = build_container(templates, count)
+        start = time.perf_counter()
+        records = parse_snapshot(html)
+        seconds = time.perf_counter() - start
+        assert len(records) == count, f"parsed {len(records)} of {count} messages"
+        print(f"{count:>9} {len(html) / 1e3:>8.0f} {seconds * 1000:>9.1f} {count / seconds:>9.0f} "
+              f"{len(html) / 1e6 / seconds:>6.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Benchmark reply resolution: the old linear scan against ReplyIndex
+
+Replays reply lookups built from a chat log and checks that both
+approaches return identical message IDs.
+
+Usage: python bench_reply_index.py [log_file]
+"""
+import glob
+import os
+import random
+import sys
+import time
+
+from reply_index import ReplyIndex
+from storage import load_records
+from ticker_normalizer import remove_ticker_content
+
+
+def generate_message_id(timestamp, username, content):
+    return f"{timestamp}_{username}_{remove_ticker_content(content)[:50]}"
+
+
+def linear_find_reply_msg_id(lookup, replied_to_username, preview_text):
+    """The original ChatScraper._find_reply_msg_id scan"""
+    if not replied_to_username or replied_to_username not in lookup:
+        return None
+    user_messages = lookup[replied_to_username]
+    if preview_text:
+        preview_clean = preview_text.strip().lower()
+        for msg in reversed(user_messages):
+            content = msg.get("content", "").strip().lower()
+            if preview_clean in content or content.startswith(preview_clean):
+                return generate_message_id(msg.get("timestamp", ""), msg.get("username", ""), msg.get("content", ""))
+    if user_messages:
+        latest_msg = user_messages[-1]
+        return generate_message_id(latest_msg.get("timestamp", ""), latest_msg.get("username", ""), latest_msg.get("content", ""))
+    return None
+
+
+def build_queries(lookup, count, rng):
+    """Reply previews: mostly message prefixes, some mid-content and some misses"""
+    users = [user for user, msgs in lookup.items() if msgs]
+    weights = [len(lookup[user]) for user in users]
+    queries = []
+    for _ in range(count):
+        user = rng.choices(users, weights)[0]
+        msgs = lookup[user]
+        # Replies usually point at recent messages
+        msg = msgs[max(0, len(msgs) - 1 - int(rng.expovariate(1 / 50)))]
+        content = msg.get("content", "")
+        kind = rng.random()
+        if kind < 0.7:
+            preview = content[:rng.randint(5, 60)]
+        elif kind < 0.9:
+            start = rng.randint(0, max(0, len(content) - 5))
+            preview = content[start:start + rng.randint(5, 30)]
+        else:
+            preview = "no such message %d" % rng.randint(0, 10 ** 6)
+        queries.append((user, preview))
+    return queries
+
+
+def interleaved(records, scale, rng):
+    """
+    Live use: each new message is indexed and then a lookup runs
+
+    The log is replicated `scale` times (with distinct content) to show how
+    the cost per add+lookup grows with history size.
+    """
+    history = [
+        dict(msg, content=f"{msg.get('content', '')} #{rep}")
+        for rep in range(scale) for msg in records
+    ]
+    live, history = history[-500:], history[:-500]
+
+    lookup = {}
+    index = ReplyIndex(generate_message_id)
+    for msg in history:
+        index.add(msg)
+        lookup.setdefault(msg["username"], []).append(msg)
+    queries = build_queries(lookup, len(live), rng)
+
+    start = time.perf_counter()
+    actual = []
+    for msg, (user, preview) in zip(live, queries):
+        index.add(msg)
+        actual.append(index.find_reply_msg_id(user, preview))
+    index_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    expected = []
+    for msg, (user, preview) in zip(live, queries):
+        lookup.setdefault(msg["username"], []).append(msg)
+        expected.append(linear_find_reply_msg_id(lookup, user, preview))
+    linear_time = time.perf_counter() - start
+
+    mismatches = sum(1 for a, b in zip(expected, actual) if a != b)
+    print(f"Interleaved, {len(history) + len(live)} messages: linear {linear_time * 1000:.1f} ms, "
+          f"ReplyIndex {index_time * 1000:.1f} ms for {len(live)} add+lookup, {mismatches} mismatches")
+    return mismatches
+
+
+def main():
+    if len(sys.argv) > 1:
+        log_file = sys.argv[1]
+    else:
+        log_file = max(glob.glob(os.path.join("chat_logs", "session_*.json*")), key=os.path.getsize)
+
+    records = [msg for msg in load_records(log_file) if msg.get("username")]
+    print(f"Loaded {len(records)} messages from {log_file}")
+
+    lookup = {}
+    index = ReplyIndex(generate_message_id)
+    start = time.perf_counter()
+    for msg in records:
+        index.add(msg)
+    build_time = time.perf_counter() - start
+    for msg in records:
+        lookup.setdefault(msg["username"], []).append(msg)
+
+    queries = build_queries(lookup, 5000, random.Random(42))
+
+    start = time.perf_counter()
+    expected = [linear_find_reply_msg_id(lookup, user, preview) for user, preview in queries]
+    linear_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = [index.find_reply_msg_id(user, preview) for user, preview in queries]
+    index_time = time.perf_counter() - start
+
+    mismatches = sum(1 for a, b in zip(expected, actual) if a != b)
+    print(f"Index build:  {build_time * 1000:.1f} ms")
+    print(f"Linear scan:  {linear_time * 1000:.1f} ms for {len(queries)} lookups")
+    print(f"ReplyIndex:   {index_time * 1000:.1f} ms for {len(queries)} lookups")
+    print(f"Speedup:      {linear_time / index_time:.1f}x")
+    print(f"Mismatches:   {mismatches}")
+
+    for scale in (1, 4):
+        mismatches += interleaved(records, scale, random.Random(scale))
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
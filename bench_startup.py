@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Benchmark scraper startup: loading the whole master log against the saved index
+
+Builds synthetic master logs of increasing size from a real chat log (the
+same messages repeated on later dates) and times what ChatScraper does
+before its first poll:
+
+  full load  the old path, every record parsed into memory and indexed
+  cold       no saved dedup set yet, rebuilt from the sidecar index's digests
+  warm       saved index plus the recent tail, the normal restart path
+
+Usage: python bench_startup.py [log_file] [--records N ...]
+"""
+import argparse
+import glob
+import os
+import shutil
+import tempfile
+import time
+from collections import deque
+
+from log_index import load_startup_state
+from message_ids import KnownMessageSet, digest_to_key, generate_message_id, message_digest, record_digest
+from reply_index import ReplyIndex
+from storage import JsonlMessageStore, iter_records, load_records
+
+
+def build_log(path, source, count):
+    """Write count records cycling through source, each cycle on a new date"""
+    store = JsonlMessageStore(path, fsync_batch=10 ** 9)
+    batch = []
+    written = 0
+    day = 0
+    while written < count:
+        for msg in source:
+            if written >= count:
+                break
+            msg = dict(msg, date=f"{20250101 + day}")
+            msg_id = generate_message_id(msg["timestamp"], msg["username"], msg["content"] + str(day))
+            msg["msg_key"] = digest_to_key(message_digest(msg_id))
+            batch.append(msg)
+            written += 1
+            if len(batch) >= 10000:
+                store.append(batch)
+                batch = []
+        day += 1
+    store.append(batch)
+    store.close()
+
+
+def full_load(path):
+    """The original _load_master_log: parse everything, index everything"""
+    known = KnownMessageSet()
+    replies = ReplyIndex(generate_message_id, max_messages_per_user=5000)
+    recent = deque(maxlen=50000)
+    records = load_records(path)
+    for msg in records:
+        digest = record_digest(msg)
+        if digest is not None:
+            known.add(digest)
+            replies.add(msg)
+    recent.extend(records)
+    return known
+
+
+def indexed_load(path):
+    store = JsonlMessageStore(path)
+    replies = ReplyIndex(generate_message_id, max_messages_per_user=5000)
+    known, _, _ = load_startup_state(store, f"{path}.known", KnownMessageSet(), replies, deque(maxlen=50000))
+    return known
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return (time.perf_counter() - start) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("log_file", nargs="?", help="Chat log to take messages from (default: largest session log)")
+    parser.add_argument("--records", type=int, nargs="+", default=[20000, 100000, 400000],
+                        help="Synthetic master log sizes to test")
+    args = parser.parse_args()
+
+    log_file = args.log_file
+    if log_file is None:
+        logs = glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "chat_logs", "session_*.json"))
+        log_file = max(logs, key=os.path.getsize)
+    source = list(iter_records(log_file))
+    print(f"Messages from {log_file} ({len(source)} records)")
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        print(f"{'records':>9} {'MB':>7} {'full load':>11} {'cold':>9} {'warm':>9}")
+        for count in args.records:
+            path = os.path.join(temp_dir, f"MASTER_LOG_{count}.jsonl")
+            build_log(path, source, count)
+
+            full_ms, _ = timed(full_load, path)
+            cold_ms, cold_known = timed(indexed_load, path)
+            warm_ms, warm_known = timed(indexed_load, path)
+
+            # The restored set has to know every message in the log
+            for msg in iter_records(path):
+                assert record_digest(msg) in warm_known
+            assert len(warm_known) == len(cold_known)
+
+            print(f"{count:>9} {os.path.getsize(path) / 1e6:>7.1f} {full_ms:>9.0f}ms {cold_ms:>7.0f}ms {warm_ms:>7.0f}ms")
+            for suffix in ("", ".known", ".idx", ".idx.heads"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for ticker normalization
+
+Compares ticker_normalizer.remove_ticker_content with the original
+four-pass implementation over every message in the session logs and
+checks that they agree. With --update-golden, rewrites the golden corpus
+used by test_ticker.py from the session logs.
+
+Usage: python bench_ticker.py [--update-golden]
+"""
+import glob
+import json
+import os
+import sys
+import time
+
+from storage import load_records
+from ticker_normalizer import remove_ticker_content
+from ticker_reference import GOLDEN_FILE, legacy_remove_ticker_content
+
+
+def load_contents():
+    """Message contents from every session log, in log order"""
+    contents = []
+    for log_file in sorted(glob.glob(os.path.join("chat_logs", "session_*.json*"))):
+        contents.extend(msg.get("content", "") for msg in load_records(log_file))
+    return contents
+
+
+def update_golden(contents):
+    """Write every distinct ticker-bearing message plus a sample of plain ones"""
+    ticker_contents = sorted({c for c in contents if '\n' in c and '%' in c})
+    plain_contents = sorted({c for c in contents if not ('\n' in c and '%' in c)})[::100]
+    corpus = [
+        {"content": c, "normalized": legacy_remove_ticker_content(c)}
+        for c in ticker_contents + plain_contents
+    ]
+    with open(GOLDEN_FILE, 'w', encoding='utf-8') as f:
+        json.dump(corpus, f, indent=1, ensure_ascii=False)
+    print(f"Wrote {len(corpus)} golden cases to {GOLDEN_FILE}")
+
+
+def main():
+    contents = load_contents()
+    if "--update-golden" in sys.argv:
+        update_golden(contents)
+        return
+
+    print(f"Normalizing {len(contents)} messages")
+
+    start = time.perf_counter()
+    expected = [legacy_remove_ticker_content(c) for c in contents]
+    legacy_time = time.perf_counter() - start
+
+    remove_ticker_content.cache_clear()
+    start = time.perf_counter()
+    actual = [remove_ticker_content.__wrapped__(c) for c in contents]
+    single_pass_time = time.perf_counter() - start
+
+    # The scraper normalizes the same recent messages again on every poll
+    # and reply lookup, which is what the memo is for
+    recent = contents[-2000:] * 10
+    start = time.perf_counter()
+    for c in recent:
+        remove_ticker_content.__wrapped__(c)
+    recent_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    memo_actual = [remove_ticker_content(c) for c in recent]
+    memo_time = time.perf_counter() - start
+
+    mismatches = sum(1 for a, b in zip(expected, actual) if a != b)
+    mismatches += sum(1 for a, b in zip(expected[-2000:] * 10, memo_actual) if a != b)
+    print(f"Four-pass re.sub:     {legacy_time * 1000:.1f} ms")
+    print(f"Single pass:          {single_pass_time * 1000:.1f} ms")
+    print(f"Recent x10, no memo:  {recent_time * 1000:.1f} ms")
+    print(f"Recent x10, memo:     {memo_time * 1000:.1f} ms ({remove_ticker_content.cache_info()})")
+    print(f"Mismatches:           {mismatches}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
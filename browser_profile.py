@@ -0,0 +1,133 @@
+"""
+Chrome launch profiles for capture
+
+The Godel terminal is a full trading GUI, with charts, news and quote
+panels loading images, fonts, media and market data that the scraper
+never looks at. The "lean" profile runs Chrome in the new headless mode
+with those resource types blocked, GPU and extensions off and a smaller
+window, so each browser (including standbys) costs less memory and CPU.
+The chat itself is plain text and isn't affected.
+
+Selenium is only imported by start_chrome(), so the profile can be
+inspected and tested without a browser. ChatScraper.create_driver() and
+bench_browser.py both start Chrome through it.
+"""
+
+PROFILES = ("default", "lean")
+
+DEFAULT_WINDOW_SIZE = (900, 800)
+LEAN_WINDOW_SIZE = (800, 600)
+
+LEAN_ARGUMENTS = [
+    "--disable-gpu",
+    "--disable-extensions",
+    "--disable-component-extensions-with-background-pages",
+    "--disable-default-apps",
+    "--disable-component-update",
+    "--disable-features=Translate,MediaRouter,OptimizationHints",
+    "--no-first-run",
+    "--mute-audio",
+    "--autoplay-policy=user-gesture-required",
+    "--blink-settings=imagesEnabled=false",
+]
+
+# Content settings: 2 blocks the content type
+LEAN_PREFS = {
+    "profile.managed_default_content_settings.images": 2,
+    "profile.managed_default_content_settings.media_stream": 2,
+    "profile.managed_default_content_settings.notifications": 2,
+    "profile.managed_default_content_settings.geolocation": 2,
+}
+
+# Requests blocked through the DevTools protocol. Fonts and media have no
+# content setting, so they are blocked by extension here.
+LEAN_BLOCKED_URLS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.mp3", "*.mp4", "*.webm", "*.ogg", "*.wav", "*.m3u8",
+]
+
+
+def chrome_profile(profile="default", headless=False, window_size=None, blocked_urls=None, performance_log=False):
+    """
+    Chrome options for a capture profile
+
+    Args:
+        profile (str, optional): "default" for the original settings, "lean" for
+            the reduced capture profile
+        headless (bool, optional): Run without a window; the lean profile uses
+            Chrome's new headless mode, which renders like a normal window
+        window_size (tuple, optional): (width, height), or None for the profile's size
+        blocked_urls (list, optional): Extra URL patterns to block, e.g. the market
+            data endpoints of panels other than the chat ("*" is a wildcard)
+        performance_log (bool, optional): Record DevTools network events, including
+            WebSocket frames, in the "performance" log for network capture
+
+    Returns:
+        dict: "arguments" (command line switches), "prefs" (Chrome preferences),
+            "blocked_urls" (patterns for Network.setBlockedURLs), "capabilities"
+            and "experimental" (other ChromeOptions experimental options)
+    """
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown browser profile {profile!r}, expected one of {', '.join(PROFILES)}")
+    lean = profile == "lean"
+
+    arguments = []
+    if headless:
+        arguments.append("--headless=new" if lean else "--headless")
+    if window_size is None:
+        window_size = LEAN_WINDOW_SIZE if lean else DEFAULT_WINDOW_SIZE
+    arguments.append(f"--window-size={window_size[0]},{window_size[1]}")
+
+    prefs = {}
+    blocked = []
+    if lean:
+        arguments.extend(LEAN_ARGUMENTS)
+        prefs.update(LEAN_PREFS)
+        blocked.extend(LEAN_BLOCKED_URLS)
+    blocked.extend(blocked_urls or [])
+
+    capabilities = {}
+    experimental = {}
+    if performance_log:
+        capabilities["goog:loggingPrefs"] = {"performance": "ALL"}
+        experimental["perfLoggingPrefs"] = {"enableNetwork": True, "enablePage": False}
+
+    return {"arguments": arguments, "prefs": prefs, "blocked_urls": blocked, "capabilities": capabilities,
+            "experimental": experimental}
+
+
+def start_chrome(options):
+    """
+    Start Chrome with options built by chrome_profile()
+
+    Request blocking is set up through the DevTools protocol once the
+    browser is running; if that fails Chrome is used without it.
+
+    Args:
+        options (dict): Options returned by chrome_profile()
+
+    Returns:
+        WebDriver: The new browser
+    """
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+
+    chrome_options = Options()
+    for argument in options["arguments"]:
+        chrome_options.add_argument(argument)
+    if options["prefs"]:
+        chrome_options.add_experimental_option("prefs", options["prefs"])
+    for name, value in options["experimental"].items():
+        chrome_options.add_experimental_option(name, value)
+    for name, value in options["capabilities"].items():
+        chrome_options.set_capability(name, value)
+    driver = webdriver.Chrome(options=chrome_options)
+
+    if options["blocked_urls"]:
+        try:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": options["blocked_urls"]})
+        except Exception as e:
+            print(f"Could not set up request blocking: {str(e)}")
+    return driver
@@ -1,28 +1,22 @@
 #!/usr/bin/env python3
-import json
+import argparse
 import os
 import shutil
-import re
 from datetime import datetime
 import sys
 
+# Share the ticker normalizer with the scraper in the parent directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ticker_normalizer import remove_ticker_content
+from storage import RecordWriter, iter_records
+from message_ids import generate_message_id, message_digest
+
 def normalize_message_content(content):
     """
     Remove ticker content (data between newline and percentage sign) from message
-    This mimics the _remove_ticker_content method in chatscraper.py
+    using the same normalizer as chatscraper.py
     """
-    if '\n' in content and '%' in content:
-        # Match standard tickers
-        pattern = r'([A-Z]+)\n[+-]?\d+\.?\d*%'
-        # Match patterns with delayed tickers like "VIX (D)\n-5.23%"
-        pattern_with_delay = r'([A-Z]+\s*\([A-Z]\))\n[+-]?\d+\.?\d*%'
-        
-        # Replace price data with placeholder
-        cleaned_content = re.sub(pattern, r'\1\n[PRICE]%', content)
-        cleaned_content = re.sub(pattern_with_delay, r'\1\n[PRICE]%', cleaned_content)
-        return cleaned_content
-    
-    return content
+    return remove_ticker_content(content)
 
 def normalize_message_id(msg_id, content):
     """
@@ -44,14 +38,114 @@ def normalize_message_id(msg_id, content):
     # Create normalized ID using first 20 chars of normalized content
     return f"{base_id}{normalized_content[:20]}"
 
-def remove_duplicates(log_file="MASTER_LOG.json"):
+def record_norm_id(msg):
+    """
+    Return the normalized ID used to detect duplicates of a record, or None
+
+    Records written with readable IDs turned off only carry msg_key, so
+    their readable ID is rebuilt from the timestamp, username and content.
+    """
+    original_id = msg.get("msg_id")
+    content = msg.get("content", "")
+    if not original_id and msg.get("msg_key"):
+        original_id = generate_message_id(msg.get("timestamp", ""), msg.get("username", ""), content)
+    if not original_id:
+        return None
+    return normalize_message_id(original_id, content)
+
+def dedup_streams(input_paths, output_path, max_examples=5):
+    """
+    Stream records from one or more logs into a single deduplicated log
+
+    Records are read one at a time and written as soon as they are known to
+    be new, so only the 8-byte digests of the normalized IDs seen so far are
+    held in memory, not the records themselves. Inputs are read in the
+    order given and the first occurrence of each message wins. The output
+    may be one of the inputs; it is only replaced once everything has been
+    written.
+
+    Args:
+        input_paths (list): Logs to read, JSON array or JSON Lines
+        output_path (str): Log to write, JSON Lines if it ends in .jsonl
+        max_examples (int, optional): Number of duplicates kept for reporting
+
+    Returns:
+        dict: "inputs" maps each input path to its read/kept/duplicates counts,
+            plus totals and a few example duplicates
+    """
+    seen_digests = set()
+    stats = {"inputs": {}, "read": 0, "kept": 0, "duplicates": 0, "examples": []}
+
+    with RecordWriter(output_path) as writer:
+        for path in input_paths:
+            file_stats = {"read": 0, "kept": 0, "duplicates": 0}
+            stats["inputs"][path] = file_stats
+
+            for msg in iter_records(path):
+                file_stats["read"] += 1
+                norm_id = record_norm_id(msg)
+
+                if norm_id is None:
+                    # Keep messages without IDs (shouldn't happen, but just in case)
+                    print(f"Warning: Message without ID found: {msg}")
+                else:
+                    digest = message_digest(norm_id)
+                    if digest in seen_digests:
+                        # This is a duplicate, track for reporting
+                        file_stats["duplicates"] += 1
+                        if len(stats["examples"]) < max_examples:
+                            stats["examples"].append(msg)
+                        continue
+                    seen_digests.add(digest)
+
+                writer.write(msg)
+                file_stats["kept"] += 1
+
+            for key in ("read", "kept", "duplicates"):
+                stats[key] += file_stats[key]
+
+    return stats
+
+def print_stats(stats):
+    """Print a summary of a dedup_streams run"""
+    if len(stats["inputs"]) > 1:
+        for path, file_stats in stats["inputs"].items():
+            print(f"  {path}: {file_stats['read']} read, {file_stats['kept']} kept, "
+                  f"{file_stats['duplicates']} duplicates")
+
+    print(f"Deduplication complete!")
+    print(f"Original message count: {stats['read']}")
+    print(f"New message count: {stats['kept']}")
+    print(f"Duplicates removed: {stats['duplicates']}")
+
+    # Print some examples of duplicates if any were found
+    if stats["examples"]:
+        print(f"\nExamples of duplicates removed:")
+        for i, dup in enumerate(stats["examples"]):
+            print(f"  {i+1}. {dup.get('timestamp', '')} - {dup.get('username', '')}: {dup.get('content', '')[:50]}...")
+
+        if stats["duplicates"] > len(stats["examples"]):
+            print(f"  ... and {stats['duplicates'] - len(stats['examples'])} more.")
+
+    if stats["read"]:
+        print(f"\nSuccess rate: {(stats['duplicates'] / stats['read'] * 100):.2f}% of messages were duplicates")
+
+def resolve_log_path(log_file):
+    """Resolve a log file given on the command line, falling back to this directory"""
+    if os.path.exists(log_file):
+        return log_file
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(script_dir, log_file)
+
+def remove_duplicates(log_file="MASTER_LOG.jsonl"):
     """
     Remove duplicate messages from the master log file based on normalized message ID.
     Creates a backup of the original file before making changes.
+    Works on the JSON Lines master log or an old JSON-array log, and writes
+    the result back in the same format, streaming so memory use doesn't grow
+    with the size of the log.
     """
-    # Get the absolute path to the log file
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    log_path = os.path.join(script_dir, log_file)
+    log_path = resolve_log_path(log_file)
     
     if not os.path.exists(log_path):
         print(f"Error: {log_file} not found at {log_path}")
@@ -65,62 +159,7 @@ def remove_duplicates(log_file="MASTER_LOG.json"):
         shutil.copy2(log_path, backup_file)
         print(f"Created backup at: {backup_file}")
         
-        # Read the original file
-        with open(log_path, 'r') as f:
-            data = json.load(f)
-        
-        original_count = len(data)
-        print(f"Original message count: {original_count}")
-        
-        # Track seen normalized message IDs and keep only first occurrence
-        seen_norm_ids = set()
-        unique_messages = []
-        duplicates = []
-        
-        for msg in data:
-            if "msg_id" not in msg or not msg["msg_id"]:
-                # Keep messages without IDs (shouldn't happen, but just in case)
-                print(f"Warning: Message without ID found: {msg}")
-                unique_messages.append(msg)
-                continue
-                
-            # Get original ID and content
-            original_id = msg["msg_id"]
-            content = msg.get("content", "")
-            
-            # Create normalized ID for duplicate detection
-            norm_id = normalize_message_id(original_id, content)
-            
-            if norm_id not in seen_norm_ids:
-                seen_norm_ids.add(norm_id)
-                unique_messages.append(msg)
-            else:
-                # This is a duplicate, track for reporting
-                duplicates.append(msg)
-        
-        # Write the deduplicated data back to the file
-        with open(log_path, 'w') as f:
-            json.dump(unique_messages, f, indent=2)
-        
-        new_count = len(unique_messages)
-        duplicates_removed = original_count - new_count
-        
-        print(f"Deduplication complete!")
-        print(f"Original message count: {original_count}")
-        print(f"New message count: {new_count}")
-        print(f"Duplicates removed: {duplicates_removed}")
-        
-        # Print some examples of duplicates if any were found
-        if duplicates:
-            print(f"\nExamples of duplicates removed:")
-            for i, dup in enumerate(duplicates[:5]):  # Show up to 5 examples
-                print(f"  {i+1}. {dup.get('timestamp', '')} - {dup.get('username', '')}: {dup.get('content', '')[:50]}...")
-            
-            if len(duplicates) > 5:
-                print(f"  ... and {len(duplicates) - 5} more.")
-        
-        print(f"\nSuccess rate: {(duplicates_removed / original_count * 100):.2f}% of messages were duplicates")
-        
+        print_stats(dedup_streams([log_path], log_path))
         return True
         
     except Exception as e:
@@ -129,14 +168,51 @@ def remove_duplicates(log_file="MASTER_LOG.json"):
         traceback.print_exc()
         return False
 
+def merge_logs(log_files, output_file):
+    """
+    Merge several logs into one deduplicated log in a single streaming pass
+
+    Args:
+        log_files (list): Session or master logs to merge, earliest first
+        output_file (str): Log to write, JSON Lines if it ends in .jsonl
+
+    Returns:
+        bool: True on success
+    """
+    log_paths = [resolve_log_path(log_file) for log_file in log_files]
+    missing = [path for path in log_paths if not os.path.exists(path)]
+    if missing:
+        print(f"Error: not found: {', '.join(missing)}")
+        return False
+
+    print(f"Merging {len(log_paths)} log files into {output_file}")
+
+    try:
+        print_stats(dedup_streams(log_paths, output_file))
+        return True
+
+    except Exception as e:
+        print(f"Error processing file: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False
+
 if __name__ == "__main__":
-    # Allow specifying a different log file as command line argument
-    log_file = "MASTER_LOG.json"
-    if len(sys.argv) > 1:
-        log_file = sys.argv[1]
-    
-    print(f"Starting deduplication process for {log_file}...")
-    success = remove_duplicates(log_file)
+    parser = argparse.ArgumentParser(description="Remove duplicate messages from chat logs")
+    parser.add_argument("log_files", nargs="*", default=["MASTER_LOG.jsonl"],
+                        help="Logs to deduplicate (default: MASTER_LOG.jsonl)")
+    parser.add_argument("-o", "--output",
+                        help="Merge all inputs into this log instead of deduplicating in place")
+    args = parser.parse_args()
+
+    if args.output:
+        print(f"Starting deduplication process for {', '.join(args.log_files)}...")
+        success = merge_logs(args.log_files, args.output)
+    elif len(args.log_files) == 1:
+        print(f"Starting deduplication process for {args.log_files[0]}...")
+        success = remove_duplicates(args.log_files[0])
+    else:
+        parser.error("--output is required when merging several log files")
     
     if success:
         print("Deduplication completed successfully!")
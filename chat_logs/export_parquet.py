@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+import argparse
+import glob
+import json
+import os
+import shutil
+import sys
+from datetime import datetime
+
+# Share the storage and ID helpers with the scraper in the parent directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from storage import iter_records
+from message_ids import record_digest
+from merge_sessions import time_key
+
+# pyarrow is only needed for the export itself
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# Record fields with a column of their own; everything else goes in "extra"
+_COLUMN_FIELDS = ("date", "timestamp", "username", "content", "isReply", "msg_key", "msg_id",
+                  "replied_to", "reply_msg_key", "reply_msg_id", "server_time")
+
+# Low-cardinality text columns, dictionary encoded
+_DICTIONARY_COLUMNS = ("timestamp_text", "username", "replied_to")
+
+def _schema():
+    dictionary = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ("date", pa.date32()),
+        ("timestamp", pa.time32("s")),  # Time of day shown in the chat
+        ("timestamp_text", dictionary),  # As shown, e.g. "9:18 PM"
+        ("username", dictionary),
+        ("content", pa.string()),
+        ("is_reply", pa.bool_()),
+        ("msg_key", pa.uint64()),
+        ("msg_id", pa.string()),
+        ("replied_to", dictionary),
+        ("reply_msg_key", pa.uint64()),
+        ("reply_msg_id", pa.string()),
+        ("server_time", pa.timestamp("s")),
+        ("extra", pa.string()),  # JSON of any other fields
+    ])
+
+def parse_date(value):
+    """A date from a record's YYYYMMDD date, or None"""
+    try:
+        return datetime.strptime(str(value), "%Y%m%d").date()
+    except ValueError:
+        return None
+
+def record_row(msg):
+    """
+    Typed column values for one record
+
+    Returns:
+        dict: Values for every column in the export schema, None where the
+            record has nothing usable
+    """
+    minutes = time_key(msg.get("timestamp", ""))
+    reply_key = msg.get("reply_msg_key")
+    server_time = None
+    if msg.get("server_time"):
+        try:
+            server_time = datetime.fromisoformat(msg["server_time"])
+        except ValueError:
+            server_time = None
+    extra = {key: value for key, value in msg.items() if key not in _COLUMN_FIELDS}
+    return {
+        "date": parse_date(msg.get("date", "")),
+        "timestamp": minutes * 60 if minutes is not None else None,
+        "timestamp_text": msg.get("timestamp"),
+        "username": msg.get("username"),
+        "content": msg.get("content"),
+        "is_reply": bool(msg.get("isReply", False)),
+        "msg_key": record_digest(msg),
+        "msg_id": msg.get("msg_id"),
+        "replied_to": msg.get("replied_to"),
+        "reply_msg_key": int(reply_key, 16) if reply_key else None,
+        "reply_msg_id": msg.get("reply_msg_id"),
+        "server_time": server_time,
+        "extra": json.dumps(extra, ensure_ascii=False) if extra else None,
+    }
+
+class _PartitionWriter:
+    """Writes one date partition in chunks, growing each dictionary as it goes"""
+
+    def __init__(self, path, file_format):
+        self.path = path
+        self.schema = _schema()
+        self.rows = {name: [] for name in self.schema.names}
+        # Each batch's dictionary extends the previous one, which Arrow IPC
+        # files accept as dictionary deltas
+        self.dictionaries = {name: {} for name in _DICTIONARY_COLUMNS}
+        if file_format == "arrow":
+            options = pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+            self.writer = pa.ipc.new_file(path, self.schema, options=options)
+        else:
+            self.writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+
+    def add(self, row):
+        for name, value in row.items():
+            self.rows[name].append(value)
+
+    def _dictionary_array(self, name, values):
+        index = self.dictionaries[name]
+        indices = []
+        for value in values:
+            if value is None:
+                indices.append(None)
+                continue
+            if value not in index:
+                index[value] = len(index)
+            indices.append(index[value])
+        return pa.DictionaryArray.from_arrays(pa.array(indices, pa.int32()), pa.array(list(index), pa.string()))
+
+    def flush(self):
+        if not self.rows["content"]:
+            return
+        columns = []
+        for field in self.schema:
+            values = self.rows[field.name]
+            if field.name in _DICTIONARY_COLUMNS:
+                columns.append(self._dictionary_array(field.name, values))
+            else:
+                columns.append(pa.array(values, field.type))
+        batch = pa.RecordBatch.from_arrays(columns, schema=self.schema)
+        if isinstance(self.writer, pq.ParquetWriter):
+            self.writer.write_batch(batch)
+        else:
+            self.writer.write(batch)
+        self.rows = {name: [] for name in self.schema.names}
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+def export_logs(log_paths, output_dir, file_format="parquet", chunk_size=50000, max_open=16):
+    """
+    Export chat logs to a date-partitioned Parquet or Arrow IPC dataset
+
+    Records are streamed, deduplicated by msg_key across all inputs and
+    written to output_dir/date=YYYY-MM-DD/part-0.<format> in row groups
+    (record batches) of up to chunk_size rows, so memory holds one chunk
+    per open partition plus one digest per message. The dataset is built
+    next to output_dir and swapped in when complete.
+
+    Parquet files are zstd compressed; Arrow IPC files are uncompressed so
+    their columns can be memory-mapped (pyarrow.memory_map) without parsing.
+
+    Args:
+        log_paths (list): Logs to export, JSON array or JSON Lines
+        output_dir (str): Dataset directory to (re)create
+        file_format (str, optional): "parquet" or "arrow"
+        chunk_size (int, optional): Rows per row group / record batch
+        max_open (int, optional): Partitions kept open at once; logs are close
+            to date order, so a partition closed early is rarely reopened
+
+    Returns:
+        dict: "read", "written", "duplicates" and rows per "partitions" date
+    """
+    if pa is None:
+        raise RuntimeError("Exporting needs pyarrow: pip install pyarrow")
+    if file_format not in ("parquet", "arrow"):
+        raise ValueError(f"Unknown format {file_format!r}, expected parquet or arrow")
+
+    temp_dir = f"{output_dir.rstrip(os.sep)}.temp"
+    if os.path.exists(temp_dir):
+        shutil.rmtree(temp_dir)
+    os.makedirs(temp_dir)
+
+    writers = {}  # partition name -> open writer, oldest first
+    parts = {}  # partition name -> files written so far
+    stats = {"read": 0, "written": 0, "duplicates": 0, "partitions": {}}
+    seen = set()
+
+    def open_writer(partition):
+        if len(writers) >= max_open:
+            oldest = next(iter(writers))
+            writers.pop(oldest).close()
+        directory = os.path.join(temp_dir, f"date={partition}")
+        os.makedirs(directory, exist_ok=True)
+        part = parts.get(partition, 0)
+        parts[partition] = part + 1
+        return _PartitionWriter(os.path.join(directory, f"part-{part}.{file_format}"), file_format)
+
+    try:
+        for path in log_paths:
+            for msg in iter_records(path):
+                stats["read"] += 1
+                digest = record_digest(msg)
+                if digest is not None:
+                    if digest in seen:
+                        stats["duplicates"] += 1
+                        continue
+                    seen.add(digest)
+
+                row = record_row(msg)
+                partition = row["date"].isoformat() if row["date"] else "unknown"
+                writer = writers.pop(partition, None) or open_writer(partition)
+                writers[partition] = writer  # Most recently used last
+                writer.add(row)
+                if len(writer.rows["content"]) >= chunk_size:
+                    writer.flush()
+                stats["written"] += 1
+                stats["partitions"][partition] = stats["partitions"].get(partition, 0) + 1
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    if os.path.exists(output_dir):
+        shutil.rmtree(output_dir)
+    os.replace(temp_dir, output_dir)
+    return stats
+
+if __name__ == "__main__":
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Export chat logs to a date-partitioned Parquet or Arrow dataset")
+    parser.add_argument("log_files", nargs="*",
+                        help="Logs to export (default: MASTER_LOG.jsonl and every session_*.json here)")
+    parser.add_argument("-o", "--output", default=os.path.join(script_dir, "archive_parquet"),
+                        help="Dataset directory (default: archive_parquet here)")
+    parser.add_argument("-f", "--format", choices=("parquet", "arrow"), default="parquet",
+                        help="parquet (compressed) or arrow (IPC files that can be memory-mapped)")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="Rows per row group")
+    args = parser.parse_args()
+
+    log_paths = args.log_files
+    if not log_paths:
+        log_paths = [path for path in [os.path.join(script_dir, "MASTER_LOG.jsonl")] if os.path.exists(path)]
+        log_paths += sorted(glob.glob(os.path.join(script_dir, "session_*.json")))
+    if not log_paths:
+        print("No logs to export")
+        sys.exit(1)
+    if pa is None:
+        print("Error: exporting needs pyarrow (pip install pyarrow)")
+        sys.exit(1)
+
+    stats = export_logs(log_paths, args.output, args.format, args.chunk_size)
+    print(f"Messages read: {stats['read']}")
+    print(f"Messages written: {stats['written']} in {len(stats['partitions'])} date partitions")
+    print(f"Duplicates dropped: {stats['duplicates']}")
+    print(f"Dataset: {args.output}")
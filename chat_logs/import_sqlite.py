@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+import argparse
+import glob
+import os
+import sys
+
+# Share the storage backends with the scraper in the parent directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from storage import SqliteMessageStore, iter_records
+
+def import_logs(log_paths, database, batch_size=5000):
+    """
+    Import session and master logs into a SQLite message database
+
+    Records are streamed and inserted in batches of one transaction each;
+    the unique msg_key index drops anything already in the database, so
+    overlapping session logs can be imported in any order and re-running
+    an import is harmless.
+
+    Args:
+        log_paths (list): Logs to import, JSON array or JSON Lines
+        database (str): SQLite database to import into
+        batch_size (int, optional): Records per transaction
+
+    Returns:
+        dict: Maps each log path to its (read, inserted) counts
+    """
+    store = SqliteMessageStore(database)
+    stats = {}
+    try:
+        for path in log_paths:
+            read = inserted = 0
+            batch = []
+            for msg in iter_records(path):
+                batch.append(msg)
+                read += 1
+                if len(batch) >= batch_size:
+                    store.append(batch)
+                    inserted += store.last_inserted
+                    batch = []
+            store.append(batch)
+            inserted += store.last_inserted
+            stats[path] = (read, inserted)
+            print(f"{os.path.basename(path)}: {read} read, {inserted} new, {read - inserted} already in the database")
+        print(f"{database} now holds {store.count()} messages")
+    finally:
+        store.close()
+    return stats
+
+if __name__ == "__main__":
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Import chat logs into a SQLite message database")
+    parser.add_argument("log_files", nargs="*",
+                        help="Logs to import (default: MASTER_LOG.jsonl and every session_*.json here)")
+    parser.add_argument("-d", "--database", default=os.path.join(script_dir, "MASTER_LOG.sqlite3"),
+                        help="Database to import into (default: MASTER_LOG.sqlite3 here)")
+    args = parser.parse_args()
+
+    log_paths = args.log_files
+    if not log_paths:
+        log_paths = [path for path in [os.path.join(script_dir, "MASTER_LOG.jsonl")] if os.path.exists(path)]
+        log_paths += sorted(glob.glob(os.path.join(script_dir, "session_*.json")))
+    if not log_paths:
+        print("No logs to import")
+        sys.exit(1)
+
+    import_logs(log_paths, args.database)
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+import argparse
+import glob
+import heapq
+import os
+import sys
+
+# Share the storage and ID helpers with the scraper in the parent directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from storage import RecordWriter, iter_records
+from message_ids import message_digest
+from delete_duplicates import record_norm_id, resolve_log_path
+
+# Marks a digest that appears in more than one input file
+SHARED = -1
+
+def time_key(timestamp):
+    """
+    Convert a chat timestamp like "5:03 PM" to minutes since midnight
+
+    Returns None if the timestamp can't be parsed.
+    """
+    try:
+        clock, period = timestamp.split()
+        hours, minutes = clock.split(':')
+        hours = int(hours) % 12 + (12 if period.upper() == 'PM' else 0)
+        return hours * 60 + int(minutes)
+    except (AttributeError, ValueError):
+        return None
+
+def keyed_records(path, file_index):
+    """
+    Yield (sort key, file index, record) for a log in file order
+
+    Logs are close to time order but not exactly: a reply can carry the
+    timestamp of the message it quotes, which puts it minutes or hours
+    behind its neighbours. The merge needs each input to be sorted, so a
+    record's key is never allowed to go below the previous record's, which
+    keeps it where the chat showed it.
+    """
+    last_key = ("", -1)
+    for msg in iter_records(path):
+        minutes = time_key(msg.get("timestamp", ""))
+        key = (msg.get("date", ""), minutes if minutes is not None else -1)
+        if key < last_key:
+            key = last_key
+        last_key = key
+        yield key, file_index, msg
+
+def merge_sessions(log_paths, output_path):
+    """
+    Merge session and master logs into one deduplicated, time-ordered log
+
+    A k-way merge on (date, timestamp) holds only one record per input in
+    memory, plus one digest per distinct message for dedup, so logs that are
+    each a full copy of the history merge without loading any of them
+    whole. On equal keys the earlier input wins.
+
+    Args:
+        log_paths (list): Logs to merge, JSON array or JSON Lines
+        output_path (str): Log to write, JSON Lines if it ends in .jsonl
+
+    Returns:
+        dict: "inputs" maps each input path to its read/kept/duplicates/unique
+            counts and size in bytes, plus totals
+    """
+    # Digest of each distinct message -> index of the only input holding it, or SHARED
+    owners = {}
+    inputs = []
+    for path in log_paths:
+        inputs.append({"read": 0, "kept": 0, "duplicates": 0, "unique": 0,
+                       "bytes": os.path.getsize(path)})
+    stats = {"inputs": dict(zip(log_paths, inputs)), "read": 0, "kept": 0, "duplicates": 0}
+
+    streams = [keyed_records(path, i) for i, path in enumerate(log_paths)]
+    with RecordWriter(output_path) as writer:
+        for _, file_index, msg in heapq.merge(*streams, key=lambda item: item[:2]):
+            file_stats = inputs[file_index]
+            file_stats["read"] += 1
+
+            norm_id = record_norm_id(msg)
+            if norm_id is not None:
+                digest = message_digest(norm_id)
+                owner = owners.get(digest)
+                if owner is not None:
+                    file_stats["duplicates"] += 1
+                    if owner != file_index:
+                        owners[digest] = SHARED
+                    continue
+                owners[digest] = file_index
+
+            writer.write(msg)
+            file_stats["kept"] += 1
+
+    for owner in owners.values():
+        if owner != SHARED:
+            inputs[owner]["unique"] += 1
+
+    for key in ("read", "kept", "duplicates"):
+        stats[key] = sum(file_stats[key] for file_stats in inputs)
+    return stats
+
+def print_stats(stats):
+    """Print per-file overlap statistics for a merge_sessions run"""
+    print(f"{'file':<40} {'read':>8} {'kept':>8} {'dupes':>8} {'unique':>8} {'overlap':>8} {'MB':>7}")
+    reclaimable = 0
+    for path, file_stats in stats["inputs"].items():
+        overlap = (file_stats["read"] - file_stats["unique"]) / file_stats["read"] * 100 if file_stats["read"] else 0
+        print(f"{os.path.basename(path):<40} {file_stats['read']:>8} {file_stats['kept']:>8} "
+              f"{file_stats['duplicates']:>8} {file_stats['unique']:>8} {overlap:>7.1f}% "
+              f"{file_stats['bytes'] / 1e6:>7.2f}")
+        if not file_stats["unique"]:
+            reclaimable += file_stats["bytes"]
+
+    print(f"\nMessages read: {stats['read']}")
+    print(f"Messages written: {stats['kept']}")
+    print(f"Duplicates dropped: {stats['duplicates']}")
+    print(f"Files with no unique messages: {reclaimable / 1e6:.2f} MB "
+          f"(everything in them is also in another input)")
+
+if __name__ == "__main__":
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Merge session and master logs into one time-ordered archive")
+    parser.add_argument("log_files", nargs="*",
+                        help="Logs to merge (default: every session_*.json here)")
+    parser.add_argument("-o", "--output", default="MERGED_LOG.jsonl",
+                        help="Archive to write (default: MERGED_LOG.jsonl)")
+    args = parser.parse_args()
+
+    log_paths = [resolve_log_path(log_file) for log_file in args.log_files]
+    if not log_paths:
+        log_paths = sorted(glob.glob(os.path.join(script_dir, "session_*.json")))
+    missing = [path for path in log_paths if not os.path.exists(path)]
+    if missing:
+        print(f"Error: not found: {', '.join(missing)}")
+        sys.exit(1)
+    if not log_paths:
+        print("No logs to merge")
+        sys.exit(1)
+
+    print(f"Merging {len(log_paths)} log files into {args.output}...")
+    print_stats(merge_sessions(log_paths, args.output))
@@ -0,0 +1,21 @@
+import json
+
+from delete_duplicates import dedup_streams
+
+
+def test_merge_keeps_first_occurrence_across_inputs(tmp_path, make_msg):
+    def msg(i, timestamp="5:03 PM"):
+        return make_msg(f"SPY\n+1.{i}% message", timestamp)
+
+    # The same message with a different live price is still a duplicate
+    first = tmp_path / "session_1.json"
+    first.write_text(json.dumps([msg(1), msg(2, "5:04 PM")], indent=2))
+    second = tmp_path / "session_2.jsonl"
+    second.write_text(json.dumps(msg(3, "5:04 PM")) + "\n" + json.dumps(msg(4, "5:05 PM")) + "\n")
+
+    output = tmp_path / "merged.jsonl"
+    stats = dedup_streams([str(first), str(second)], str(output))
+
+    kept = [json.loads(line) for line in output.read_text().splitlines()]
+    assert kept == [msg(1), msg(2, "5:04 PM"), msg(4, "5:05 PM")]
+    assert stats["inputs"][str(second)] == {"read": 2, "kept": 1, "duplicates": 1}
@@ -0,0 +1,34 @@
+import json
+
+import pytest
+
+from export_parquet import export_logs, record_row
+
+
+def test_record_row_types_columns(make_msg):
+    row = record_row(make_msg("hello", "1:05 PM", reply_msg_key="00000000000000ff", room="main"))
+    assert row["date"].isoformat() == "2025-09-23"
+    assert row["timestamp"] == (13 * 60 + 5) * 60
+    assert row["timestamp_text"] == "1:05 PM"
+    assert row["is_reply"] is False
+    assert row["reply_msg_key"] == 255
+    assert isinstance(row["msg_key"], int)
+    assert json.loads(row["extra"]) == {"room": "main"}
+
+    row = record_row({"timestamp": "soon", "content": "x", "date": "bad"})
+    assert row["date"] is None and row["timestamp"] is None and row["msg_key"] is None
+
+
+def test_export_partitions_by_date_and_dedups(tmp_path, make_msg):
+    pq = pytest.importorskip("pyarrow.parquet")
+    log = tmp_path / "MASTER_LOG.jsonl"
+    records = [make_msg("a", "9:00 AM"), make_msg("b", "9:01 AM"), make_msg("c", "9:00 AM", date="20250924")]
+    log.write_text("".join(json.dumps(msg) + "\n" for msg in records + records[:1]))
+
+    stats = export_logs([str(log)], str(tmp_path / "dataset"), chunk_size=1)
+
+    assert stats["written"] == 3 and stats["duplicates"] == 1
+    assert stats["partitions"] == {"2025-09-23": 2, "2025-09-24": 1}
+    table = pq.read_table(str(tmp_path / "dataset" / "date=2025-09-23"))
+    assert table.column("username").to_pylist() == ["VirtualEdge", "VirtualEdge"]
+    assert table.column("content").to_pylist() == ["a", "b"]
@@ -0,0 +1,28 @@
+import json
+
+from merge_sessions import merge_sessions, time_key
+
+
+def test_time_key_orders_across_noon():
+    assert time_key("11:59 AM") < time_key("12:00 PM") < time_key("1:00 PM")
+    assert time_key("12:30 AM") == 30
+    assert time_key("") is None
+
+
+def test_merge_is_time_ordered_and_counts_overlap(tmp_path, make_msg):
+    older = tmp_path / "session_1.json"
+    older.write_text(json.dumps([make_msg("a", "9:00 AM"), make_msg("c", "1:00 PM")]))
+    # A reply stamped with the quoted message's time stays where it was shown
+    newer = tmp_path / "session_2.json"
+    newer.write_text(json.dumps([make_msg("a", "9:00 AM"), make_msg("b", "11:00 AM"),
+                                 make_msg("reply", "8:00 AM"), make_msg("c", "1:00 PM"),
+                                 make_msg("d", "9:00 AM", date="20250924")]))
+
+    output = tmp_path / "merged.jsonl"
+    stats = merge_sessions([str(older), str(newer)], str(output))
+
+    merged = [json.loads(line)["content"] for line in output.read_text().splitlines()]
+    assert merged == ["a", "b", "reply", "c", "d"]
+    assert stats["inputs"][str(older)]["unique"] == 0
+    assert stats["inputs"][str(newer)]["unique"] == 3
+    assert stats["duplicates"] == 2
@@ -1,19 +1,220 @@
 import selenium
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.keys import Keys
-import json
 import os
 import time
 import shutil
-import re
+from collections import deque
 from datetime import datetime
+from storage import BackgroundWriter, JsonlMessageStore, SqliteMessageStore, write_records
+from reply_index import ReplyIndex
+from log_index import load_startup_state, save_known_index
+from ticker_normalizer import remove_ticker_content
+from browser_profile import chrome_profile, start_chrome
+from html_snapshot import build_record, entries_from_items, entry_id, link_entry, parse_content
+from message_ids import KnownMessageSet, generate_message_id, message_digest, record_digest
+
+# Chat room opened by navigate_to_chat unless another one is given
+DEFAULT_ROOM = "chatbot_HHH"
+
+CHAT_CONTAINER_XPATH = "//div[@class='absolute flex bg-[#121212] flex-col top-[50px] right-0 left-0 bottom-0 pt-[10px] px-[10px] m-0 overflow-x-hidden overflow-y-scroll']"
+
+# Shared helpers for the injected scripts. extractMessage mirrors the
+# selectors used by the _extract_*_fast methods; content is returned raw and
+# parsed in Python by _parse_content_from_full_text_fast.
+MESSAGE_EXTRACT_JS = """
+var PRIMARY_SELECTOR = "div[class*='group text-[#eaeaea]']";
+var FALLBACK_SELECTOR = "div[class*='text-[#eaeaea] rounded']";
+var clean = function(s) { return (s || '').replace(/\\u00a0/g, ' '); };
+var findMessageNodes = function(container) {
+    var nodes = container.querySelectorAll(PRIMARY_SELECTOR);
+    if (nodes.length === 0) nodes = container.querySelectorAll(FALLBACK_SELECTOR);
+    return nodes;
+};
+var firstText = function(el) {
+    for (var i = 0; i < el.childNodes.length; i++) {
+        if (el.childNodes[i].nodeType === 3) return el.childNodes[i].data;
+    }
+    return '';
+};
+var extractMessage = function(el) {
+    var item = {text: clean(el.innerText), timestamp: null, username: null, content: '',
+                is_reply: false, reply_to: '', preview: ''};
+
+    var spans = el.querySelectorAll("span[style*='color: grey; font-size: 8px;']");
+    if (spans.length) {
+        var t = clean(spans[0].innerText).trim();
+        if (t && (t.indexOf(':') !== -1 || t.indexOf('AM') !== -1 || t.indexOf('PM') !== -1)) item.timestamp = t;
+    }
+    if (!item.timestamp) {
+        var all = el.querySelectorAll('span');
+        for (var s = 0; s < all.length; s++) {
+            var ft = firstText(all[s]);
+            if (ft.indexOf('AM') !== -1 || ft.indexOf('PM') !== -1) {
+                var t2 = clean(all[s].innerText).trim();
+                if (t2 && t2.indexOf(':') !== -1) item.timestamp = t2;
+                break;
+            }
+        }
+    }
+
+    var users = el.querySelectorAll("div[class='inline-flex relative']");
+    if (!users.length) users = el.querySelectorAll("div[class*='inline-flex']");
+    if (users.length) {
+        var u = clean(users[0].innerText).trim().split(':').join('').trim();
+        if (u && u.length >= 2 && u.length <= 50) item.username = u;
+    }
+
+    var blocks = el.querySelectorAll("div[class='block pr-[20px] break-words']");
+    item.content = blocks.length ? clean(blocks[0].innerText) : item.text;
+
+    var descendants = el.querySelectorAll('*');
+    for (var d = 0; d < Math.min(5, descendants.length); d++) {
+        var dt = clean(descendants[d].innerText);
+        if (dt && dt.charAt(0) === '@' && dt.indexOf(':') !== -1) {
+            var colon = dt.indexOf(':');
+            item.is_reply = true;
+            item.reply_to = dt.substring(1, colon).trim();
+            item.preview = dt.substring(colon + 1).trim();
+            break;
+        }
+    }
+    if (el.querySelector('.anticon-enter.enter-reply')) item.is_reply = true;
+    return item;
+};
+"""
+
+# Extracts messages in the chat container in one execute_script call.
+# When a mark is passed as the second argument only nodes after the last
+# node carrying that mark are extracted, and the extracted nodes are marked.
+# Nodes caught mid-render are tagged for retry instead and read again on
+# the next few calls wherever they are. A re-rendered container has no
+# marked nodes, so it is rescanned in full.
+MESSAGE_SNAPSHOT_JS = MESSAGE_EXTRACT_JS + """
+var container = arguments[0];
+var mark = arguments[1] || null;
+var nodes = findMessageNodes(container);
+var start = 0;
+if (mark) {
+    for (var m = nodes.length - 1; m >= 0; m--) {
+        if (nodes[m].getAttribute('data-gcm-seen') === mark) { start = m + 1; break; }
+    }
+}
+var out = [];
+var visited = new Set();
+var visit = function(node) {
+    if (visited.has(node)) return;
+    visited.add(node);
+    var item = extractMessage(node);
+    if (mark) {
+        var tries = parseInt(node.getAttribute('data-gcm-retry') || '0', 10);
+        if ((item.timestamp && item.username) || tries >= 2) {
+            node.setAttribute('data-gcm-seen', mark);
+            node.removeAttribute('data-gcm-retry');
+        } else {
+            node.setAttribute('data-gcm-retry', tries + 1);
+        }
+    }
+    out.push(item);
+};
+if (mark) {
+    var retry = container.querySelectorAll('[data-gcm-retry]');
+    for (var r = 0; r < retry.length; r++) visit(retry[r]);
+}
+for (var n = start; n < nodes.length; n++) visit(nodes[n]);
+return {total: nodes.length, start: start, items: out};
+"""
+
+# Installs a MutationObserver on the chat container that queues every
+# message node added to it. Nodes are serialized when the queue is drained
+# so late-rendering children are still picked up.
+PUSH_INSTALL_JS = MESSAGE_EXTRACT_JS + """
+var container = arguments[0];
+if (window.__gcmObserver) window.__gcmObserver.disconnect();
+window.__gcmQueue = [];
+window.__gcmRetry = [];
+window.__gcmContainer = container;
+window.__gcmObserver = new MutationObserver(function(mutations) {
+    for (var i = 0; i < mutations.length; i++) {
+        var added = mutations[i].addedNodes;
+        for (var j = 0; j < added.length; j++) {
+            var node = added[j];
+            if (node.nodeType !== 1) continue;
+            if (node.matches(PRIMARY_SELECTOR) || node.matches(FALLBACK_SELECTOR)) {
+                window.__gcmQueue.push(node);
+            } else {
+                var inner = findMessageNodes(node);
+                for (var k = 0; k < inner.length; k++) window.__gcmQueue.push(inner[k]);
+            }
+        }
+    }
+});
+window.__gcmObserver.observe(container, {childList: true, subtree: true});
+return true;
+"""
+
+# Long-polls the observer queue with execute_async_script: returns as soon
+# as messages are queued or after the timeout (ms) in the first argument.
+# A node caught mid-render is parked in a separate retry list and checked
+# again every 200 ms for up to 2 s; parked nodes only wake the long-poll
+# when their retry is due. Returns null when the observer or its container
+# is gone so the caller can reinstall it and rescan.
+PUSH_DRAIN_JS = MESSAGE_EXTRACT_JS + """
+var timeout = arguments[0];
+var done = arguments[arguments.length - 1];
+var started = Date.now();
+var RETRY_DELAY = 200, RETRY_LIMIT = 2000;
+var retryDue = function(now) {
+    var retry = window.__gcmRetry || [];
+    for (var i = 0; i < retry.length; i++) {
+        if (retry[i].next <= now) return true;
+    }
+    return false;
+};
+var drain = function() {
+    if (!window.__gcmObserver || !document.contains(window.__gcmContainer)) return null;
+    var now = Date.now();
+    var pending = [];
+    var queue = window.__gcmQueue;
+    window.__gcmQueue = [];
+    for (var i = 0; i < queue.length; i++) pending.push({node: queue[i], first: now});
+    var retry = window.__gcmRetry || [];
+    window.__gcmRetry = [];
+    for (var j = 0; j < retry.length; j++) {
+        if (retry[j].next <= now) pending.push(retry[j]); else window.__gcmRetry.push(retry[j]);
+    }
+    var out = [];
+    for (var k = 0; k < pending.length; k++) {
+        var node = pending[k].node;
+        if (!node.isConnected) continue;
+        var item = extractMessage(node);
+        if (!(item.timestamp && item.username) && now - pending[k].first < RETRY_LIMIT) {
+            window.__gcmRetry.push({node: node, first: pending[k].first, next: now + RETRY_DELAY});
+            continue;
+        }
+        out.push(item);
+    }
+    return out;
+};
+var check = function() {
+    var now = Date.now();
+    if (!window.__gcmObserver || window.__gcmQueue.length || retryDue(now) || now - started >= timeout) {
+        done(drain());
+    } else {
+        setTimeout(check, 50);
+    }
+};
+check();
+"""
 
 class ChatScraper:
-    def __init__(self, url, username=None, password=None, log_directory="chat_logs", headless=False):
+    def __init__(self, url, username=None, password=None, log_directory="chat_logs", headless=False, storage=None, extraction_mode="js", incremental=True,
+                 readable_ids=True, known_window=50000, known_bloom_capacity=5000000,
+                 reply_window=5000, background_writes=True, startup_tail=5000, room=DEFAULT_ROOM,
+                 driver=None, known_messages=None, dedup_salt=0, browser_profile="default", blocked_urls=None,
+                 window_size=None, performance_log=False):
         """
         Initialize the ChatScraper
         
@@ -23,317 +224,611 @@ class ChatScraper:
             password (str, optional): Password for login
             headless (bool, optional): Run browser in headless mode
             log_directory (str, optional): Directory to save chat logs
+            storage (MessageStore, optional): Master log backend, defaults to an
+                append-only JSONL log in log_directory
+            extraction_mode (str, optional): "js" to snapshot all messages in one
+                execute_script call, "element" for per-element WebDriver calls
+            incremental (bool, optional): Only extract message nodes added since
+                the previous poll, rescanning fully when the chat is re-rendered
+            readable_ids (bool, optional): Store the readable msg_id and reply_msg_id
+                alongside the compact msg_key and reply_msg_key
+            known_window (int, optional): Recent message digests kept exactly for dedup,
+                and number of recent messages kept in memory
+            known_bloom_capacity (int, optional): Keep older digests in a fixed-size
+                Bloom filter of this capacity (about 21 MB for the default 5M).
+                None keeps them exactly in a sorted array (8 bytes per message)
+            reply_window (int, optional): Recent messages per user searched for replies
+            startup_tail (int, optional): Most recent records loaded from the log at
+                startup for reply resolution; older ones are read on demand
+            background_writes (bool, optional): Write the logs from a background thread
+                so disk I/O never blocks extraction
+            room (str, optional): Name of the chat room to capture
+            driver (WebDriver, optional): Use this browser, already on the site, in its
+                current window instead of starting one; it is not quit by close()
+            known_messages (KnownMessageSet, optional): Dedup set shared with other
+                scrapers; this scraper adds its own log's digests and doesn't save it
+            dedup_salt (int, optional): XORed into every digest checked against
+                known_messages, so rooms sharing a set don't collide
+            browser_profile (str, optional): "default", or "lean" for headless-new
+                Chrome with images, fonts, media, GPU and extensions off
+            blocked_urls (list, optional): Extra URL patterns the browser won't load,
+                e.g. requests from panels other than the chat
+            window_size (tuple, optional): Browser (width, height), or None for the
+                profile's size
+            performance_log (bool, optional): Record the browser's network events for
+                network_capture.NetworkCapture
         """
         self.url = url
         self.username = username
         self.password = password
-        self.known_messages = set()  # To track messages we've already processed
-        self.message_data = []  # Store all message data
+        self.extraction_mode = extraction_mode
+        self.incremental = incremental
+        # High-water mark of the last processed message node. The JS path tags
+        # nodes with a per-instance mark; the element path keeps the WebElement
+        # of the last node it processed.
+        self._scan_mark = f"gcm{int(time.time() * 1000)}"
+        self._last_element = None
+        self._retry_elements = {}  # Incomplete WebElement -> polls left to retry it
+        self._anchored = False  # Last scan started right after the high-water mark
+        # Result of the last poll: messages seen and new, whether it anchored to the
+        # previous poll, and whether it probably missed messages
+        self.last_poll = None
+        self.readable_ids = readable_ids
+        self.room = room
+        # To track messages we've already processed, as 64-bit digests
+        self.shared_known = known_messages is not None
+        if known_messages is None:
+            known_messages = KnownMessageSet(window=known_window, bloom_capacity=known_bloom_capacity)
+        self.known_messages = known_messages
+        self.dedup_salt = dedup_salt
+        # Recent message data; the full history lives in the master log
+        self.message_data = deque(maxlen=known_window)
         self.log_directory = log_directory #for windows
         #self.log_directory = "/Users/haydenherstrom/codeprojects/godel_chat/chat_logs" #for mac
         
         # Create log directory if it doesn't exist
         os.makedirs(self.log_directory, exist_ok=True)
         
-        # Use a master log file for all messages
-        self.master_log = os.path.join(self.log_directory, "MASTER_LOG.json")
+        # Use an append-only master log for all messages; the old JSON-array
+        # MASTER_LOG.json is imported the first time if it exists
+        self.master_log = os.path.join(self.log_directory, "MASTER_LOG.jsonl")
+        if storage is None:
+            storage = JsonlMessageStore(
+                self.master_log,
+                legacy_path=os.path.join(self.log_directory, "MASTER_LOG.json")
+            )
+        self.storage = storage
         
-        # Also create a session log with timestamp for backup purposes
+        # Also keep a session log with timestamp holding only this run's messages
         self.session_log = os.path.join(
             self.log_directory, 
-            f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+            f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl"
         )
+        self.session_storage = JsonlMessageStore(self.session_log, sidecar=False)
         
-        # Store message lookup by username for quickly finding replied-to messages
-        self.username_message_lookup = {}
+        # New messages go to the session log first as a backup, then the
+        # master log, by default from a writer thread with group commits
+        self.writer = None
+        if background_writes:
+            self.writer = BackgroundWriter([self.session_storage, self.storage])
+        self.write_failed = False  # A write was lost, so the dedup index mustn't be saved
+        
+        # Saved dedup set for the master log, so startup doesn't re-read it all.
+        # A shared set is saved by whoever owns it.
+        self.known_index = None
+        if isinstance(self.storage, JsonlMessageStore) and not self.shared_known:
+            self.known_index = f"{self.storage.path}.known"
+        self.startup_tail = startup_tail
+        
+        # Index messages by username for quickly finding replied-to messages
+        self.reply_index = ReplyIndex(self._generate_message_id, max_messages_per_user=reply_window)
         
         # Load existing messages from master log if it exists
         self._load_master_log()
         
-        # Configure Chrome options
-        chrome_options = Options()
-        if headless:
-            chrome_options.add_argument("--headless")
-        chrome_options.add_argument("--window-size=900,800")
-
-        self.driver = webdriver.Chrome(options=chrome_options)
+        self.headless = headless
+        self.browser_profile = chrome_profile(browser_profile, headless, window_size, blocked_urls, performance_log)
+        if driver is not None:
+            self.attach_driver(driver, owns_driver=False)
+            return
+        
+        self.attach_driver(self.create_driver())
         try:
             self.driver.get(self.url)
         except Exception as e:
             print(f'Error loading page: {str(e)}')
             raise
 
+    def create_driver(self):
+        """Start a new Chrome instance with this scraper's options"""
+        return start_chrome(self.browser_profile)
+
+    def attach_driver(self, driver, window_handle=None, owns_driver=True):
+        """
+        Capture from another browser session, keeping all in-memory state
+
+        The dedup set, reply index and logs carry over; only the state tied
+        to the old page (scan marks, element references) is reset, so the
+        next scan covers everything visible in the new session.
+
+        Args:
+            driver (WebDriver): Browser to use, already on the site
+            window_handle (str, optional): Window with the chat, defaults to the current one
+            owns_driver (bool, optional): Quit the driver when this scraper closes
+        """
+        self.driver = driver
+        self.owns_driver = owns_driver
+        self.window_handle = window_handle or driver.current_window_handle
+        self._scan_mark = f"gcm{int(time.time() * 1000)}"
+        self._last_element = None
+        self._retry_elements = {}
+        self.last_poll = None
+
+    def prepare_driver(self, driver):
+        """
+        Load the site, log in and open the chat room in a spare browser
+
+        Returns:
+            list: Window handles to pass to failover()
+        """
+        driver.get(self.url)
+        self.login(driver)
+        self.navigate_to_chat(driver)
+        return [driver.current_window_handle]
+
+    def failover(self, driver, window_handles, push_mode=False):
+        """
+        Switch to a prepared standby browser and catch up on what was missed
+
+        The old browser is quit. Everything visible in the new session is
+        scanned, so messages that arrived while the old one was failing are
+        captured and the ones already logged are dropped by the dedup check.
+
+        Args:
+            driver (WebDriver): Browser set up by prepare_driver()
+            window_handles (list): Handles returned by prepare_driver()
+            push_mode (bool, optional): Install the chat observer in the new session
+
+        Returns:
+            list: New messages found in the replayed scrollback
+        """
+        old_driver, owned = self.driver, self.owns_driver
+        self.attach_driver(driver, window_handles[0])
+        if owned:
+            try:
+                old_driver.quit()
+            except Exception as e:
+                print(f"Error closing failed browser: {str(e)}")
+        
+        print("Switched to standby browser, replaying visible scrollback")
+        if push_mode:
+            return self.start_push_capture()
+        return self.get_chat_messages()
+
     def _load_master_log(self):
-        """Load existing messages from the master log if it exists"""
-        if os.path.exists(self.master_log):
+        """
+        Load the dedup set and recent messages from the master log
+
+        With the default JSONL log this reads the saved dedup index plus the
+        last startup_tail records, so startup time doesn't grow with the
+        archive; older history is only read if a reply points into it.
+        Other backends stream their digests and load only the tail.
+        """
+        if self.known_index:
+            start = time.perf_counter()
             try:
-                with open(self.master_log, 'r') as f:
-                    existing_data = json.load(f)
-                    
-                # Add existing message IDs to known_messages set
-                # Build username-based message lookup for finding replied-to messages
-                for msg in existing_data:
-                    if "msg_id" in msg:
-                        self.known_messages.add(msg["msg_id"])
-                        
-                        # Add to username lookup for reply message identification
-                        username = msg.get("username", "")
-                        if username:
-                            if username not in self.username_message_lookup:
-                                self.username_message_lookup[username] = []
-                            self.username_message_lookup[username].append(msg)
-                    
-                # Load existing data into message_data
-                self.message_data = existing_data
-                print(f"Loaded {len(existing_data)} existing messages from master log")
+                self.known_messages, scanned, indexed = load_startup_state(
+                    self.storage, self.known_index, self.known_messages,
+                    self.reply_index, self.message_data, self.startup_tail
+                )
             except Exception as e:
                 print(f"Error loading master log: {str(e)}")
-                # Create a backup of the potentially corrupted file
-                if os.path.exists(self.master_log):
-                    backup_file = f"{self.master_log}.backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-                    shutil.copy2(self.master_log, backup_file)
+                backup_file = self.storage.backup()
+                if backup_file:
                     print(f"Created backup of master log at {backup_file}")
-                # Initialize with empty data
-                self.message_data = []
+                return
+            
+            elapsed = (time.perf_counter() - start) * 1000
+            source = f"index + {scanned} newer records" if indexed else f"full scan of {scanned} records"
+            print(f"Loaded {len(self.known_messages)} known messages from {source} in {elapsed:.0f} ms")
+            return
+        
+        # Other backends and shared sets: every digest for dedup, the tail
+        # for replies, and each user's older history on demand
+        try:
+            for digest in self.storage.iter_digests():
+                self.known_messages.add(digest ^ self.dedup_salt)
+            tail_start, tail = self.storage.tail(self.startup_tail)
+        except Exception as e:
+            print(f"Error loading master log: {str(e)}")
+            # Create a backup of the potentially corrupted file
+            backup_file = self.storage.backup()
+            if backup_file:
+                print(f"Created backup of master log at {backup_file}")
+            return
+
+        if tail:
+            # Build username-based message lookup for finding replied-to messages
+            for msg in tail:
+                if record_digest(msg) is not None:
+                    self.reply_index.add(msg)
+            self.message_data.extend(tail)
+            limit = self.reply_index.max_messages_per_user
+            self.reply_index.load_older = lambda username: self.storage.user_records(username, before=tail_start, limit=limit)
+            print(f"Loaded {len(self.known_messages)} known messages from master log")
         else:
             print("No existing master log found, starting with empty log")
-            self.message_data = []
     
     def _remove_ticker_content(self, content):
         """
         Remove ticker content (data between newline and percentage sign) from message
         to create a stable message ID that won't change when prices update
         """
-        # Use regex to remove content between \n and % in stock ticker messages
-        if '\n' in content and '%' in content:
-            # Match pattern like "TICKER\n-5.23%\nrest of message" or "TICKER\n+5.23%"
-            pattern = r'([A-Z]+)\n[+-]?\d+\.?\d*%'
-            
-            # Also match patterns with delayed tickers like "VIX (D)\n-5.23%"
-            pattern_with_delay = r'([A-Z]+\s*\([A-Z]\))\n[+-]?\d+\.?\d*%'
-            
-            # Match futures tickers like "ES1 (D)\n+0.04%" - more flexible pattern
-            pattern_futures = r'([A-Z0-9]+\s*\([A-Z]\))\n[+-]?\d+\.?\d*%'
-            
-            # Match any ticker with parentheses and percentage
-            pattern_any_parens = r'([A-Z0-9]+\s*\([^)]+\))\n[+-]?\d+\.?\d*%'
-            
-            # Remove price data between \n and % for each ticker in the message
-            cleaned_content = re.sub(pattern, r'\1\n[PRICE]%', content)
-            cleaned_content = re.sub(pattern_with_delay, r'\1\n[PRICE]%', cleaned_content)
-            cleaned_content = re.sub(pattern_futures, r'\1\n[PRICE]%', cleaned_content)
-            cleaned_content = re.sub(pattern_any_parens, r'\1\n[PRICE]%', cleaned_content)
-            
-            return cleaned_content
-        
-        return content
+        return remove_ticker_content(content)
     
     def _generate_message_id(self, timestamp, username, content):
         """
         Generate a consistent message ID using the same logic across the application
         """
-        # Remove ticker content from message ID check
-        id_content = self._remove_ticker_content(content)
-        
-        # Use more characters for better uniqueness, but limit to reasonable length
-        content_hash = id_content[:50] if len(id_content) > 50 else id_content
-        
-        return f"{timestamp}_{username}_{content_hash}"
+        return generate_message_id(timestamp, username, content)
 
     def close(self):
-        """Close the webdriver"""
-        self.driver.quit()
-        print("Browser closed")
+        """Flush the logs and close the webdriver"""
+        try:
+            # Commit every queued message before anything else can fail
+            self.close_logs()
+        finally:
+            if self.owns_driver:
+                self.driver.quit()
+                print("Browser closed")
+
+    def close_logs(self):
+        """Write out any queued messages and close the logs"""
+        if self.writer is not None:
+            pending = self.writer.pending()
+            if pending:
+                print(f"Writing {pending} queued message batches...")
+            self.writer.close()
+            unwritten = self.writer.unwritten()
+            if unwritten:
+                print(f"Error: {unwritten} messages could not be written to the logs")
+                self.write_failed = True
+        else:
+            self.storage.close()
+            self.session_storage.close()
+        
+        # Everything known is now in the log, so the index can cover all of
+        # it; if a write failed it isn't, and saving would hide those
+        # messages from every later run
+        if self.known_index and self.write_failed:
+            print("Not saving the dedup index since some messages weren't written")
+        elif self.known_index:
+            try:
+                save_known_index(self.known_index, self.storage.path, self.known_messages)
+            except Exception as e:
+                print(f"Error saving dedup index: {str(e)}")
 
-    def login(self):
-        """Log in to the website if credentials are provided"""
+    def login(self, driver=None):
+        """
+        Log in to the website if credentials are provided
+
+        Args:
+            driver (WebDriver, optional): Browser to log in, defaults to this scraper's
+        """
         if not (self.username and self.password):
             print("No login credentials provided, skipping login")
             return
+        driver = driver or self.driver
         try:
             print('Logging in...')
-            WebDriverWait(self.driver, 10).until(
+            WebDriverWait(driver, 10).until(
                 EC.presence_of_element_located((By.XPATH, "//button[text()='Login']"))
             )
-            login_button = self.driver.find_element(By.XPATH, "//button[text()='Login']")
+            login_button = driver.find_element(By.XPATH, "//button[text()='Login']")
             login_button.click()
 
             # Find username field by autocomplete attribute
-            username_field = self.driver.find_element(By.CSS_SELECTOR, "input[autocomplete='username']")
+            username_field = driver.find_element(By.CSS_SELECTOR, "input[autocomplete='username']")
             username_field.send_keys(self.username)
-            password_field = self.driver.find_element(By.CSS_SELECTOR, "input[autocomplete='current-password']")
+            password_field = driver.find_element(By.CSS_SELECTOR, "input[autocomplete='current-password']")
             password_field.send_keys(self.password)
 
             # Find login button by text
-            login_button = self.driver.find_element(By.XPATH, '//*[@id="root"]/div[2]/div[3]/div/div[2]/div/form/div[2]/button')
+            login_button = driver.find_element(By.XPATH, '//*[@id="root"]/div[2]/div[3]/div/div[2]/div/form/div[2]/button')
             login_button.click()
             print("Login successful")
         except Exception as e:
             print(f'Login failed: {str(e)}')
             raise
 
-    def navigate_to_chat(self):
-        """Navigate to the chat room"""
+    def _activate(self):
+        """Switch the browser to this scraper's window if another one is current"""
+        if self.driver.current_window_handle != self.window_handle:
+            self.driver.switch_to.window(self.window_handle)
+
+    def navigate_to_chat(self, driver=None):
+        """
+        Navigate to the chat room
+
+        Args:
+            driver (WebDriver, optional): Browser to navigate in its current window,
+                defaults to this scraper's window
+        """
         try:
-            WebDriverWait(self.driver, 10).until(
-                EC.presence_of_element_located((By.XPATH, "//span[text()='chatbot_HHH']"))
+            if driver is None:
+                self._activate()
+                driver = self.driver
+            room_xpath = f"//span[text()='{self.room}']"
+            WebDriverWait(driver, 10).until(
+                EC.presence_of_element_located((By.XPATH, room_xpath))
             )
-            chat_button = self.driver.find_element(By.XPATH, "//span[text()='chatbot_HHH']")
+            chat_button = driver.find_element(By.XPATH, room_xpath)
             chat_button.click()
-            print("Navigated to chat room")
+            print(f"Navigated to chat room {self.room}")
         except Exception as e:
             print(f'Error navigating to chat: {str(e)}')
             raise
     
-    def _find_reply_msg_id(self, replied_to_username, preview_text):
+    def _wait_for_chat_container(self):
+        """Wait for the chat container and return it"""
+        print("Waiting for chat container to load...")
+        # Wait for the chat messages to load - updated selector for new structure
+        WebDriverWait(self.driver, 10).until(
+            EC.presence_of_element_located((By.XPATH, CHAT_CONTAINER_XPATH))
+        )
+        return self.driver.find_element(By.XPATH, CHAT_CONTAINER_XPATH)
+
+    def _find_message_elements(self, msg_container):
+        """Find the message elements inside the chat container"""
+        # Use more specific selectors to find only actual message containers
+        message_elements = []
+        
+        # Primary selector for the new message structure
+        primary_messages = msg_container.find_elements(By.XPATH, ".//div[contains(@class, 'group text-[#eaeaea]')]")
+        message_elements.extend(primary_messages)
+        
+        # Fallback selector for older message structures
+        if len(message_elements) == 0:
+            fallback_messages = msg_container.find_elements(By.XPATH, ".//div[contains(@class, 'text-[#eaeaea] rounded')]")
+            message_elements.extend(fallback_messages)
+        
+        return message_elements
+
+    def _snapshot_messages_js(self, msg_container, incremental=False, parse=True):
+        """
+        Extract messages in a single WebDriver round trip
+
+        Runs MESSAGE_SNAPSHOT_JS in the page and applies the same validation
+        and content parsing as the per-element path to its results.
+
+        Args:
+            msg_container: Chat container WebElement
+            incremental (bool, optional): Only extract nodes after the high-water mark
+            parse (bool, optional): Validate and parse the items; if False the raw
+                items are returned for _entries_from_snapshot
+
+        Returns:
+            list: Extracted entries with timestamp, username, content,
+                is_reply, replied_to and preview keys
+        """
+        snapshot = self.driver.execute_script(
+            MESSAGE_SNAPSHOT_JS, msg_container, self._scan_mark if incremental else None
+        )
+        self._anchored = incremental and snapshot["start"] > 0
+        if incremental and snapshot["start"] == 0 and snapshot["total"]:
+            print("No high-water mark in chat container, doing a full rescan")
+        print(f"Found {len(snapshot['items'])} potential message elements ({snapshot['total']} in container)")
+        if not parse:
+            return snapshot["items"]
+        return self._entries_from_snapshot(snapshot["items"])
+
+    def _entries_from_snapshot(self, items):
+        """Validate raw items returned by the injected scripts and parse their content"""
+        return entries_from_items(items)
+
+    def _extract_element_entry(self, msg_elem):
         """
-        Generate a message ID for the message being replied to using the same
-        message ID generation logic as for regular messages
+        Extract one message using per-element WebDriver calls
+
+        Returns None for elements that are not messages. Reply details are
+        only looked up for messages we have not seen before.
         """
-        if not replied_to_username:
+        # Quick validation: check if element has reasonable text content
+        element_text = msg_elem.text.strip()
+        if len(element_text) < 10:  # Skip elements with very short text
             return None
-            
-        # Check if we have messages from this user
-        if replied_to_username not in self.username_message_lookup:
+        
+        # Extract timestamp first - if we can't find one, skip this element
+        timestamp = self._extract_timestamp_fast(msg_elem)
+        if timestamp == "Unknown time":
             return None
-            
-        # Get all messages from the user being replied to
-        user_messages = self.username_message_lookup[replied_to_username]
         
-        # If we have a preview, try to match it with a message
-        if preview_text:
-            # Clean up preview text for better matching
-            preview_clean = preview_text.strip().lower()
+        # Extract username - if we can't find one, skip this element
+        username = self._extract_username_fast(msg_elem)
+        if username == "Unknown user" or len(username) < 2:
+            return None
+        
+        # Extract content
+        content = self._extract_content_fast(msg_elem, username)
+        if not content or len(content) < 2:
+            return None
+        
+        entry = {
+            "timestamp": timestamp,
+            "username": username,
+            "content": content,
+            "is_reply": False,
+            "replied_to": "",
+            "preview": ""
+        }
+        
+        # Known messages are skipped later, so don't pay for reply detection
+        if self._is_known(message_digest(self._entry_id(entry))):
+            return entry
+        
+        # Check if this is a reply message
+        if self._is_reply_message_fast(msg_elem):
+            reply_details = self._extract_reply_details_fast(msg_elem)
+            entry["is_reply"] = True
+            entry["replied_to"] = reply_details.get("replied_to", "")
+            entry["preview"] = reply_details.get("preview", "")
+        return entry
+
+    def _extract_entries_by_element(self, msg_container, incremental=False):
+        """
+        Extract messages with the per-element WebDriver path
+
+        Args:
+            msg_container: Chat container WebElement
+            incremental (bool, optional): Only extract elements after the last
+                processed one, plus incomplete ones from earlier polls
+        """
+        message_elements = self._find_message_elements(msg_container)
+        total = len(message_elements)
+        
+        # WebElement equality compares element ids locally, so finding the
+        # high-water mark costs no extra round trips. Search backward so old
+        # nodes dropped from the top of the container don't matter.
+        start = 0
+        retry_elements = []
+        self._anchored = False
+        if incremental and self._last_element is not None:
+            for index in range(total - 1, -1, -1):
+                if message_elements[index] == self._last_element:
+                    start = index + 1
+                    self._anchored = True
+                    break
+            else:
+                print("Chat container was re-rendered, doing a full rescan")
+                self._retry_elements = {}
+            retry_elements = [elem for elem in self._retry_elements if elem not in message_elements[start:]]
+        if incremental and total:
+            self._last_element = message_elements[-1]
+        
+        message_elements = retry_elements + message_elements[start:]
+        print(f"Found {len(message_elements)} potential message elements ({total} in container)")
+        
+        entries = []
+        for processed_count, msg_elem in enumerate(message_elements, 1):
+            try:
+                entry = self._extract_element_entry(msg_elem)
+                if entry:
+                    entries.append(entry)
+                    self._retry_elements.pop(msg_elem, None)
+                elif incremental:
+                    # Possibly caught mid-render, read it again on the next two polls
+                    polls_left = self._retry_elements.get(msg_elem, 3) - 1
+                    if polls_left > 0:
+                        self._retry_elements[msg_elem] = polls_left
+                    else:
+                        self._retry_elements.pop(msg_elem, None)
+            except Exception as e:
+                self._retry_elements.pop(msg_elem, None)
+                # Only log errors for the first few elements to avoid spam
+                if processed_count <= 10:
+                    print(f"Error processing message element {processed_count}: {str(e)}")
+                continue
+        return entries
+
+    def _is_known(self, digest):
+        """Whether a message digest has already been processed in this room"""
+        return digest ^ self.dedup_salt in self.known_messages
+
+    def _entry_id(self, entry):
+        """Message ID of an extracted entry"""
+        return entry_id(entry, self._generate_message_id)
+
+    def _dedup_entries(self, entries):
+        """
+        Drop entries already known in this room and mark the rest as known
+
+        Returns:
+            list: (entry, msg_id, digest) tuples for the new entries, in order
+        """
+        unseen = []
+        for entry in entries:
+            # Create message ID and check if we've seen it before
+            msg_id = self._entry_id(entry)
+            digest = message_digest(msg_id)
+            if self._is_known(digest):
+                continue
             
-            # Try to find a message that contains the preview text
-            for msg in reversed(user_messages):  # Start with most recent
-                content = msg.get("content", "").strip().lower()
-                if preview_clean in content or content.startswith(preview_clean):
-                    # Re-generate message ID using the same logic for consistency
-                    timestamp = msg.get("timestamp", "")
-                    username = msg.get("username", "")
-                    content = msg.get("content", "")
-                    return self._generate_message_id(timestamp, username, content)
-        
-        # If we can't find a specific match or there's no preview,
-        # just use the most recent message from this user
-        if user_messages:
-            latest_msg = user_messages[-1]
-            timestamp = latest_msg.get("timestamp", "")
-            username = latest_msg.get("username", "")
-            content = latest_msg.get("content", "")
-            return self._generate_message_id(timestamp, username, content)
+            # Add to known messages immediately
+            self.known_messages.add(digest ^ self.dedup_salt)
+            unseen.append((entry, msg_id, digest))
+        return unseen
+
+    def _link_entry(self, entry, msg_id, digest):
+        """Resolve a new entry's reply target and build its log record"""
+        # Shared with parse_snapshot, which also adds it to the reply index
+        message_data = link_entry(entry, msg_id, digest, self.reply_index, self.readable_ids)
+        self.message_data.append(message_data)
+        return message_data
+
+    def _build_record(self, entry, msg_id, digest, reply_msg_id=None):
+        """Build the log record for an extracted entry"""
+        return build_record(entry, msg_id, digest, reply_msg_id, self.readable_ids)
+
+    def _link_entries(self, unseen):
+        """Build log records for deduplicated entries, printing the first few"""
+        new_messages = []
+        for entry, msg_id, digest in unseen:
+            message_data = self._link_entry(entry, msg_id, digest)
+            new_messages.append(message_data)
             
-        return None
-    
+            # Print new message (but limit output for performance)
+            if len(new_messages) <= 5:  # Only show first 5 new messages
+                reply_indicator = f"[REPLY to {message_data.get('replied_to', '')}] " if message_data["isReply"] else ""
+                print(f"New message: [{message_data['timestamp']}] {reply_indicator}{message_data['username']}: {message_data['content'][:50]}...")
+        return new_messages
+
+    def _process_entries(self, entries):
+        """Dedup extracted entries, resolve replies and persist the new messages"""
+        new_messages = self._link_entries(self._dedup_entries(entries))
+        
+        # Save the whole batch at once; only the new records are written
+        self._save_to_master_log(new_messages)
+        return new_messages
+
+    def _record_poll(self, seen, new, anchored):
+        """Keep the counts of a finished poll in last_poll for the poll scheduler"""
+        # Without an anchor to the previous poll, a scan where nothing was
+        # already known means messages scrolled out between the two polls
+        gap = self.last_poll is not None and not anchored and seen > 0 and new == seen
+        self.last_poll = {
+            "seen": seen,
+            "new": new,
+            "anchored": anchored,
+            "gap": gap,
+        }
+
+    def capture(self):
+        """
+        Read new message nodes from the page, the WebDriver half of a poll
+
+        Returns:
+            tuple: (items, parsed) where items are raw snapshot items for
+                _entries_from_snapshot, or parsed entries if parsed is True
+        """
+        self._activate()
+        msg_container = self._wait_for_chat_container()
+        
+        if self.extraction_mode == "js":
+            try:
+                return self._snapshot_messages_js(msg_container, self.incremental, parse=False), False
+            except Exception as e:
+                print(f"JavaScript snapshot failed, falling back to per-element extraction: {str(e)}")
+        return self._extract_entries_by_element(msg_container, self.incremental), True
+
     def get_chat_messages(self):
         """Extract all chat messages from the page"""
         try:
-            print("Waiting for chat container to load...")
-            # Wait for the chat messages to load - updated selector for new structure
-            WebDriverWait(self.driver, 10).until(
-                EC.presence_of_element_located((By.XPATH, "//div[@class='absolute flex bg-[#121212] flex-col top-[50px] right-0 left-0 bottom-0 pt-[10px] px-[10px] m-0 overflow-x-hidden overflow-y-scroll']"))
-            )
-            
-            msg_container = self.driver.find_element(By.XPATH, "//div[@class='absolute flex bg-[#121212] flex-col top-[50px] right-0 left-0 bottom-0 pt-[10px] px-[10px] m-0 overflow-x-hidden overflow-y-scroll']")
-            
-            # Use more specific selectors to find only actual message containers
-            message_elements = []
-            
-            # Primary selector for the new message structure
-            primary_messages = msg_container.find_elements(By.XPATH, ".//div[contains(@class, 'group text-[#eaeaea]')]")
-            message_elements.extend(primary_messages)
-            
-            # Fallback selector for older message structures
-            if len(message_elements) == 0:
-                fallback_messages = msg_container.find_elements(By.XPATH, ".//div[contains(@class, 'text-[#eaeaea] rounded')]")
-                message_elements.extend(fallback_messages)
-            
-            print(f"Found {len(message_elements)} potential message elements")
-            
-            new_messages = []
-            processed_count = 0
-            
-            for msg_elem in message_elements:
-                try:
-                    processed_count += 1
-                    
-                    # Quick validation: check if element has reasonable text content
-                    element_text = msg_elem.text.strip()
-                    if len(element_text) < 10:  # Skip elements with very short text
-                        continue
-                    
-                    # Extract timestamp first - if we can't find one, skip this element
-                    timestamp = self._extract_timestamp_fast(msg_elem)
-                    if timestamp == "Unknown time":
-                        continue
-                    
-                    # Extract username - if we can't find one, skip this element
-                    username = self._extract_username_fast(msg_elem)
-                    if username == "Unknown user" or len(username) < 2:
-                        continue
-                    
-                    # Extract content
-                    content = self._extract_content_fast(msg_elem, username)
-                    if not content or len(content) < 2:
-                        continue
-                    
-                    # Create message ID and check if we've seen it before
-                    msg_id = self._generate_message_id(timestamp, username, content)
-                    if msg_id in self.known_messages:
-                        continue
-                    
-                    # Check if this is a reply message
-                    is_reply = self._is_reply_message_fast(msg_elem)
-                    reply_details = self._extract_reply_details_fast(msg_elem) if is_reply else {}
-                    
-                    # Add to known messages immediately
-                    self.known_messages.add(msg_id)
-                    
-                    # Find reply_msg_id if this is a reply
-                    reply_msg_id = None
-                    if is_reply:
-                        replied_to = reply_details.get("replied_to", "")
-                        preview = reply_details.get("preview", "")
-                        reply_msg_id = self._find_reply_msg_id(replied_to, preview)
-                    
-                    message_data = {
-                        "date": datetime.now().strftime('%Y%m%d'),
-                        "timestamp": timestamp,
-                        "username": username,
-                        "content": content,
-                        "isReply": is_reply,
-                        "msg_id": msg_id
-                    }
-                    
-                    # Add reply details if this is a reply
-                    if is_reply:
-                        message_data["replied_to"] = reply_details.get("replied_to", "")
-                        message_data["reply_msg_id"] = reply_msg_id
-                        
-                    new_messages.append(message_data)
-                    self.message_data.append(message_data)
-                    
-                    # Add to username lookup for future reply message identification
-                    if username not in self.username_message_lookup:
-                        self.username_message_lookup[username] = []
-                    self.username_message_lookup[username].append(message_data)
-                    
-                    # Save immediately after each new message is found
-                    self._save_to_master_log()
-                    
-                    # Print new message (but limit output for performance)
-                    if len(new_messages) <= 5:  # Only show first 5 new messages
-                        reply_indicator = f"[REPLY to {message_data.get('replied_to', '')}] " if is_reply else ""
-                        print(f"New message: [{timestamp}] {reply_indicator}{username}: {content[:50]}...")
-                        
-                except Exception as e:
-                    # Only log errors for the first few elements to avoid spam
-                    if processed_count <= 10:
-                        print(f"Error processing message element {processed_count}: {str(e)}")
-                    continue
+            items, parsed = self.capture()
+            entries = items if parsed else self._entries_from_snapshot(items)
             
-            print(f"Processed {processed_count} elements, found {len(new_messages)} new messages")
+            new_messages = self._process_entries(entries)
+            print(f"Processed {len(entries)} messages, found {len(new_messages)} new messages")
+            self._record_poll(len(entries), len(new_messages), self._anchored)
             return new_messages
             
         except Exception as e:
@@ -343,6 +838,128 @@ class ChatScraper:
             print(f'Full traceback: {traceback.format_exc()}')
             raise
 
+    def start_push_capture(self):
+        """
+        Install a MutationObserver on the chat container and catch up on its contents
+
+        Messages added after this call are queued in the page and collected
+        by get_pushed_messages; messages already on screen are captured by
+        a normal scan here.
+
+        Returns:
+            list: New messages found by the catch-up scan
+        """
+        self._install_observer()
+        
+        # Installed before the scan, so nothing added in between is missed;
+        # overlap with the queue is dropped by the known message check
+        return self.get_chat_messages()
+
+    def _install_observer(self):
+        self._activate()
+        msg_container = self._wait_for_chat_container()
+        self.driver.execute_script(PUSH_INSTALL_JS, msg_container)
+        print("Installed chat observer")
+
+    def capture_pushed(self, timeout=5.0):
+        """
+        Wait up to timeout seconds for nodes queued by the chat observer
+
+        The WebDriver half of get_pushed_messages. If the container was
+        re-rendered the observer is reinstalled and the chat rescanned.
+
+        Args:
+            timeout (float, optional): Seconds to wait for new messages
+
+        Returns:
+            tuple: (items, parsed) as returned by capture()
+        """
+        self._activate()
+        # The script has to be allowed to run longer than the long-poll
+        self.driver.set_script_timeout(timeout + 10)
+        items = self.driver.execute_async_script(PUSH_DRAIN_JS, int(timeout * 1000))
+        if items is None:
+            print("Chat observer lost, reinstalling")
+            self._install_observer()
+            return self.capture()
+        return items, False
+
+    def get_pushed_messages(self, timeout=5.0):
+        """
+        Wait up to timeout seconds for messages queued by the chat observer
+
+        Returns as soon as anything is queued, so capture latency is well
+        under a second while an idle chat costs one call per timeout.
+        If the container was re-rendered the observer is reinstalled and
+        the chat rescanned.
+
+        Args:
+            timeout (float, optional): Seconds to wait for new messages
+
+        Returns:
+            list: New messages
+        """
+        items, parsed = self.capture_pushed(timeout)
+        if not items:
+            return []
+        entries = items if parsed else self._entries_from_snapshot(items)
+        new_messages = self._process_entries(entries)
+        print(f"Processed {len(entries)} pushed messages, found {len(new_messages)} new messages")
+        return new_messages
+
+    def dump_snapshot(self, path=None):
+        """
+        Save the chat container's HTML for offline parsing with html_snapshot
+
+        Args:
+            path (str, optional): File to write, by default a timestamped file in
+                the log directory's snapshots folder
+
+        Returns:
+            str: Path of the snapshot
+        """
+        self._activate()
+        msg_container = self._wait_for_chat_container()
+        html = msg_container.get_attribute("outerHTML")
+        if path is None:
+            snapshot_dir = os.path.join(self.log_directory, "snapshots")
+            os.makedirs(snapshot_dir, exist_ok=True)
+            path = os.path.join(snapshot_dir, f"snapshot_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(html)
+        print(f"Saved chat snapshot to {path}")
+        return path
+
+    def check_extraction_parity(self):
+        """
+        Compare the JavaScript snapshot against the per-element path on the current page
+
+        Returns:
+            list: (index, snapshot_entry, element_entry) tuples for every mismatch
+        """
+        self._activate()
+        msg_container = self._wait_for_chat_container()
+        snapshot_entries = self._snapshot_messages_js(msg_container)
+        
+        # Reply details are only extracted for unknown messages, so compare
+        # against an empty known set to get them for every element
+        known_messages = self.known_messages
+        self.known_messages = set()
+        try:
+            element_entries = self._extract_entries_by_element(msg_container)
+        finally:
+            self.known_messages = known_messages
+        
+        mismatches = []
+        for i in range(max(len(snapshot_entries), len(element_entries))):
+            js_entry = snapshot_entries[i] if i < len(snapshot_entries) else None
+            elem_entry = element_entries[i] if i < len(element_entries) else None
+            if js_entry != elem_entry:
+                mismatches.append((i, js_entry, elem_entry))
+        
+        print(f"Parity check: {len(snapshot_entries)} snapshot vs {len(element_entries)} element entries, {len(mismatches)} mismatches")
+        return mismatches
+
     def _extract_timestamp_fast(self, msg_elem):
         """Fast timestamp extraction with minimal processing"""
         try:
@@ -408,29 +1025,7 @@ class ChatScraper:
 
     def _parse_content_from_full_text_fast(self, full_text, username):
         """Fast content parsing with minimal processing"""
-        if not full_text:
-            return ""
-        
-        # Strategy 1: Look for "username: content" pattern
-        if username and username in full_text and ":" in full_text:
-            username_pos = full_text.find(username)
-            if username_pos != -1:
-                colon_pos = full_text.find(":", username_pos)
-                if colon_pos != -1:
-                    content = full_text[colon_pos + 1:].strip()
-                    if content:
-                        return content
-        
-        # Strategy 2: Look for any colon and take what comes after
-        if ":" in full_text:
-            parts = full_text.split(":")
-            if len(parts) > 1:
-                content = parts[-1].strip()
-                if content:
-                    return content
-        
-        # Strategy 3: Return the full text as fallback
-        return full_text.strip()
+        return parse_content(full_text, username)
 
     def _is_reply_message_fast(self, msg_elem):
         """Fast reply detection with minimal processing"""
@@ -478,40 +1073,50 @@ class ChatScraper:
         except:
             return {"replied_to": "", "preview": ""}
 
-    def _save_to_master_log(self):
-        """Internal method to safely save messages to the master log in real-time"""
+    def _save_to_master_log(self, new_messages):
+        """Internal method to append new messages to the session and master logs in real-time"""
+        if not new_messages:
+            return
         try:
-            # First save to session log as backup
-            with open(self.session_log, 'w') as f:
-                json.dump(self.message_data, f, indent=2)
+            if self.writer is not None:
+                # Returns immediately; the writer thread does the disk I/O
+                self.writer.append(new_messages)
+                return
             
-            # Create a temporary copy of the master log
-            temp_log = f"{self.master_log}.temp"
-            
-            # Copy master log to temp if it exists
-            if os.path.exists(self.master_log):
-                shutil.copy2(self.master_log, temp_log)
-            
-            # Write updated data to temp file
-            with open(temp_log, 'w') as f:
-                json.dump(self.message_data, f, indent=2)
+            # First save to session log as backup
+            self.session_storage.append(new_messages)
             
-            # Replace the master log with the temp file
-            if os.path.exists(temp_log):
-                os.replace(temp_log, self.master_log)
+            # Only the new records are written; the log is never rewritten here
+            self.storage.append(new_messages)
                 
         except Exception as e:
+            self.write_failed = True
             print(f"Error saving to master log: {str(e)}")
 
+    def flush_logs(self):
+        """Block until every new message so far is written to the logs"""
+        if self.writer is not None:
+            self.writer.flush()
+        self.storage.flush()
+        self.session_storage.flush()
+
     def get_new_messages(self):
         """Check for new messages that we haven't seen before"""
         new_messages = self.get_chat_messages()
         return new_messages
     
     def save_messages_to_file(self, filename=None):
-        """Save all collected messages to a JSON file"""
+        """
+        Save all collected messages to a file
+
+        Without a filename this just flushes the logs, since every new
+        message is already appended to the master log. With one, writes a
+        snapshot: JSON Lines for a .jsonl name, otherwise a JSON array.
+        """
+        self.flush_logs()
         if filename is None:
-            filename = self.master_log
+            print(f"Messages saved to {self.master_log}")
+            return True
             
         try:
             # Create a backup copy first
@@ -520,9 +1125,8 @@ class ChatScraper:
                 shutil.copy2(filename, backup_filename)
                 print(f"Created backup of log file at {backup_filename}")
             
-            # Now save the updated file
-            with open(filename, 'w') as f:
-                json.dump(self.message_data, f, indent=2)
+            # Now save the updated file from the full history in the master log
+            write_records(filename, self.storage.load())
             print(f"Messages saved to {filename}")
             return True
         except Exception as e:
@@ -530,6 +1134,19 @@ class ChatScraper:
             return False
 
 
+def print_new_messages(new_messages):
+    """Print a short summary of a batch of new messages"""
+    print(f"Found {len(new_messages)} new messages")
+    
+    # Print first few new messages to console
+    for i, msg in enumerate(new_messages[:3]):  # Only show first 3
+        reply_indicator = f"[REPLY to {msg.get('replied_to', '')}] " if msg.get("isReply", False) else ""
+        print(f"[{msg['timestamp']}] {reply_indicator}{msg['username']}: {msg['content'][:50]}...")
+    
+    if len(new_messages) > 3:
+        print(f"... and {len(new_messages) - 3} more messages")
+
+
 def main():
     try:
         # Import configuration
@@ -538,8 +1155,76 @@ def main():
         print("Error: Could not find config.py. Please copy config.template.py to config.py and update with your credentials.")
         return
     
+    # Optional settings, older config.py files may not have them
+    import config
+    capture_mode = getattr(config, "CAPTURE_MODE", "poll")
+    push_mode = capture_mode == "push"
+    storage_backend = getattr(config, "STORAGE_BACKEND", "jsonl")
+    rooms = getattr(config, "ROOMS", [DEFAULT_ROOM])
+    multi_room = len(rooms) > 1
+    poll_min_interval = getattr(config, "POLL_MIN_INTERVAL", 2.0)
+    poll_max_interval = getattr(config, "POLL_MAX_INTERVAL", 30.0)
+    use_pipeline = getattr(config, "PIPELINE", "sync") == "async"
+    browser_options = {
+        "browser_profile": getattr(config, "BROWSER_PROFILE", "default"),
+        "blocked_urls": getattr(config, "BLOCKED_URLS", None),
+    }
+    headless = getattr(config, "HEADLESS", False)
+    # Minutes between saved chat HTML snapshots for offline parsing, 0 for none
+    snapshot_interval = getattr(config, "SNAPSHOT_INTERVAL", 0) * 60
+    network_mode = capture_mode == "network"
+    if network_mode and multi_room:
+        print("Network capture reads a single room, polling the page for multiple rooms")
+        network_mode = False
+    # The frame decoder has to be pinned to the chat socket before anything it
+    # decodes is saved; otherwise network capture is record/replay only
+    network_url_filter = getattr(config, "NETWORK_URL_FILTER", None)
+    network_user_fields = getattr(config, "NETWORK_USER_FIELDS", None)
+    network_text_fields = getattr(config, "NETWORK_TEXT_FIELDS", None)
+    if network_mode and not (network_url_filter or (network_user_fields and network_text_fields)):
+        print("Network capture needs NETWORK_URL_FILTER or NETWORK_USER_FIELDS and NETWORK_TEXT_FIELDS, "
+              "checked against a fixture from 'python network_capture.py record'; polling the page instead")
+        network_mode = False
+    browser_options["performance_log"] = network_mode
+    # Seconds between DOM scans that check the frame decoder isn't missing messages
+    network_dom_interval = getattr(config, "NETWORK_DOM_INTERVAL", 60)
+    # Minutes between search index updates, 0 for none
+    search_interval = getattr(config, "SEARCH_INDEX_INTERVAL", 0) * 60
+    if search_interval and (multi_room or storage_backend != "jsonl"):
+        print("The search index covers a single room's JSONL master log, not updating it")
+        search_interval = 0
+    if use_pipeline and (multi_room or network_mode):
+        print("The async pipeline captures a single room from the page, using the synchronous loop")
+        use_pipeline = False
+    
+    def make_storage(log_directory=LOG_DIRECTORY):
+        if storage_backend == "sqlite":
+            os.makedirs(log_directory, exist_ok=True)
+            return SqliteMessageStore(os.path.join(log_directory, "MASTER_LOG.sqlite3"))
+        return None  # ChatScraper's default JSONL log
+    
+    def make_scraper():
+        if multi_room:
+            from multiroom import MultiRoomScraper
+            return MultiRoomScraper(GODEL_URL, rooms, GODEL_USERNAME, GODEL_PASSWORD, LOG_DIRECTORY, headless,
+                                    min_interval=poll_min_interval, max_interval=poll_max_interval,
+                                    storage_factory=make_storage, **browser_options)
+        return ChatScraper(GODEL_URL, GODEL_USERNAME, GODEL_PASSWORD, LOG_DIRECTORY, headless,
+                           storage=make_storage(), room=rooms[0], **browser_options)
+    
     # Create the scraper
-    scraper = ChatScraper(GODEL_URL, GODEL_USERNAME, GODEL_PASSWORD, LOG_DIRECTORY)
+    scraper = make_scraper()
+    # Logged-in standby browsers to fail over to instead of restarting
+    from driver_pool import DriverPool
+    pool = DriverPool(scraper, standby=getattr(config, "STANDBY_BROWSERS", 1))
+    # Poll interval from chat activity, and backoff on errors
+    from poll_scheduler import PollScheduler
+    scheduler = PollScheduler(poll_min_interval, poll_max_interval)
+    # Search index caught up with the master log from a background thread
+    indexer = None
+    if search_interval:
+        from search_index import BackgroundIndexer, SearchIndex
+        indexer = BackgroundIndexer(SearchIndex(scraper.storage.path), search_interval)
     
     try:
         # Login and navigate to the chat
@@ -548,103 +1233,121 @@ def main():
         
         # Get initial messages
         print("Getting initial messages...")
-        initial_messages = scraper.get_chat_messages()
+        if push_mode:
+            initial_messages = scraper.start_push_capture()
+        else:
+            initial_messages = scraper.get_chat_messages()
         print(f"Found {len(initial_messages)} initial messages")
         print(f"Initial messages saved to {scraper.master_log}")
+        pool.start()
+        if indexer is not None:
+            indexer.start()
     
         # Monitor the chat continuously with optimized frequency
         print(f"Starting chat monitoring. Logs will be saved to {scraper.master_log}")
+        if use_pipeline:
+            import asyncio
+            from async_pipeline import AsyncPipeline
+            pipeline = AsyncPipeline(scraper, scheduler, push_mode, failover=lambda: pool.failover(push_mode),
+                                     on_messages=print_new_messages, maintain=pool.maintain)
+            try:
+                # Returns once interrupted, after everything captured is written
+                asyncio.run(pipeline.run())
+            except KeyboardInterrupt:
+                print("\nMonitoring stopped by user")
+            pipeline.report()
+            scraper.flush_logs()
+            return
+        
         consecutive_errors = 0
         max_consecutive_errors = 5
+        next_snapshot = time.monotonic()
+        if network_mode:
+            from network_capture import ChatFrameDecoder, NetworkCapture
+            network = NetworkCapture(scraper, ChatFrameDecoder(
+                room=scraper.room, user_fields=network_user_fields, text_fields=network_text_fields,
+                url_filter=network_url_filter
+            ))
+            next_dom_scan = time.monotonic() + network_dom_interval
         
         try:
             while True:
+                error_delay = None
                 try:
-                    # Check for new messages every 10 seconds (reduced from 5 for better performance)
-                    new_messages = scraper.get_new_messages()
+                    if push_mode:
+                        # Long-poll the observer queue; returns as soon as messages arrive
+                        new_messages = scraper.get_pushed_messages()
+                    elif network_mode:
+                        # Frames queue up in the browser's log, so none are missed between reads
+                        new_messages = network.get_new_messages()
+                        if time.monotonic() >= next_dom_scan:
+                            next_dom_scan = time.monotonic() + network_dom_interval
+                            network.check_page()
+                    else:
+                        new_messages = scraper.get_new_messages()
+                        if not multi_room:
+                            last_poll = scraper.last_poll or {}
+                            scheduler.record_poll(len(new_messages), last_poll.get("seen"),
+                                                  last_poll.get("anchored", False), last_poll.get("gap", False))
                     
                     if new_messages:
-                        # Print summary of new messages
-                        print(f"Found {len(new_messages)} new messages")
-                        
-                        # Print first few new messages to console
-                        for i, msg in enumerate(new_messages[:3]):  # Only show first 3
-                            reply_indicator = f"[REPLY to {msg.get('replied_to', '')}] " if msg.get("isReply", False) else ""
-                            print(f"[{msg['timestamp']}] {reply_indicator}{msg['username']}: {msg['content'][:50]}...")
-                        
-                        if len(new_messages) > 3:
-                            print(f"... and {len(new_messages) - 3} more messages")
-                        
+                        print_new_messages(new_messages)
                         consecutive_errors = 0  # Reset error counter on success
                     else:
                         # Only print status every 10 checks to reduce noise
-                        if consecutive_errors == 0:
+                        if consecutive_errors == 0 and not push_mode and not network_mode:
                             print("No new messages found")
                     
                 except Exception as e:
                     consecutive_errors += 1
                     print(f"Error checking for new messages (attempt {consecutive_errors}): {str(e)}")
+                    error_delay = scheduler.error_delay(consecutive_errors)
                     
                     if consecutive_errors >= max_consecutive_errors:
-                        print(f"Too many consecutive errors ({consecutive_errors}), restarting browser...")
-                        scraper.close()
-                        time.sleep(5)
-                        scraper = ChatScraper(GODEL_URL, GODEL_USERNAME, GODEL_PASSWORD)
-                        scraper.login()
-                        scraper.navigate_to_chat()
-                        consecutive_errors = 0
+                        print(f"Too many consecutive errors ({consecutive_errors}), switching to standby browser...")
+                        try:
+                            # Keeps the in-memory dedup state and logs; only the browser changes
+                            replayed = pool.failover(push_mode)
+                            print(f"Recovered {len(replayed)} messages from scrollback")
+                            consecutive_errors = 0
+                        except Exception as e:
+                            print(f"Failover failed, will retry: {str(e)}")
+                
+                pool.maintain()
                 
-                time.sleep(10)  # Check every 10 seconds instead of 5
+                if snapshot_interval and not multi_room and time.monotonic() >= next_snapshot:
+                    next_snapshot = time.monotonic() + snapshot_interval
+                    try:
+                        scraper.dump_snapshot()
+                    except Exception as e:
+                        print(f"Error saving chat snapshot: {str(e)}")
+                
+                if error_delay is not None:
+                    time.sleep(error_delay)  # Back off, also in push mode so errors don't spin
+                elif network_mode:
+                    time.sleep(1)
+                elif not push_mode:
+                    if multi_room:
+                        time.sleep(scraper.seconds_until_due())  # Rooms are polled by activity
+                    else:
+                        time.sleep(scheduler.interval)
                 
         except KeyboardInterrupt:
             print("\nMonitoring stopped by user")
+            # Make sure everything captured so far is on disk before shutting down
+            scraper.flush_logs()
             
     except Exception as e:
         print(f"Error in main: {str(e)}")
     
     finally:
         # Always close the browser
+        pool.close()
         scraper.close()
+        if indexer is not None:
+            indexer.close()  # After the logs are closed, so it covers everything
         print("Script finished. Chat logs saved to master log.")
 
 
-def test_ticker_content_removal():
-    """Test function to verify ticker content removal works correctly"""
-    scraper = ChatScraper("dummy_url")  # Create instance just for testing
-    
-    # Test cases
-    test_cases = [
-        ("ES1 (D)\n+0.04%", "ES1 (D)\n[PRICE]%"),
-        ("ES1 (D)\n+0.05%", "ES1 (D)\n[PRICE]%"),
-        ("ES1 (D)\n-0.12%", "ES1 (D)\n[PRICE]%"),
-        ("VIX (D)\n+5.23%", "VIX (D)\n[PRICE]%"),
-        ("SPY\n+1.45%", "SPY\n[PRICE]%"),
-        ("Hello world", "Hello world"),  # Should not change
-        ("ES1 (D)\n+0.04%\nSome additional text", "ES1 (D)\n[PRICE]%\nSome additional text")
-    ]
-    
-    print("Testing ticker content removal:")
-    for original, expected in test_cases:
-        result = scraper._remove_ticker_content(original)
-        status = "✓" if result == expected else "✗"
-        print(f"{status} '{original}' -> '{result}' (expected: '{expected}')")
-    
-    # Test message ID generation
-    print("\nTesting message ID generation:")
-    timestamp = "7:45 PM"
-    username = "mas1"
-    
-    content1 = "ES1 (D)\n+0.04%"
-    content2 = "ES1 (D)\n+0.05%"
-    
-    id1 = scraper._generate_message_id(timestamp, username, content1)
-    id2 = scraper._generate_message_id(timestamp, username, content2)
-    
-    print(f"ID1: {id1}")
-    print(f"ID2: {id2}")
-    print(f"IDs are equal: {id1 == id2} (should be True)")
-
 if __name__ == "__main__":
-    # Uncomment the line below to run the test
-    # test_ticker_content_removal()
     main() 
\ No newline at end of file
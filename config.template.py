@@ -5,3 +5,62 @@ GODEL_URL = "https://app.godelterminal.com/"
 GODEL_USERNAME = "your_email@example.com"
 GODEL_PASSWORD = "your_password" 
 LOG_DIRECTORY = ""C:/Users/......"
+
+# Optional: "poll" rescans the chat as often as it's active, "push" captures new
+# messages as they appear using a MutationObserver in the page, "network"
+# decodes them from the page's WebSocket frames (see network_capture.py)
+CAPTURE_MODE = "poll"
+
+# Optional: "jsonl" keeps the master log as MASTER_LOG.jsonl, "sqlite" stores
+# it in MASTER_LOG.sqlite3 with indexes on date, username and reply links
+# (use chat_logs/import_sqlite.py to import existing logs)
+STORAGE_BACKEND = "jsonl"
+
+# Optional: chat rooms to capture. With more than one, each room gets a tab
+# in the same browser and its own log partition under LOG_DIRECTORY/rooms/
+ROOMS = ["chatbot_HHH"]
+
+# Optional: logged-in browsers kept ready to take over instantly if the
+# active one keeps failing (0 starts one only when needed)
+STANDBY_BROWSERS = 1
+
+# Optional: bounds in seconds for the poll interval, which follows how fast
+# new messages arrive and backs off exponentially after errors
+POLL_MIN_INTERVAL = 2.0
+POLL_MAX_INTERVAL = 30.0
+
+# Optional: "async" runs capture, parsing, dedup, reply linking and writes as
+# concurrent asyncio stages so a slow write never delays the next poll
+# (single room only); "sync" is the original one-step-at-a-time loop
+PIPELINE = "sync"
+
+# Optional: run Chrome without a window
+HEADLESS = False
+
+# Optional: "lean" runs Chrome in the new headless mode (with HEADLESS) and
+# blocks images, fonts and media and turns off GPU and extensions, which
+# the chat doesn't need; "default" keeps the original browser settings
+BROWSER_PROFILE = "default"
+
+# Optional: extra URL patterns the browser won't load, e.g. the data feeds
+# of terminal panels other than the chat ("*" matches anything)
+BLOCKED_URLS = []
+
+# Optional: minutes between saving the chat container's HTML to
+# LOG_DIRECTORY/snapshots for offline parsing and benchmarks (0 for never)
+SNAPSHOT_INTERVAL = 0
+
+# Optional, network capture: only decode frames from WebSocket URLs containing
+# this, and/or the frame keys holding the sender and the text, e.g.
+# ("username",) and ("message",). Check them against a fixture recorded with
+# python network_capture.py record; with neither set, CAPTURE_MODE "network"
+# falls back to polling. Also seconds between page scans that report
+# messages the frame decoder missed.
+NETWORK_URL_FILTER = None
+NETWORK_USER_FIELDS = None
+NETWORK_TEXT_FIELDS = None
+NETWORK_DOM_INTERVAL = 60
+
+# Optional: minutes between updates of the full-text search index over the
+# master log (search with python search_index.py query ...), 0 for none
+SEARCH_INDEX_INTERVAL = 0
@@ -0,0 +1,95 @@
+import time
+
+import pytest
+
+from html_snapshot import entries_from_items, entry_id, link_entry
+from message_ids import digest_to_key, generate_message_id, message_digest
+from reply_index import ReplyIndex
+
+
+def _make_msg(content, timestamp="5:03 PM", username="VirtualEdge", date="20250923", keyed=False, **extra):
+    msg = {
+        "date": date,
+        "timestamp": timestamp,
+        "username": username,
+        "content": content,
+        "isReply": False,
+        "msg_id": f"{timestamp}_{username}_{content}",
+    }
+    if keyed:
+        msg["msg_key"] = digest_to_key(message_digest(msg["msg_id"]))
+    msg.update(extra)
+    return msg
+
+
+class FakeScraper:
+    """
+    ChatScraper's capture, dedup, linking and logging hooks, without a browser
+
+    capture() serves one new message per call as raw snapshot items, and
+    saved collects the records that would have been written to the logs.
+    """
+
+    readable_ids = True
+
+    def __init__(self, known=(), write_delay=0.0):
+        self.write_delay = write_delay
+        self.known = {message_digest(self._entry_id(entry)) for entry in known}
+        self.saved = []
+        self.captures = 0
+        self.last_poll = None
+        self.reply_index = ReplyIndex(self._generate_message_id)
+        self._anchored = True
+
+    def capture(self):
+        self.captures += 1
+        content = f"message {self.captures}"
+        return [{"text": f"VirtualEdge 5:03 PM {content}", "timestamp": "5:03 PM", "username": "VirtualEdge",
+                 "content": content}], False
+
+    def _entries_from_snapshot(self, items):
+        return entries_from_items(items)
+
+    def _generate_message_id(self, timestamp, username, content):
+        return generate_message_id(timestamp, username, content)
+
+    def _entry_id(self, entry):
+        return entry_id(entry, self._generate_message_id)
+
+    def _is_known(self, digest):
+        return digest in self.known
+
+    def _dedup_entries(self, entries):
+        unseen = []
+        for entry in entries:
+            msg_id = self._entry_id(entry)
+            digest = message_digest(msg_id)
+            if digest not in self.known:
+                self.known.add(digest)
+                unseen.append((entry, msg_id, digest))
+        return unseen
+
+    def _record_poll(self, seen, new, anchored):
+        self.last_poll = {"seen": seen, "new": new, "anchored": anchored, "gap": False}
+
+    def _link_entries(self, unseen):
+        return [link_entry(entry, msg_id, digest, self.reply_index) for entry, msg_id, digest in unseen]
+
+    def _save_to_master_log(self, new_messages):
+        time.sleep(self.write_delay)
+        self.saved.extend(new_messages)
+
+
+@pytest.fixture
+def make_msg():
+    """
+    Factory for log records: make_msg(content, timestamp="5:03 PM", username="VirtualEdge",
+    date="20250923", keyed=False, **extra); keyed adds the msg_key of its msg_id
+    """
+    return _make_msg
+
+
+@pytest.fixture
+def make_scraper():
+    """FakeScraper(known=(), write_delay=0.0), known being entries already in the logs"""
+    return FakeScraper
@@ -0,0 +1,140 @@
+"""
+Standby browsers for instant failover
+
+Restarting after repeated errors used to mean quitting Chrome, waiting,
+building a new scraper (reloading the master log) and logging in again,
+losing tens of seconds of messages. A DriverPool keeps logged-in browsers
+ready in the background; on failover the scraper keeps its in-memory
+state, moves to a standby browser and rescans the visible scrollback to
+fill the gap.
+"""
+import threading
+import time
+
+
+class _Standby:
+    """A prepared browser and the window handles prepare_driver() returned"""
+
+    def __init__(self, driver, window_handles):
+        self.driver = driver
+        self.window_handles = window_handles
+        self.created = time.monotonic()
+
+
+class DriverPool:
+    def __init__(self, scraper, standby=1, max_age=1800.0):
+        """
+        Keep prepared standby browsers for a scraper
+
+        Standbys are built on a background thread with the scraper's
+        create_driver() and prepare_driver(), so the capture loop never
+        waits for Chrome to start or for a login. A standby older than
+        max_age is replaced, since an idle session can be logged out.
+
+        Args:
+            scraper (ChatScraper or MultiRoomScraper): Scraper to fail over
+            standby (int, optional): Standby browsers to keep ready; 0 builds one
+                only when failing over
+            max_age (float, optional): Seconds before a standby is replaced
+        """
+        self.scraper = scraper
+        self.standby = standby
+        self.max_age = max_age
+        self._ready = []
+        self._building = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def start(self):
+        """Start building standby browsers in the background"""
+        self.maintain()
+
+    def maintain(self):
+        """Replace stale standbys and top the pool up; cheap enough to call every poll"""
+        with self._lock:
+            if self._closed:
+                return
+            now = time.monotonic()
+            stale = [standby for standby in self._ready if now - standby.created > self.max_age]
+            self._ready = [standby for standby in self._ready if standby not in stale]
+            missing = self.standby - len(self._ready) - self._building
+            self._building += max(0, missing)
+        for standby in stale:
+            self._quit(standby.driver)
+        for _ in range(missing):
+            threading.Thread(target=self._build_in_background, name="standby-browser", daemon=True).start()
+
+    def _build(self):
+        driver = self.scraper.create_driver()
+        try:
+            return _Standby(driver, self.scraper.prepare_driver(driver))
+        except Exception:
+            self._quit(driver)
+            raise
+
+    def _build_in_background(self):
+        try:
+            standby = self._build()
+        except Exception as e:
+            print(f"Error preparing standby browser: {str(e)}")
+            standby = None
+        with self._lock:
+            self._building -= 1
+            if standby is not None and not self._closed:
+                self._ready.append(standby)
+                print("Standby browser ready")
+                return
+        if standby is not None:
+            self._quit(standby.driver)
+
+    def _healthy(self, standby):
+        try:
+            standby.driver.current_window_handle
+            return True
+        except Exception:
+            return False
+
+    def take(self):
+        """
+        Return a prepared standby, building one now if none is ready
+
+        Returns:
+            tuple: (driver, window_handles) to pass to the scraper's failover()
+        """
+        while True:
+            with self._lock:
+                standby = self._ready.pop(0) if self._ready else None
+            if standby is None:
+                print("No standby browser ready, starting one now")
+                standby = self._build()
+                break
+            if self._healthy(standby):
+                break
+            self._quit(standby.driver)
+        self.maintain()
+        return standby.driver, standby.window_handles
+
+    def failover(self, push_mode=False):
+        """
+        Move the scraper to a standby browser
+
+        Returns:
+            list: New messages found in the replayed scrollback
+        """
+        driver, window_handles = self.take()
+        return self.scraper.failover(driver, window_handles, push_mode)
+
+    @staticmethod
+    def _quit(driver):
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def close(self):
+        """Quit every standby browser; ones still being built quit when they finish"""
+        with self._lock:
+            self._closed = True
+            ready, self._ready = self._ready, []
+        for standby in ready:
+            self._quit(standby.driver)
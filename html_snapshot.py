@@ -0,0 +1,358 @@
+"""
+Parse saved chat container HTML without a browser
+
+The live scraper extracts messages through WebDriver, so its parsing could
+only be exercised against a running Chrome session. This module applies
+the same selectors as MESSAGE_EXTRACT_JS to saved outerHTML of the chat
+container (see ChatScraper.dump_snapshot), giving the same entries and
+records offline: for regression tests, benchmarks and bulk parsing of
+saved pages.
+
+The content parsing and record building used by the live scraper live
+here too, so both paths share one implementation. Built on the standard
+library's html.parser; innerText is approximated by treating <div>s
+without an inline-* class as blocks, which is how the chat is laid out.
+"""
+import re
+from datetime import datetime
+from html.parser import HTMLParser
+
+from message_ids import digest_to_key, generate_message_id, message_digest
+from reply_index import ReplyIndex
+
+# Elements that never have children or an end tag
+_VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+_BLOCK_TAGS = {"div", "p", "li", "ul", "ol", "section", "article", "header", "footer", "h1", "h2", "h3", "h4",
+               "h5", "h6", "pre", "blockquote", "table", "tr"}
+_COLLAPSE = re.compile(r"[ \t\n\r\f]+")
+
+PRIMARY_CLASS = "group text-[#eaeaea]"
+FALLBACK_CLASS = "text-[#eaeaea] rounded"
+TIMESTAMP_STYLE = "color: grey; font-size: 8px;"
+USERNAME_CLASS = "inline-flex relative"
+CONTENT_CLASS = "block pr-[20px] break-words"
+
+
+class Node:
+    """An element of a parsed snapshot: tag, attributes and children (Nodes or text)"""
+    __slots__ = ("tag", "attrs", "children")
+
+    def __init__(self, tag, attrs):
+        self.tag = tag
+        self.attrs = attrs
+        self.children = []
+
+    def get(self, name, default=""):
+        return self.attrs.get(name, default)
+
+    def descendants(self):
+        """Every element below this one, in document order"""
+        stack = [child for child in reversed(self.children) if isinstance(child, Node)]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(child for child in reversed(node.children) if isinstance(child, Node))
+
+    def is_block(self):
+        return self.tag in _BLOCK_TAGS and "inline" not in self.get("class")
+
+
+class _TreeBuilder(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = Node("#root", {})
+        self._stack = [self.root]
+
+    def handle_starttag(self, tag, attrs):
+        node = Node(tag, {name: value or "" for name, value in attrs})
+        self._stack[-1].children.append(node)
+        if tag not in _VOID_TAGS:
+            self._stack.append(node)
+
+    def handle_startendtag(self, tag, attrs):
+        self._stack[-1].children.append(Node(tag, {name: value or "" for name, value in attrs}))
+
+    def handle_endtag(self, tag):
+        # Close up to the matching open element, ignoring stray end tags
+        for i in range(len(self._stack) - 1, 0, -1):
+            if self._stack[i].tag == tag:
+                del self._stack[i:]
+                return
+
+    def handle_data(self, data):
+        self._stack[-1].children.append(data)
+
+
+def parse_html(html):
+    """Parse HTML into a Node tree; unclosed elements are closed at the end"""
+    builder = _TreeBuilder()
+    builder.feed(html)
+    builder.close()
+    return builder.root
+
+
+def inner_text(node):
+    """
+    Approximate element.innerText
+
+    Whitespace is collapsed within a line, block elements start and end
+    lines, and non-breaking spaces are kept (clean() turns them into
+    spaces, as the injected script does).
+    """
+    lines = []
+    current = []
+
+    def walk(node):
+        for child in node.children:
+            if isinstance(child, str):
+                current.append(child)
+            elif child.tag == "br":
+                lines.append("".join(current))
+                current.clear()
+            elif child.tag in ("script", "style", "svg"):
+                continue
+            elif child.is_block():
+                lines.append("".join(current))
+                current.clear()
+                walk(child)
+                lines.append("".join(current))
+                current.clear()
+            else:
+                walk(child)
+
+    walk(node)
+    lines.append("".join(current))
+    lines = [_COLLAPSE.sub(" ", line).strip(" ") for line in lines]
+    return "\n".join(line for line in lines if line)
+
+
+def _clean(text):
+    return (text or "").replace("\u00a0", " ")
+
+
+def _first_text(node):
+    for child in node.children:
+        if isinstance(child, str):
+            return child
+    return ""
+
+
+def find_message_nodes(root):
+    """Message elements in a container, as MESSAGE_EXTRACT_JS's findMessageNodes"""
+    nodes = [node for node in root.descendants() if PRIMARY_CLASS in node.get("class")]
+    if not nodes:
+        nodes = [node for node in root.descendants() if FALLBACK_CLASS in node.get("class")]
+    return nodes
+
+
+def extract_item(element):
+    """
+    Raw item for one message element, as MESSAGE_EXTRACT_JS's extractMessage
+
+    Returns:
+        dict: text, timestamp, username, content, is_reply, reply_to and preview
+    """
+    item = {"text": _clean(inner_text(element)), "timestamp": None, "username": None, "content": "",
+            "is_reply": False, "reply_to": "", "preview": ""}
+    descendants = list(element.descendants())
+
+    spans = [node for node in descendants if node.tag == "span"]
+    timestamp_spans = [span for span in spans if TIMESTAMP_STYLE in span.get("style")]
+    if timestamp_spans:
+        text = _clean(inner_text(timestamp_spans[0])).strip()
+        if text and (":" in text or "AM" in text or "PM" in text):
+            item["timestamp"] = text
+    if not item["timestamp"]:
+        for span in spans:
+            first = _first_text(span)
+            if "AM" in first or "PM" in first:
+                text = _clean(inner_text(span)).strip()
+                if text and ":" in text:
+                    item["timestamp"] = text
+                break
+
+    users = [node for node in descendants if node.tag == "div" and node.get("class") == USERNAME_CLASS]
+    if not users:
+        users = [node for node in descendants if node.tag == "div" and "inline-flex" in node.get("class")]
+    if users:
+        username = _clean(inner_text(users[0])).strip().replace(":", "").strip()
+        if username and 2 <= len(username) <= 50:
+            item["username"] = username
+
+    blocks = [node for node in descendants if node.tag == "div" and node.get("class") == CONTENT_CLASS]
+    item["content"] = _clean(inner_text(blocks[0])) if blocks else item["text"]
+
+    for node in descendants[:5]:
+        text = _clean(inner_text(node))
+        if text and text[0] == "@" and ":" in text:
+            colon = text.index(":")
+            item["is_reply"] = True
+            item["reply_to"] = text[1:colon].strip()
+            item["preview"] = text[colon + 1:].strip()
+            break
+    for node in descendants:
+        classes = node.get("class").split()
+        if "anticon-enter" in classes and "enter-reply" in classes:
+            item["is_reply"] = True
+            break
+    return item
+
+
+def snapshot_items(html):
+    """Raw items for every message element in saved container HTML"""
+    return [extract_item(node) for node in find_message_nodes(parse_html(html))]
+
+
+def parse_content(full_text, username):
+    """Message text from an element's content text, without the timestamp and "username:" prefix"""
+    if not full_text:
+        return ""
+
+    # Strategy 1: Look for "username: content" pattern
+    if username and username in full_text and ":" in full_text:
+        username_pos = full_text.find(username)
+        if username_pos != -1:
+            colon_pos = full_text.find(":", username_pos)
+            if colon_pos != -1:
+                content = full_text[colon_pos + 1:].strip()
+                if content:
+                    return content
+
+    # Strategy 2: Look for any colon and take what comes after
+    if ":" in full_text:
+        parts = full_text.split(":")
+        if len(parts) > 1:
+            content = parts[-1].strip()
+            if content:
+                return content
+
+    # Strategy 3: Return the full text as fallback
+    return full_text.strip()
+
+
+def entries_from_items(items):
+    """Validate raw items from the injected scripts or snapshot_items and parse their content"""
+    entries = []
+    for raw in items:
+        if len((raw.get("text") or "").strip()) < 10:
+            continue
+
+        timestamp = raw.get("timestamp") or "Unknown time"
+        if timestamp == "Unknown time":
+            continue
+
+        username = raw.get("username") or "Unknown user"
+        if username == "Unknown user" or len(username) < 2:
+            continue
+
+        content = parse_content(raw.get("content") or "", username)
+        if not content or len(content) < 2:
+            continue
+
+        entries.append({
+            "timestamp": timestamp,
+            "username": username,
+            "content": content,
+            "is_reply": bool(raw.get("is_reply")),
+            "replied_to": raw.get("reply_to") or "",
+            "preview": raw.get("preview") or ""
+        })
+    return entries
+
+
+def entry_id(entry, generate_id=generate_message_id):
+    """Message ID of an extracted entry, whichever capture path produced it"""
+    return generate_id(entry["timestamp"], entry["username"], entry["content"])
+
+
+def build_record(entry, msg_id, digest, reply_msg_id=None, readable_ids=True, date=None):
+    """
+    Log record for an extracted entry
+
+    Args:
+        entry (dict): Entry from entries_from_items, the element path or network
+            capture; entries that know when they were sent carry "date" and
+            "server_time"
+        msg_id (str): Its message ID
+        digest (int): Digest of msg_id
+        reply_msg_id (str, optional): Resolved ID of the message it replies to
+        readable_ids (bool, optional): Include msg_id and reply_msg_id
+        date (str, optional): YYYYMMDD date, the entry's or today's if None
+    """
+    is_reply = entry["is_reply"]
+    message_data = {
+        "date": date or entry.get("date") or datetime.now().strftime('%Y%m%d'),
+        "timestamp": entry["timestamp"],
+        "username": entry["username"],
+        "content": entry["content"],
+        "isReply": is_reply,
+        "msg_key": digest_to_key(digest)
+    }
+    if readable_ids:
+        message_data["msg_id"] = msg_id
+
+    # Add reply details if this is a reply
+    if is_reply:
+        message_data["replied_to"] = entry["replied_to"]
+        message_data["reply_msg_key"] = digest_to_key(message_digest(reply_msg_id)) if reply_msg_id else None
+        if readable_ids:
+            message_data["reply_msg_id"] = reply_msg_id
+    if entry.get("server_time"):
+        message_data["server_time"] = entry["server_time"]
+    return message_data
+
+
+def link_entry(entry, msg_id, digest, reply_index, readable_ids=True, date=None):
+    """
+    Resolve a new entry's reply target and build its log record
+
+    ChatScraper and parse_snapshot both link entries here, so the element,
+    JavaScript and HTML snapshot paths produce the same records.
+
+    Args:
+        entry (dict): Entry from entries_from_items, the element path or network capture
+        msg_id (str): Its message ID, from entry_id
+        digest (int): Digest of msg_id
+        reply_index (ReplyIndex): Earlier messages; the record is added to it
+        readable_ids (bool, optional): Include msg_id and reply_msg_id
+        date (str, optional): YYYYMMDD date, the entry's or today's if None
+
+    Returns:
+        dict: The record
+    """
+    reply_msg_id = None
+    if entry["is_reply"]:
+        reply_msg_id = reply_index.find_reply_msg_id(entry["replied_to"], entry["preview"])
+    record = build_record(entry, msg_id, digest, reply_msg_id, readable_ids, date)
+    reply_index.add(record)
+    return record
+
+
+def parse_snapshot(html, date=None, readable_ids=True, generate_id=generate_message_id):
+    """
+    Message records from saved chat container HTML
+
+    Messages are deduplicated within the snapshot and replies resolved
+    against the messages before them, as a scraper starting on this page
+    would.
+
+    Args:
+        html (str): outerHTML of the chat container, or any fragment holding messages
+        date (str, optional): YYYYMMDD date for the records, today if None
+        readable_ids (bool, optional): Include msg_id and reply_msg_id
+        generate_id (callable, optional): (timestamp, username, content) -> message ID
+
+    Returns:
+        list: Records in page order
+    """
+    reply_index = ReplyIndex(generate_id)
+    seen = set()
+    records = []
+    for entry in entries_from_items(snapshot_items(html)):
+        msg_id = entry_id(entry, generate_id)
+        digest = message_digest(msg_id)
+        if digest in seen:
+            continue
+        seen.add(digest)
+        records.append(link_entry(entry, msg_id, digest, reply_index, readable_ids, date))
+    return records
@@ -0,0 +1,358 @@
+"""
+Fast startup from a persisted dedup index
+
+Rebuilding the known-message set means reading every record in the master
+log, which grows without bound. Instead the set is saved next to the log
+together with the log size it covers, so a restart reads the saved set,
+scans only records appended after it was written, and parses just the
+last few thousand records for reply resolution. Older history is read
+lazily, only if a reply turns out to point into it.
+
+The JSONL store also keeps a SidecarIndex next to the log: one fixed-size
+entry per record with its digest, byte offset and a pointer to the same
+user's previous record. It is appended to with every write and read
+through mmap, so catching up the dedup set needs no JSON parsing and a
+user's older messages can be read without scanning anyone else's.
+"""
+import mmap
+import os
+import struct
+import threading
+from array import array
+from hashlib import blake2b
+
+from message_ids import KnownMessageSet, record_digest
+
+_INDEX_MAGIC = b'GCMINDEX'
+_INDEX_VERSION = 1
+# magic, version, log offset covered by the saved set, checksum of the bytes before it
+_INDEX_HEADER = struct.Struct('<8sIQ16s')
+
+# Bytes before the covered offset that must be unchanged for the index to be trusted
+_CHECK_BYTES = 4096
+
+
+def log_check(log_path, offset):
+    """Checksum of the bytes just before offset, or None if the log is shorter"""
+    start = max(0, offset - _CHECK_BYTES)
+    try:
+        with open(log_path, 'rb') as f:
+            f.seek(start)
+            data = f.read(offset - start)
+    except FileNotFoundError:
+        return None
+    if len(data) != offset - start:
+        return None
+    return blake2b(data, digest_size=16).digest()
+
+
+def save_known_index(index_path, log_path, known_messages):
+    """
+    Save the known-message set along with the part of the log it covers
+
+    Call this only once everything added to the set has been written to
+    the log. The index is replaced atomically.
+
+    Args:
+        index_path (str): Where to write the index
+        log_path (str): JSONL log the set was built from
+        known_messages (KnownMessageSet): Set to save
+    """
+    offset = os.path.getsize(log_path) if os.path.exists(log_path) else 0
+    check = log_check(log_path, offset) or bytes(16)
+
+    temp_path = f"{index_path}.temp"
+    with open(temp_path, 'wb') as f:
+        f.write(_INDEX_HEADER.pack(_INDEX_MAGIC, _INDEX_VERSION, offset, check))
+        known_messages.write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, index_path)
+
+
+def load_known_index(index_path, log_path):
+    """
+    Load a saved known-message set if it still matches the log
+
+    The index is ignored if the log has been rewritten since it was saved
+    (e.g. by compaction or the dedup tool), since its offset would no longer
+    point at the same records.
+
+    Returns:
+        tuple: (KnownMessageSet, log offset it covers), or None if there is no usable index
+    """
+    try:
+        with open(index_path, 'rb') as f:
+            header = f.read(_INDEX_HEADER.size)
+            if len(header) != _INDEX_HEADER.size:
+                return None
+            magic, version, offset, check = _INDEX_HEADER.unpack(header)
+            if magic != _INDEX_MAGIC or version != _INDEX_VERSION:
+                return None
+            if offset and log_check(log_path, offset) != check:
+                return None
+            return KnownMessageSet.read(f), offset
+    except FileNotFoundError:
+        return None
+    except ValueError as e:
+        print(f"Ignoring unreadable index {index_path}: {str(e)}")
+        return None
+
+
+def load_startup_state(store, index_path, known_messages, reply_index, recent, tail_size=5000):
+    """
+    Restore a scraper's dedup set and recent history from a JSONL store
+
+    Uses the saved set when it matches the log and the requested set
+    parameters, otherwise rebuilds it from the store's sidecar index (or
+    one streaming pass without one) and saves it. Either way only the last
+    tail_size records are parsed into memory; the reply index is given a
+    per-user loader for everything before them.
+
+    Args:
+        store (JsonlMessageStore): Master log
+        index_path (str): Saved index for the log
+        known_messages (KnownMessageSet): Empty set with the parameters to use
+        reply_index (ReplyIndex): Empty reply index to fill from the tail
+        recent (deque): Receives the tail records
+        tail_size (int, optional): Recent records loaded for reply resolution
+
+    Returns:
+        tuple: (KnownMessageSet to use, number of records scanned for dedup, True if
+            the saved index was used)
+    """
+    saved = load_known_index(index_path, store.path)
+    if saved is not None:
+        loaded, offset = saved
+        if (loaded.window, loaded.bloom_capacity) != (known_messages.window, known_messages.bloom_capacity):
+            saved = None
+    if saved is not None:
+        known_messages = loaded
+    else:
+        offset = 0
+
+    # Records written after the index was saved, or all of them without one.
+    # The sidecar has their digests, so no JSON has to be parsed.
+    scanned = 0
+    sidecar = store.sync_index()
+    if sidecar is not None:
+        for digest in sidecar.digests(sidecar.first_at(offset)):
+            known_messages.add(digest)
+            scanned += 1
+    else:
+        for msg in store.iter_records(start=offset):
+            digest = record_digest(msg)
+            if digest is not None:
+                known_messages.add(digest)
+            scanned += 1
+
+    if saved is None and scanned:
+        save_known_index(index_path, store.path, known_messages)
+
+    tail_start, tail = store.tail(tail_size)
+    for msg in tail:
+        if record_digest(msg) is not None:
+            reply_index.add(msg)
+    recent.extend(tail)
+    if tail_start:
+        limit = reply_index.max_messages_per_user
+        reply_index.load_older = lambda username: store.user_records(username, before=tail_start, limit=limit)
+
+    return known_messages, scanned, saved is not None
+
+
+# digest, byte offset of the record in the log, hash of the username,
+# entry number of the same user's previous record
+_ENTRY = struct.Struct('<QQQQ')
+_FIELDS = _ENTRY.size // 8
+NO_ENTRY = 2 ** 64 - 1
+
+# entries covered, then (user hash, newest entry) pairs
+_HEADS_HEADER = struct.Struct('<8sQQ')
+_HEADS_MAGIC = b'GCMHEADS'
+
+
+def user_hash(username):
+    """64-bit hash of a username as stored in the sidecar index"""
+    return int.from_bytes(blake2b(username.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class SidecarIndex:
+    def __init__(self, path):
+        """
+        Fixed-size entry per log record, kept next to the log and memory-mapped
+
+        Each entry holds the record's digest, its byte offset in the log,
+        a hash of its username and the entry number of the same user's
+        previous record, so a user's history can be walked newest first
+        without reading anyone else's records. Entries are only ever
+        appended, in log order, so offsets are sorted.
+
+        The newest entry per user is saved to a small .heads file on close;
+        a crash just means the entries after it are rescanned on open.
+
+        Args:
+            path (str): Path of the index file
+        """
+        self.path = path
+        self.heads_path = f"{path}.heads"
+        self.count = 0
+        self._heads = {}  # user hash -> newest entry
+        self._file = None
+        self._map = None
+        self._view = None
+        self._lock = threading.RLock()
+
+    def open(self):
+        """Open the index, dropping a torn trailing entry and restoring the user heads"""
+        with self._lock:
+            if self._file is not None:
+                return
+            # Readable as well, so the same descriptor can be mapped
+            self._file = open(self.path, 'a+b')
+            self._file.seek(0, os.SEEK_END)
+            size = self._file.tell()
+            if size % _ENTRY.size:
+                self._file.truncate(size - size % _ENTRY.size)
+                self._file.seek(0, os.SEEK_END)
+            self.count = self._file.tell() // _ENTRY.size
+
+            covered = self._load_heads()
+            for i in range(covered, self.count):
+                _, _, user, _ = self.entry(i)
+                self._heads[user] = i
+
+    def _load_heads(self):
+        """Read the saved heads, returning how many entries they cover"""
+        self._heads = {}
+        try:
+            with open(self.heads_path, 'rb') as f:
+                magic, covered, pairs = _HEADS_HEADER.unpack(f.read(_HEADS_HEADER.size))
+                values = array('Q')
+                values.fromfile(f, pairs * 2)
+        except (FileNotFoundError, struct.error, EOFError):
+            return 0
+        if magic != _HEADS_MAGIC or covered > self.count:
+            return 0
+        self._heads = dict(zip(values[0::2], values[1::2]))
+        return covered
+
+    def _save_heads(self):
+        values = array('Q')
+        for user, head in self._heads.items():
+            values.append(user)
+            values.append(head)
+        temp_path = f"{self.heads_path}.temp"
+        with open(temp_path, 'wb') as f:
+            f.write(_HEADS_HEADER.pack(_HEADS_MAGIC, self.count, len(self._heads)))
+            values.tofile(f)
+        os.replace(temp_path, self.heads_path)
+
+    def _mapped(self, i):
+        """Map the file so that entry i is readable"""
+        if self._view is None or i * _FIELDS >= len(self._view):
+            self._file.flush()
+            self._unmap()
+            self._map = mmap.mmap(self._file.fileno(), self.count * _ENTRY.size, access=mmap.ACCESS_READ)
+            self._view = memoryview(self._map).cast('Q')
+        return self._view
+
+    def _unmap(self):
+        if self._view is not None:
+            self._view.release()
+            self._map.close()
+            self._view = None
+            self._map = None
+
+    def entry(self, i):
+        """Return (digest, offset, user hash, previous entry) for entry i"""
+        with self._lock:
+            view = self._mapped(i)
+            return tuple(view[i * _FIELDS:(i + 1) * _FIELDS])
+
+    def append(self, records):
+        """
+        Add entries for records just appended to the log
+
+        Args:
+            records (list): (digest or None, byte offset, username) tuples in log order
+        """
+        if not records:
+            return
+        with self._lock:
+            values = array('Q')
+            for digest, offset, username in records:
+                user = user_hash(username)
+                values.extend((digest or 0, offset, user, self._heads.get(user, NO_ENTRY)))
+                self._heads[user] = self.count
+                self.count += 1
+            self._file.write(values.tobytes())
+            self._file.flush()
+
+    def first_at(self, offset):
+        """Number of the first entry whose record starts at or after offset"""
+        with self._lock:
+            lo, hi = 0, self.count
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self.entry(mid)[1] < offset:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            return lo
+
+    def digests(self, start=0):
+        """Yield the non-zero digests of entries from start on"""
+        with self._lock:
+            if start >= self.count:
+                return
+            view = self._mapped(self.count - 1)
+            digests = view[start * _FIELDS:self.count * _FIELDS:_FIELDS].tolist()
+        for digest in digests:
+            if digest:
+                yield digest
+
+    def user_offsets(self, username, before=None, limit=None):
+        """
+        Log offsets of a user's records, newest first
+
+        Args:
+            username (str): User to walk
+            before (int, optional): Only records starting before this log offset
+            limit (int, optional): Stop after this many offsets
+        """
+        with self._lock:
+            offsets = []
+            i = self._heads.get(user_hash(username), NO_ENTRY)
+            while i != NO_ENTRY and (limit is None or len(offsets) < limit):
+                _, offset, _, previous = self.entry(i)
+                if before is None or offset < before:
+                    offsets.append(offset)
+                i = previous
+            return offsets
+
+    def last_offset(self):
+        """Log offset of the newest entry's record, or None if the index is empty"""
+        return self.entry(self.count - 1)[1] if self.count else None
+
+    def clear(self):
+        """Drop every entry, e.g. before rebuilding after the log was rewritten"""
+        with self._lock:
+            self._unmap()
+            if self._file is not None:
+                self._file.truncate(0)
+                self._file.seek(0)
+            self.count = 0
+            self._heads = {}
+            if os.path.exists(self.heads_path):
+                os.remove(self.heads_path)
+
+    def close(self):
+        """Save the user heads and close the file"""
+        with self._lock:
+            if self._file is None:
+                return
+            self._unmap()
+            self._file.close()
+            self._file = None
+            self._save_heads()
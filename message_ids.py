@@ -0,0 +1,241 @@
+"""
+Message IDs and the set of messages we've already seen
+
+A message is identified by its readable msg_id ("5:03 PM_VirtualEdge_<first
+50 chars of normalized content>"). For dedup the msg_id is reduced to a
+64-bit digest, stored in records as the 16 hex character "msg_key", so the
+known-message set never has to hold the readable strings.
+"""
+import heapq
+import math
+import struct
+import threading
+from array import array
+from bisect import bisect_left
+from collections import deque
+from hashlib import blake2b
+
+from ticker_normalizer import remove_ticker_content
+
+
+def generate_message_id(timestamp, username, content):
+    """
+    Generate a consistent message ID using the same logic across the application
+    """
+    # Remove ticker content from message ID check
+    id_content = remove_ticker_content(content)
+
+    # Use more characters for better uniqueness, but limit to reasonable length
+    content_hash = id_content[:50] if len(id_content) > 50 else id_content
+
+    return f"{timestamp}_{username}_{content_hash}"
+
+
+def message_digest(msg_id):
+    """Return the 64-bit digest of a readable message ID as an int"""
+    return int.from_bytes(blake2b(msg_id.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def digest_to_key(digest):
+    """Format a digest as the msg_key stored in records"""
+    return f"{digest:016x}"
+
+
+def message_key(msg_id):
+    """Return the msg_key for a readable message ID"""
+    return digest_to_key(message_digest(msg_id))
+
+
+def record_digest(msg):
+    """
+    Return the digest identifying a stored message record
+
+    Uses the record's msg_key if it has one, otherwise the digest of its
+    msg_id (records written before msg_key existed). Returns None for
+    records with neither.
+    """
+    key = msg.get("msg_key")
+    if key:
+        return int(key, 16)
+    msg_id = msg.get("msg_id")
+    if msg_id:
+        return message_digest(msg_id)
+    return None
+
+
+class BloomFilter:
+    def __init__(self, capacity, false_positive_rate=1e-6):
+        """
+        Fixed-size Bloom filter over 64-bit digests
+
+        Args:
+            capacity (int): Number of digests it is sized for
+            false_positive_rate (float, optional): Target false positive rate at capacity
+        """
+        self.capacity = capacity
+        self.false_positive_rate = false_positive_rate
+        self.num_bits = max(64, int(-capacity * math.log(false_positive_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, digest):
+        # Double hashing from the two halves of the digest
+        h1 = digest & 0xFFFFFFFF
+        h2 = (digest >> 32) | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, digest):
+        for position in self._positions(digest):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, digest):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(digest))
+
+
+_SET_MAGIC = b'GCMKNOWN'
+# magic, window, bloom capacity (0 for exact), false positive rate,
+# archived count, recent count, archive length, Bloom filter bytes
+_SET_HEADER = struct.Struct('<8sQQdQQQQ')
+
+
+class KnownMessageSet:
+    def __init__(self, window=50000, bloom_capacity=5000000, false_positive_rate=1e-7):
+        """
+        Memory-bounded set of message digests we've already processed
+
+        The most recent `window` digests are kept in a Python set. Older
+        ones move to an archive: by default a fixed-size Bloom filter, so
+        memory stays flat no matter how long the history (about 21 MB at
+        the default capacity). A Bloom filter false positive would make a
+        new message look known, so size it well above the expected archive.
+        With bloom_capacity=None the archive is an exact sorted array of
+        64-bit ints instead, 8 bytes per archived message.
+
+        Membership tests accept either a digest or a readable msg_id. Lookups
+        and updates take a lock, since capture threads check the set while
+        the thread that dedups adds to it.
+
+        Args:
+            window (int, optional): Number of recent digests kept exactly
+            bloom_capacity (int, optional): Archive in a Bloom filter of this capacity,
+                None for an exact sorted array
+            false_positive_rate (float, optional): Bloom filter false positive rate
+        """
+        self.window = window
+        self.bloom_capacity = bloom_capacity
+        self.false_positive_rate = false_positive_rate
+        self._recent = set()
+        self._order = deque()
+
+        self._bloom = BloomFilter(bloom_capacity, false_positive_rate) if bloom_capacity else None
+        self._archive = array('Q')  # Sorted
+        self._pending = set()  # Evicted, not yet merged into _archive
+        self._archived_count = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _digest(value):
+        return message_digest(value) if isinstance(value, str) else value
+
+    def __contains__(self, value):
+        digest = self._digest(value)
+        with self._lock:
+            return self._contains(digest)
+
+    def _contains(self, digest):
+        if digest in self._recent:
+            return True
+        if self._bloom is not None:
+            return digest in self._bloom
+        if digest in self._pending:
+            return True
+        i = bisect_left(self._archive, digest)
+        return i < len(self._archive) and self._archive[i] == digest
+
+    def __len__(self):
+        return len(self._recent) + self._archived_count
+
+    def add(self, value):
+        digest = self._digest(value)
+        with self._lock:
+            if self._contains(digest):
+                return
+            self._recent.add(digest)
+            self._order.append(digest)
+            while len(self._order) > self.window:
+                self._evict(self._order.popleft())
+
+    def _evict(self, digest):
+        self._recent.discard(digest)
+        self._archived_count += 1
+        if self._bloom is not None:
+            self._bloom.add(digest)
+            return
+        self._pending.add(digest)
+        # Merge once the pending set is a fraction of the archive, so the
+        # total merge cost stays proportional to the archive size
+        if len(self._pending) >= max(4096, len(self._archive) // 8):
+            self._merge_pending()
+
+    def _merge_pending(self):
+        # Linear merge of two sorted runs straight into a new array, without
+        # a temporary list of the whole archive
+        self._archive = array('Q', heapq.merge(self._archive, sorted(self._pending)))
+        self._pending = set()
+
+    def write(self, f):
+        """
+        Write the set to a binary file object
+
+        The layout is a fixed header followed by the Bloom filter bits or the
+        sorted archive, then the recent window oldest first, so reading it
+        back is a few bulk reads rather than one add() per message.
+        """
+        with self._lock:
+            if self._pending:
+                self._merge_pending()
+            bloom_bits = self._bloom.bits if self._bloom is not None else b''
+            f.write(_SET_HEADER.pack(
+                _SET_MAGIC, self.window, self.bloom_capacity or 0, self.false_positive_rate,
+                self._archived_count, len(self._order), len(self._archive), len(bloom_bits)
+            ))
+            f.write(bloom_bits)
+            self._archive.tofile(f)
+            array('Q', self._order).tofile(f)
+
+    @classmethod
+    def read(cls, f):
+        """
+        Read a set written by write()
+
+        Raises:
+            ValueError: If the file does not hold a known-message set
+        """
+        header = f.read(_SET_HEADER.size)
+        if len(header) != _SET_HEADER.size:
+            raise ValueError("Truncated known-message set")
+        magic, window, bloom_capacity, false_positive_rate, archived_count, recent_count, archive_count, bloom_size = \
+            _SET_HEADER.unpack(header)
+        if magic != _SET_MAGIC:
+            raise ValueError("Not a known-message set")
+
+        known = cls(window=window, bloom_capacity=bloom_capacity or None, false_positive_rate=false_positive_rate)
+        if known._bloom is not None:
+            bits = f.read(bloom_size)
+            if len(bits) != len(known._bloom.bits):
+                raise ValueError("Bloom filter size mismatch")
+            known._bloom.bits = bytearray(bits)
+            known._bloom.count = archived_count
+        try:
+            known._archive.fromfile(f, archive_count)
+            recent = array('Q')
+            recent.fromfile(f, recent_count)
+        except EOFError:
+            raise ValueError("Truncated known-message set")
+        known._order.extend(recent)
+        known._recent.update(recent)
+        known._archived_count = archived_count
+        return known
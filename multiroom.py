@@ -0,0 +1,240 @@
+"""
+Capture several chat rooms from one browser
+
+Each room is a ChatScraper in its own tab of a single Chrome instance, so
+adding a room costs a tab rather than a browser. The rooms share one
+KnownMessageSet (the largest in-memory structure), with a per-room salt
+mixed into its digests so identical messages in different rooms don't
+collide. Each room keeps its own log partition: the default room logs to
+log_directory as before, the others to log_directory/rooms/<room>.
+"""
+import os
+import time
+
+from chatscraper import DEFAULT_ROOM, ChatScraper
+from message_ids import KnownMessageSet, message_digest
+from poll_scheduler import PollScheduler
+
+
+def room_salt(room):
+    """Salt for a room's digests in the shared dedup set; 0 for the default room"""
+    return 0 if room == DEFAULT_ROOM else message_digest(f"room:{room}")
+
+
+def room_log_directory(log_directory, room):
+    """Log partition for a room"""
+    if room == DEFAULT_ROOM:
+        return log_directory
+    return os.path.join(log_directory, "rooms", room)
+
+
+class _Room:
+    """Scheduling state for one room"""
+
+    def __init__(self, scraper, scheduler):
+        self.scraper = scraper
+        self.scheduler = scheduler
+        self.next_due = 0.0
+        self.last_active = 0.0
+
+
+class MultiRoomScraper:
+    def __init__(self, url, rooms, username=None, password=None, log_directory="chat_logs", headless=False,
+                 min_interval=2.0, max_interval=30.0, known_window=50000, known_bloom_capacity=5000000,
+                 storage_factory=None, **scraper_options):
+        """
+        Capture several chat rooms with one browser and one dedup set
+
+        Rooms are polled by activity: each room has its own PollScheduler,
+        so a busy room is polled about as often as it fills with new messages
+        and a quiet one backs off to max_interval.
+
+        Args:
+            url (str): URL of the chat website
+            rooms (list): Names of the chat rooms to capture
+            username (str, optional): Username for login
+            password (str, optional): Password for login
+            log_directory (str, optional): Directory to save chat logs
+            headless (bool, optional): Run browser in headless mode
+            min_interval (float, optional): Seconds between polls of an active room
+            max_interval (float, optional): Longest a quiet room goes between polls
+            known_window (int, optional): Recent digests kept exactly in the shared set
+            known_bloom_capacity (int, optional): Bloom filter capacity of the shared set,
+                None for an exact sorted array
+            storage_factory (callable, optional): room log directory -> MessageStore for
+                that room's master log, or None for the default JSONL log
+            **scraper_options: Passed to every room's ChatScraper
+        """
+        if not rooms:
+            raise ValueError("At least one room is required")
+        self.url = url
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.known_messages = KnownMessageSet(window=known_window, bloom_capacity=known_bloom_capacity)
+
+        self.rooms = []
+        driver = None
+        for room in rooms:
+            if driver is not None:
+                driver.switch_to.new_window('tab')
+                driver.get(url)
+            room_directory = room_log_directory(log_directory, room)
+            storage = storage_factory(room_directory) if storage_factory else None
+            scraper = ChatScraper(
+                url, username, password, room_directory, headless, storage=storage,
+                room=room, driver=driver, known_messages=self.known_messages, dedup_salt=room_salt(room),
+                known_window=known_window, **scraper_options
+            )
+            # The first room starts the browser, the rest open tabs in it
+            driver = scraper.driver
+            self.rooms.append(_Room(scraper, PollScheduler(min_interval, max_interval)))
+        self.driver = driver
+        self.master_log = ", ".join(room.scraper.master_log for room in self.rooms)
+
+    def create_driver(self):
+        """Start a new Chrome instance for a standby session"""
+        return self.rooms[0].scraper.create_driver()
+
+    def prepare_driver(self, driver):
+        """
+        Log in and open every room in its own tab of a spare browser
+
+        Returns:
+            list: Window handles in room order, to pass to failover()
+        """
+        driver.get(self.url)
+        self.rooms[0].scraper.login(driver)
+        handles = []
+        for i, room in enumerate(self.rooms):
+            if i:
+                driver.switch_to.new_window('tab')
+                driver.get(self.url)
+            room.scraper.navigate_to_chat(driver)
+            handles.append(driver.current_window_handle)
+        return handles
+
+    def failover(self, driver, window_handles, push_mode=False):
+        """
+        Move every room to a prepared standby browser and replay its scrollback
+
+        Args:
+            driver (WebDriver): Browser set up by prepare_driver()
+            window_handles (list): Handles returned by prepare_driver()
+            push_mode (bool, optional): Install the chat observers in the new session
+
+        Returns:
+            list: New messages found in the replayed scrollback
+        """
+        old_driver = self.driver
+        for i, (room, handle) in enumerate(zip(self.rooms, window_handles)):
+            room.scraper.attach_driver(driver, handle, owns_driver=(i == 0))
+        self.driver = driver
+        try:
+            old_driver.quit()
+        except Exception as e:
+            print(f"Error closing failed browser: {str(e)}")
+
+        print("Switched to standby browser, replaying visible scrollback")
+        if push_mode:
+            return self.start_push_capture()
+        return self.get_chat_messages()
+
+    def login(self):
+        """Log in once; the other tabs share the browser's session"""
+        self.rooms[0].scraper.login()
+
+    def navigate_to_chat(self):
+        """Open each room in its tab, reloading the extra tabs now that we're logged in"""
+        for i, room in enumerate(self.rooms):
+            if i:
+                room.scraper._activate()
+                self.driver.get(self.url)
+            room.scraper.navigate_to_chat()
+
+    def get_chat_messages(self):
+        """Scan every room now, regardless of schedule"""
+        new_messages = []
+        for room in self.rooms:
+            new_messages.extend(self._poll(room))
+        return new_messages
+
+    def get_new_messages(self):
+        """Poll the rooms that are due, most overdue first"""
+        now = time.monotonic()
+        due = sorted((room for room in self.rooms if room.next_due <= now), key=lambda room: room.next_due)
+        new_messages = []
+        for room in due:
+            new_messages.extend(self._poll(room))
+        return new_messages
+
+    def _poll(self, room):
+        new_messages = room.scraper.get_new_messages()
+        self._reschedule(room, new_messages)
+        return new_messages
+
+    def _reschedule(self, room, new_messages):
+        if new_messages:
+            room.last_active = time.monotonic()
+        last_poll = room.scraper.last_poll or {}
+        interval = room.scheduler.record_poll(
+            len(new_messages), last_poll.get("seen"), last_poll.get("anchored", False), last_poll.get("gap", False)
+        )
+        room.next_due = time.monotonic() + interval
+
+    def seconds_until_due(self):
+        """Seconds until the next room is due to be polled"""
+        return max(0.0, min(room.next_due for room in self.rooms) - time.monotonic())
+
+    def start_push_capture(self):
+        """Install the chat observer in every room's tab"""
+        new_messages = []
+        for room in self.rooms:
+            new_messages.extend(room.scraper.start_push_capture())
+        return new_messages
+
+    def get_pushed_messages(self, timeout=5.0):
+        """
+        Collect messages queued by the observers in every tab
+
+        Only the current tab can run a long-poll, so each room's queue is
+        drained without waiting, and if they are all empty the most recently
+        active room is long-polled for up to a second before trying again.
+        Queued messages wait in their tab's page, so none are lost.
+
+        Args:
+            timeout (float, optional): Seconds to wait for new messages
+
+        Returns:
+            list: New messages from all rooms
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            new_messages = []
+            for room in self.rooms:
+                room_messages = room.scraper.get_pushed_messages(timeout=0)
+                if room_messages:
+                    room.last_active = time.monotonic()
+                new_messages.extend(room_messages)
+            remaining = deadline - time.monotonic()
+            if new_messages or remaining <= 0:
+                return new_messages
+
+            busiest = max(self.rooms, key=lambda room: room.last_active)
+            new_messages = busiest.scraper.get_pushed_messages(timeout=min(1.0, remaining))
+            if new_messages:
+                busiest.last_active = time.monotonic()
+                return new_messages
+
+    def flush_logs(self):
+        """Block until every room's new messages are written to its logs"""
+        for room in self.rooms:
+            room.scraper.flush_logs()
+
+    def close(self):
+        """Close every room's logs, then the browser"""
+        # The first room owns the browser, so it goes last
+        for room in reversed(self.rooms):
+            try:
+                room.scraper.close()
+            except Exception as e:
+                print(f"Error closing room {room.scraper.room}: {str(e)}")
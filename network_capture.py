@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+Capture chat messages from the WebSocket frames the page receives
+
+DOM scraping depends on the chat's Tailwind class names and on reading
+text out of rendered elements. The web app gets each message over a
+WebSocket before rendering it, so with Chrome's performance log enabled
+(ChatScraper(performance_log=True)) the frames can be read from the
+DevTools Network events instead: no DOM traversal, and the server's own
+timestamp when the frame carries one.
+
+The Godel frame format isn't documented, and none has been captured into
+this repository yet, so ChatFrameDecoder is deliberately generic: it
+unwraps JSON and socket.io style ("42[...]") payloads and picks out
+objects with a user field and a text field, with configurable field names.
+Use the record command to save real frames to a fixture, check them with
+replay, and adjust the field names if needed. Because any object with a
+user-like and a text-like key looks like a message, NetworkCapture only
+saves messages once the decoder is pinned to the chat socket with a URL
+filter or an explicit field schema; until then network capture is
+record/replay only. Decoded entries have the same shape as DOM-extracted
+ones, with the displayed "h:mm AM" timestamp derived from the server
+time, but nothing guarantees a frame's text matches the rendered text the
+DOM IDs are built from, so the DOM is only used to check the decoder
+(NetworkCapture.check_page), never saved alongside it.
+
+Usage:
+  python network_capture.py record FIXTURE [--seconds S]   save live frames
+  python network_capture.py replay FIXTURE                 decode a fixture offline
+"""
+import argparse
+import json
+import re
+import time
+from datetime import datetime
+
+from message_ids import message_digest
+
+WEBSOCKET_CREATED = "Network.webSocketCreated"
+WEBSOCKET_FRAME_RECEIVED = "Network.webSocketFrameReceived"
+
+# Text frames; binary frames arrive base64 encoded and aren't decoded
+_TEXT_OPCODE = 1
+
+# Engine.IO/socket.io packet type prefix before the JSON
+_PACKET_PREFIX = re.compile(r"^\d+")
+
+
+def _parse_time(value):
+    """
+    A datetime from an epoch (seconds or milliseconds) or ISO 8601 value
+
+    Returns:
+        datetime: Local time, naive, or None if the value isn't a time
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        seconds = value / 1000 if value > 1e11 else value
+        try:
+            return datetime.fromtimestamp(seconds)
+        except (OverflowError, OSError, ValueError):
+            return None
+    if isinstance(value, str):
+        text = value.strip()
+        if text.replace(".", "", 1).isdigit():
+            return _parse_time(float(text))
+        try:
+            parsed = datetime.fromisoformat(text.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone().replace(tzinfo=None)
+        return parsed
+    return None
+
+
+def chat_timestamp(moment):
+    """Format a datetime like the chat shows it, e.g. "9:18 PM" """
+    return f"{moment.hour % 12 or 12}:{moment.minute:02d} {'PM' if moment.hour >= 12 else 'AM'}"
+
+
+class ChatFrameDecoder:
+    USER_FIELDS = ("username", "user_name", "userName", "user", "sender", "author", "from", "nick", "name")
+    TEXT_FIELDS = ("content", "message", "text", "msg", "body")
+    TIME_FIELDS = ("timestamp", "ts", "time", "created_at", "createdAt", "sent_at", "sentAt")
+    REPLY_FIELDS = ("reply", "reply_to", "replyTo", "replied_to", "parent", "quoted", "quote")
+    ROOM_FIELDS = ("room", "channel", "chat", "room_id", "roomId", "channel_id", "channelId")
+
+    def __init__(self, room=None, user_fields=None, text_fields=None, time_fields=None, reply_fields=None,
+                 room_fields=None, url_filter=None):
+        """
+        Decode chat messages from WebSocket payloads
+
+        Args:
+            room (str, optional): Only keep messages whose room field, if they have
+                one, equals this
+            user_fields (tuple, optional): Keys that hold the sender, in order of preference;
+                a nested object's own user fields are used if the value isn't a string
+            text_fields (tuple, optional): Keys that hold the message text
+            time_fields (tuple, optional): Keys that hold the send time (epoch s/ms or ISO)
+            reply_fields (tuple, optional): Keys holding the quoted message, as an object
+                with its own user and text fields, or just the quoted username
+            room_fields (tuple, optional): Keys that hold the room name
+            url_filter (str, optional): Only decode frames from sockets whose URL
+                contains this
+        """
+        # Whether the decoder has been told what the chat's frames look like,
+        # rather than guessing from the default field names
+        self.explicit_fields = user_fields is not None and text_fields is not None
+        self.room = room
+        self.user_fields = user_fields or self.USER_FIELDS
+        self.text_fields = text_fields or self.TEXT_FIELDS
+        self.time_fields = time_fields or self.TIME_FIELDS
+        self.reply_fields = reply_fields or self.REPLY_FIELDS
+        self.room_fields = room_fields or self.ROOM_FIELDS
+        self.url_filter = url_filter
+
+    def is_targeted(self):
+        """Whether the decoder is limited to the chat socket or the chat's own fields"""
+        return bool(self.url_filter) or self.explicit_fields
+
+    def _field(self, obj, fields):
+        for field in fields:
+            value = obj.get(field)
+            if value not in (None, ""):
+                return value
+        return None
+
+    def _user(self, obj):
+        value = self._field(obj, self.user_fields)
+        if isinstance(value, dict):
+            value = self._field(value, self.user_fields)
+        return value.strip() if isinstance(value, str) else None
+
+    def _text(self, obj):
+        value = self._field(obj, self.text_fields)
+        return value.strip() if isinstance(value, str) else None
+
+    def _message(self, obj, fallback_time):
+        """Entry for a message object, or None if it isn't one"""
+        username = self._user(obj)
+        content = self._text(obj)
+        if not username or not content or len(username) < 2 or len(content) < 2:
+            return None
+        room = self._field(obj, self.room_fields)
+        if self.room is not None and isinstance(room, str) and room != self.room:
+            return None
+
+        sent = _parse_time(self._field(obj, self.time_fields))
+        moment = sent or fallback_time
+        entry = {
+            "timestamp": chat_timestamp(moment),
+            "username": username,
+            "content": content,
+            "is_reply": False,
+            "replied_to": "",
+            "preview": "",
+            "date": moment.strftime('%Y%m%d'),
+        }
+        if sent is not None:
+            entry["server_time"] = sent.isoformat(timespec="seconds")
+
+        reply = self._field(obj, self.reply_fields)
+        if isinstance(reply, dict):
+            replied_to = self._user(reply)
+            if replied_to:
+                entry.update(is_reply=True, replied_to=replied_to, preview=self._text(reply) or "")
+        elif isinstance(reply, str):
+            entry.update(is_reply=True, replied_to=reply.lstrip("@").strip())
+        return entry
+
+    def _walk(self, value, fallback_time, entries, depth=0):
+        if depth > 8:
+            return
+        if isinstance(value, dict):
+            entry = self._message(value, fallback_time)
+            if entry is not None:
+                entries.append(entry)
+                return
+            values = value.values()
+        elif isinstance(value, list):
+            values = value
+        else:
+            return
+        for child in values:
+            self._walk(child, fallback_time, entries, depth + 1)
+
+    def decode(self, payload, received=None):
+        """
+        Chat entries in one frame's payload
+
+        Args:
+            payload (str): Frame payload
+            received (datetime, optional): When the frame arrived, used for messages
+                without a time of their own
+
+        Returns:
+            list: Entries like the DOM extractors', plus "date" and, when the frame
+                has one, "server_time"
+        """
+        if not payload:
+            return []
+        try:
+            data = json.loads(payload)
+        except ValueError:
+            # Engine.IO/socket.io frames put a packet type before the JSON
+            try:
+                data = json.loads(_PACKET_PREFIX.sub("", payload, count=1))
+            except ValueError:
+                return []
+        entries = []
+        self._walk(data, received or datetime.now(), entries)
+        return entries
+
+
+
+def websocket_frames(log_entries, sockets=None):
+    """
+    Received text frames from Chrome performance log entries
+
+    Args:
+        log_entries (iterable): Entries from driver.get_log("performance"), each
+            with a JSON "message" and a wall clock "timestamp" in milliseconds
+        sockets (dict, optional): requestId -> socket URL, updated from
+            webSocketCreated events so it can be kept across calls
+
+    Yields:
+        tuple: (socket URL or None, datetime received, payload)
+    """
+    sockets = {} if sockets is None else sockets
+    for log_entry in log_entries:
+        try:
+            message = json.loads(log_entry["message"])["message"]
+        except (KeyError, TypeError, ValueError):
+            continue
+        method = message.get("method")
+        params = message.get("params", {})
+        if method == WEBSOCKET_CREATED:
+            sockets[params.get("requestId")] = params.get("url")
+        elif method == WEBSOCKET_FRAME_RECEIVED:
+            response = params.get("response", {})
+            if response.get("opcode", _TEXT_OPCODE) != _TEXT_OPCODE:
+                continue
+            received = _parse_time(log_entry.get("timestamp")) or datetime.now()
+            yield sockets.get(params.get("requestId")), received, response.get("payloadData", "")
+
+
+def decode_log(log_entries, decoder, sockets=None):
+    """Chat entries from performance log entries, in arrival order"""
+    entries = []
+    for url, received, payload in websocket_frames(log_entries, sockets):
+        if decoder.url_filter and (url is None or decoder.url_filter not in url):
+            continue
+        entries.extend(decoder.decode(payload, received))
+    return entries
+
+
+def read_fixture(path):
+    """Performance log entries saved by the record command, one JSON object per line"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class NetworkCapture:
+    def __init__(self, scraper, decoder):
+        """
+        Capture a ChatScraper's messages from its browser's WebSocket frames
+
+        The scraper must have been created with performance_log=True. Entries
+        go through the scraper's usual dedup, reply linking and logging, and
+        capture() has the same contract as ChatScraper.capture(), so this can
+        stand in for it, e.g. in the async pipeline.
+
+        Args:
+            scraper (ChatScraper): Scraper whose browser and logs are used
+            decoder (ChatFrameDecoder): Frame decoder with a url_filter or explicit
+                user and text fields, checked against a recorded fixture
+
+        Raises:
+            ValueError: If the decoder would accept any socket's frames by guessing
+        """
+        if decoder is None or not decoder.is_targeted():
+            raise ValueError("Network capture needs a decoder with a url_filter or explicit user and text "
+                             "fields; record a fixture with 'python network_capture.py record' to find them")
+        self.scraper = scraper
+        self.decoder = decoder
+        self.frames = 0
+        self._sockets = {}
+
+    def capture(self):
+        """
+        Decode the frames received since the last call
+
+        Returns:
+            tuple: (entries, True) as ChatScraper.capture()
+        """
+        log_entries = self.scraper.driver.get_log("performance")
+        self.frames += len(log_entries)
+        return decode_log(log_entries, self.decoder, self._sockets), True
+
+    def get_new_messages(self):
+        """Dedup, link and log the messages received since the last call"""
+        entries, _ = self.capture()
+        if not entries:
+            return []
+        new_messages = self.scraper._process_entries(entries)
+        print(f"Decoded {len(entries)} messages from network frames, found {len(new_messages)} new messages")
+        return new_messages
+
+    def check_page(self):
+        """
+        Count messages on the page that the frames didn't produce
+
+        Frame text and times needn't match what the page renders, so these
+        are reported rather than saved, which would log the same message
+        twice under different IDs. A steady count means the decoder's fields
+        need adjusting.
+
+        Returns:
+            int: Page messages whose IDs aren't known
+        """
+        items, parsed = self.scraper.capture()
+        entries = items if parsed else self.scraper._entries_from_snapshot(items)
+        missing = [entry for entry in entries
+                   if not self.scraper._is_known(message_digest(self.scraper._entry_id(entry)))]
+        if missing:
+            print(f"{len(missing)} messages on the page weren't decoded from network frames, "
+                  f"e.g. {missing[0]['username']}: {missing[0]['content'][:50]}")
+        return len(missing)
+
+
+def record(path, seconds):
+    """Log in, open the chat and save its performance log entries to a fixture"""
+    from chatscraper import ChatScraper
+    from config import GODEL_URL, GODEL_USERNAME, GODEL_PASSWORD, LOG_DIRECTORY
+
+    scraper = ChatScraper(GODEL_URL, GODEL_USERNAME, GODEL_PASSWORD, LOG_DIRECTORY, performance_log=True)
+    saved = 0
+    try:
+        scraper.login()
+        scraper.navigate_to_chat()
+        deadline = time.monotonic() + seconds
+        with open(path, 'w', encoding='utf-8') as f:
+            while time.monotonic() < deadline:
+                for log_entry in scraper.driver.get_log("performance"):
+                    method = json.loads(log_entry["message"])["message"].get("method")
+                    if method in (WEBSOCKET_CREATED, WEBSOCKET_FRAME_RECEIVED):
+                        f.write(json.dumps(log_entry) + "\n")
+                        saved += 1
+                time.sleep(1)
+    finally:
+        scraper.close()
+    print(f"Saved {saved} WebSocket events to {path}")
+
+
+def replay(path, decoder=None):
+    """Decode a recorded fixture and print the messages found"""
+    entries = decode_log(read_fixture(path), decoder or ChatFrameDecoder())
+    for entry in entries:
+        reply_indicator = f"[REPLY to {entry['replied_to']}] " if entry["is_reply"] else ""
+        print(f"[{entry.get('server_time', entry['timestamp'])}] {reply_indicator}{entry['username']}: "
+              f"{entry['content'][:80]}")
+    print(f"\n{len(entries)} chat messages decoded")
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Capture chat messages from WebSocket frames")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record_parser = commands.add_parser("record", help="Save the live chat's WebSocket frames to a fixture")
+    record_parser.add_argument("fixture", help="JSON Lines file to write")
+    record_parser.add_argument("--seconds", type=float, default=120.0, help="How long to record")
+    replay_parser = commands.add_parser("replay", help="Decode a recorded fixture offline")
+    replay_parser.add_argument("fixture", help="JSON Lines file written by record")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        record(args.fixture, args.seconds)
+    else:
+        replay(args.fixture)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Poll interval driven by how fast messages are arriving
+
+A fixed interval is too slow when the chat is busy (messages scroll out of
+the container before the next poll sees them) and wasteful when it is
+quiet. PollScheduler aims for a roughly constant number of new messages
+per poll from a smoothed arrival rate, and reacts immediately to polls
+that look like they missed something.
+"""
+import time
+
+
+class PollScheduler:
+    def __init__(self, min_interval=1.0, max_interval=60.0, target_new_per_poll=10, smoothing=0.3,
+                 idle_growth=1.5, high_new_fraction=0.8):
+        """
+        Args:
+            min_interval (float, optional): Shortest interval between polls, in seconds
+            max_interval (float, optional): Longest interval between polls, and longest
+                error backoff
+            target_new_per_poll (int, optional): New messages a poll should see at the
+                current arrival rate; well below what the chat container holds
+            smoothing (float, optional): Weight of the latest poll in the rate estimate
+            idle_growth (float, optional): Interval multiplier after a poll with nothing new
+            high_new_fraction (float, optional): When a poll that couldn't anchor to the
+                previous one finds more than this fraction new, halve the interval
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.target_new_per_poll = target_new_per_poll
+        self.smoothing = smoothing
+        self.idle_growth = idle_growth
+        self.high_new_fraction = high_new_fraction
+
+        self.interval = min_interval
+        self.rate = 0.0  # Smoothed new messages per second
+        self.gaps = 0  # Polls that probably missed messages
+        self._last_poll = None
+
+    def _clamp(self, interval):
+        return max(self.min_interval, min(self.max_interval, interval))
+
+    def record_poll(self, new, seen=None, anchored=False, gap=False):
+        """
+        Update the interval from the result of a successful poll
+
+        Args:
+            new (int): New messages the poll found
+            seen (int, optional): Messages the poll looked at
+            anchored (bool, optional): The poll started right after the previous poll's
+                last message, so nothing between them can have been missed
+            gap (bool, optional): Everything the poll saw was new and it couldn't anchor
+                to the previous poll, so messages probably scrolled past unseen
+
+        Returns:
+            float: Seconds to wait before the next poll
+        """
+        now = time.monotonic()
+        if self._last_poll is not None:
+            elapsed = max(now - self._last_poll, 1e-3)
+            self.rate += self.smoothing * (new / elapsed - self.rate)
+        self._last_poll = now
+
+        if gap:
+            self.gaps += 1
+            print(f"Poll saw only new messages, some were probably missed; polling every {self.min_interval:g}s")
+            self.interval = self.min_interval
+            return self.interval
+
+        if new:
+            interval = self.target_new_per_poll / self.rate if self.rate > 0 else self.interval
+        else:
+            interval = self.interval * self.idle_growth
+        if not anchored and seen and new / seen > self.high_new_fraction:
+            # Little overlap with what we already had, so we're cutting it close
+            interval = min(interval, self.interval / 2)
+
+        self.interval = self._clamp(interval)
+        return self.interval
+
+    def error_delay(self, consecutive_errors):
+        """
+        Exponential backoff after failed polls
+
+        Args:
+            consecutive_errors (int): Failed polls in a row, 1 for the first
+
+        Returns:
+            float: Seconds to wait before trying again
+        """
+        return self._clamp(self.min_interval * 2 ** max(0, consecutive_errors - 1))
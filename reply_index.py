@@ -0,0 +1,184 @@
+from bisect import bisect_right
+from collections import deque
+
+# Separates keys in a chunk's search text; a preview containing it can't be
+# matched against the joined text and falls back to a per-key scan
+_SEPARATOR = "\x00"
+
+# Keys per closed chunk of search text
+CHUNK_SIZE = 256
+
+
+class _Chunk:
+    """A closed run of keys joined into one search string"""
+
+    __slots__ = ("text", "offsets", "msg_ids")
+
+    def __init__(self, keys, msg_ids):
+        self.offsets = []  # Start of each key in text
+        parts = []
+        end = 0
+        for key in keys:
+            end += len(_SEPARATOR)
+            self.offsets.append(end)
+            parts.append(_SEPARATOR + key)
+            end += len(key)
+        self.text = "".join(parts)
+        self.msg_ids = msg_ids
+
+    def key(self, i):
+        end = self.offsets[i + 1] - len(_SEPARATOR) if i + 1 < len(self.offsets) else len(self.text)
+        return self.text[self.offsets[i]:end]
+
+    def find(self, preview_clean):
+        """Index of the newest key in this chunk containing the preview, or None"""
+        if _SEPARATOR in preview_clean:
+            for i in range(len(self.offsets) - 1, -1, -1):
+                if preview_clean in self.key(i):
+                    return i
+            return None
+        # str.rfind scans from the end, so a recent match is found quickly
+        found = self.text.rfind(preview_clean)
+        if found == -1:
+            return None
+        return bisect_right(self.offsets, found) - 1
+
+
+class _UserMessages:
+    """One user's messages, oldest first: closed chunks plus an open tail"""
+
+    __slots__ = ("chunks", "tail_keys", "tail_ids", "size")
+
+    def __init__(self):
+        self.chunks = deque()
+        self.tail_keys = []  # Stripped, lowercased content
+        self.tail_ids = []
+        self.size = 0
+
+
+class ReplyIndex:
+    def __init__(self, generate_message_id, max_messages_per_user=None, load_older=None):
+        """
+        Per-user index for resolving which message a reply points to
+
+        Gives the same answer as scanning a user's messages newest first for
+        one whose lowercased content contains the reply preview, without
+        lowercasing every message on every lookup. Each user's keys are
+        kept in chunks of CHUNK_SIZE joined into one string, so a lookup is
+        a str.rfind per chunk from the newest back to the first match, and
+        adding a message never copies more than one chunk.
+
+        Args:
+            generate_message_id (callable): (timestamp, username, content) -> msg_id
+            max_messages_per_user (int, optional): Keep only about this many of each
+                user's most recent messages; older ones can no longer be matched
+            load_older (callable, optional): username -> that user's records older than
+                the first one added, oldest first. Called at most once per user, the
+                first time a lookup for them finds no match, so history before the
+                startup tail is only read if a reply actually points into it
+        """
+        self.generate_message_id = generate_message_id
+        self.max_messages_per_user = max_messages_per_user
+        self.load_older = load_older
+        self._older = None
+        self._older_loaded = set()
+        self._users = {}
+
+    def __contains__(self, username):
+        return username in self._users
+
+    def add(self, msg):
+        """Index a message record; records must be added in chronological order"""
+        username = msg.get("username", "")
+        if not username:
+            return
+
+        user = self._users.get(username)
+        if user is None:
+            user = self._users[username] = _UserMessages()
+
+        content = msg.get("content", "")
+        user.tail_keys.append(content.strip().lower())
+        user.tail_ids.append(self.generate_message_id(msg.get("timestamp", ""), username, content))
+        user.size += 1
+
+        if len(user.tail_keys) >= CHUNK_SIZE:
+            user.chunks.append(_Chunk(user.tail_keys, user.tail_ids))
+            user.tail_keys = []
+            user.tail_ids = []
+            limit = self.max_messages_per_user
+            while limit and user.chunks and user.size - len(user.chunks[0].msg_ids) >= limit:
+                user.size -= len(user.chunks.popleft().msg_ids)
+
+    def _find_msg_id(self, user, preview_clean):
+        """Message ID of the newest message whose key contains the preview, or None"""
+        for i in range(len(user.tail_keys) - 1, -1, -1):
+            if preview_clean in user.tail_keys[i]:
+                return user.tail_ids[i]
+        for chunk in reversed(user.chunks):
+            i = chunk.find(preview_clean)
+            if i is not None:
+                return chunk.msg_ids[i]
+        return None
+
+    def find_reply_msg_id(self, replied_to_username, preview_text):
+        """
+        Find the message ID of the message being replied to
+
+        Args:
+            replied_to_username (str): Author of the replied-to message
+            preview_text (str): Reply preview shown above the reply
+
+        Returns:
+            str: Message ID of the newest matching message, falling back to the
+                user's most recent message, or None if the user is unknown
+        """
+        if not replied_to_username:
+            return None
+
+        user = self._users.get(replied_to_username)
+        if user is not None and not user.size:
+            user = None
+        preview_clean = preview_text.strip().lower() if preview_text else ""
+
+        if user is not None and preview_clean:
+            msg_id = self._find_msg_id(user, preview_clean)
+            if msg_id is not None:
+                return msg_id
+
+        if user is None or preview_clean:
+            # Nothing here matched, so look further back in history
+            older = self._older_index(replied_to_username)
+            if older is not None:
+                msg_id = older.find_reply_msg_id(replied_to_username, preview_text) if user is None \
+                    else older._find_preview(replied_to_username, preview_clean)
+                if msg_id is not None:
+                    return msg_id
+
+        if user is None:
+            return None
+
+        # If we can't find a specific match or there's no preview,
+        # just use the most recent message from this user
+        if user.tail_ids:
+            return user.tail_ids[-1]
+        return user.chunks[-1].msg_ids[-1]
+
+    def _find_preview(self, username, preview_clean):
+        """Message ID of the user's newest message containing the preview, or None"""
+        user = self._users.get(username)
+        if user is None:
+            return None
+        return self._find_msg_id(user, preview_clean)
+
+    def _older_index(self, username):
+        """Index of history before the first added message, with username's loaded"""
+        if self.load_older is None:
+            return None
+        if self._older is None:
+            self._older = ReplyIndex(self.generate_message_id, self.max_messages_per_user)
+        if username not in self._older_loaded:
+            self._older_loaded.add(username)
+            for msg in self.load_older(username):
+                self._older.add(msg)
+        return self._older
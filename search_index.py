@@ -0,0 +1,579 @@
+#!/usr/bin/env python3
+"""
+Full-text search over the master log
+
+An inverted index maps each word (and each author, as "@username") to the
+messages containing it, so a query reads a few posting lists instead of
+the whole archive. It lives in a directory next to the JSONL master log
+as a set of immutable segment files plus a small manifest recording the
+log offset they cover. Like the dedup index, an update only reads records
+appended since, and the index is rebuilt if the log has been rewritten.
+
+Each update adds a segment; segments of similar size are merged in tiers
+of merge_factor, so there are only ever a few dozen and each record is
+rewritten about log(n) times. A segment is memory-mapped and binary
+searched in place, so opening it costs nothing however large it is:
+
+    header
+    record byte offsets   uint64 per message, in log order
+    record dates          uint32 YYYYMMDD per message
+    term starts           uint64 per term + 1, into the term bytes
+    posting starts        uint64 per term + 1, into the postings
+    term bytes            the terms' UTF-8, sorted and concatenated
+    postings              uint32 message numbers per term, ascending
+
+Phrases are matched by intersecting their words' postings and then
+checking the candidates' text in the log, which keeps positions out of
+the index.
+
+Usage:
+  python search_index.py update [--log PATH]              catch up with the master log
+  python search_index.py query 'squeeze "short interest" user:alice since:20250901 until:20250930'
+"""
+import argparse
+import json
+import math
+import mmap
+import os
+import re
+import shlex
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from heapq import merge
+
+from log_index import log_check
+
+_SEGMENT_MAGIC = b'GCMSERCH'
+_SEGMENT_VERSION = 1
+# magic, version, unused, messages, terms, term bytes
+_SEGMENT_HEADER = struct.Struct('<8sIIQQQ')
+_MANIFEST_VERSION = 1
+
+_WORD = re.compile(r"[^\W_]+")
+# The live price change in a ticker embed isn't searchable text
+_PRICE_CHANGE = re.compile(r"\n[+-]?\d+(?:\.\d+)?%")
+
+USER_PREFIX = "@"
+
+
+def tokenize(text):
+    """Lower-case words of a message text, in order"""
+    return _WORD.findall(_PRICE_CHANGE.sub(" ", text).lower())
+
+
+def user_term(username):
+    """The term a username is indexed under"""
+    return USER_PREFIX + username.lower()
+
+
+def _record_date(msg):
+    try:
+        return int(msg.get("date", ""))
+    except ValueError:
+        return 0
+
+
+def _padding(size):
+    return bytes(-size % 8)
+
+
+def write_segment(path, offsets, dates, postings):
+    """
+    Write a segment file
+
+    Args:
+        path (str): Segment file to create
+        offsets (array): Byte offset in the log of each message, ascending
+        dates (array): YYYYMMDD date of each message, 0 if unknown
+        postings (dict): Term (bytes) -> array('I') of message numbers, ascending
+    """
+    terms = sorted(postings)
+    term_starts = array('Q', [0])
+    posting_starts = array('Q', [0])
+    for term in terms:
+        term_starts.append(term_starts[-1] + len(term))
+        posting_starts.append(posting_starts[-1] + len(postings[term]))
+    blob = b"".join(terms)
+
+    temp_path = f"{path}.temp"
+    with open(temp_path, 'wb') as f:
+        f.write(_SEGMENT_HEADER.pack(_SEGMENT_MAGIC, _SEGMENT_VERSION, 0, len(offsets), len(terms), len(blob)))
+        f.write(offsets.tobytes())
+        dates_bytes = dates.tobytes()
+        f.write(dates_bytes + _padding(len(dates_bytes)))
+        f.write(term_starts.tobytes())
+        f.write(posting_starts.tobytes())
+        f.write(blob + _padding(len(blob)))
+        for term in terms:
+            f.write(postings[term].tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+class Segment:
+    def __init__(self, path):
+        """
+        A memory-mapped segment file
+
+        Args:
+            path (str): Segment file
+        """
+        self.path = path
+        self.name = os.path.basename(path)
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, self.count, self.term_count, blob_size = _SEGMENT_HEADER.unpack_from(self._map)
+        if magic != _SEGMENT_MAGIC or version != _SEGMENT_VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a search index segment")
+
+        view = memoryview(self._map)
+        position = _SEGMENT_HEADER.size
+
+        def section(size, typecode, count):
+            nonlocal position
+            start = position
+            position += size * count
+            position += -position % 8
+            return view[start:start + size * count].cast(typecode)
+
+        self.offsets = section(8, 'Q', self.count)
+        self.dates = section(4, 'I', self.count)
+        self._term_starts = section(8, 'Q', self.term_count + 1)
+        self._posting_starts = section(8, 'Q', self.term_count + 1)
+        self._blob = view[position:position + blob_size]
+        position += blob_size + (-blob_size % 8)
+        self._postings = view[position:].cast('I')
+
+    def _term(self, i):
+        return bytes(self._blob[self._term_starts[i]:self._term_starts[i + 1]])
+
+    def terms(self):
+        """Yield every term (bytes), in sorted order"""
+        for i in range(self.term_count):
+            yield self._term(i)
+
+    def postings_at(self, i):
+        return self._postings[self._posting_starts[i]:self._posting_starts[i + 1]]
+
+    def postings(self, term):
+        """
+        Ascending message numbers containing a term
+
+        Returns:
+            memoryview: Message numbers, empty if the term isn't in the segment
+        """
+        key = term.encode('utf-8')
+        low, high = 0, self.term_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._term(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.term_count and self._term(low) == key:
+            return self.postings_at(low)
+        return self._postings[0:0]
+
+    def close(self):
+        # Views must be released before the map can close
+        for name in ("offsets", "dates", "_term_starts", "_posting_starts", "_blob", "_postings"):
+            view = self.__dict__.pop(name, None)
+            if view is not None:
+                view.release()
+        try:
+            self._map.close()
+        except BufferError:
+            pass  # A caller still holds some postings; the map closes when they go
+        self._file.close()
+
+
+def _intersect_newest(lists):
+    """
+    Yield values present in every ascending list, largest first
+
+    Walks the shortest list and binary searches the others, so a query
+    stopping at its limit never reads the rest.
+    """
+    lists = sorted(lists, key=len)
+    for value in reversed(lists[0]):
+        for other in lists[1:]:
+            i = bisect_left(other, value)
+            if i == len(other) or other[i] != value:
+                break
+        else:
+            yield value
+
+
+def parse_query(text):
+    """
+    Split a query string into its parts
+
+    Plain words must all appear, "quoted words" must appear together in
+    that order, user:NAME limits to one author and since:/until:YYYYMMDD to
+    a date range (inclusive).
+
+    Returns:
+        dict: Keyword arguments for SearchIndex.search
+    """
+    query = {"terms": [], "phrases": [], "username": None, "since": None, "until": None}
+    for part in shlex.split(text):
+        field, _, value = part.partition(":")
+        if value and field in ("user", "since", "until"):
+            query["username" if field == "user" else field] = value
+        elif " " in part:
+            query["phrases"].append(part)
+        else:
+            query["terms"].append(part)
+    return query
+
+
+class SearchIndex:
+    def __init__(self, log_path, index_dir=None, batch_size=50000, merge_factor=10):
+        """
+        Inverted index over a JSONL master log
+
+        Args:
+            log_path (str): JSONL master log
+            index_dir (str, optional): Index directory, log_path + ".search" by default
+            batch_size (int, optional): Most records read into one new segment
+            merge_factor (int, optional): Segments of a similar size merged at once
+        """
+        self.log_path = log_path
+        self.index_dir = index_dir or f"{log_path}.search"
+        self.manifest_path = os.path.join(self.index_dir, "manifest.json")
+        self.batch_size = batch_size
+        self.merge_factor = merge_factor
+        self.log_offset = 0
+        self.log_check = None
+        self.next_segment = 0
+        self.segments = []
+        os.makedirs(self.index_dir, exist_ok=True)
+        self._open()
+
+    def _open(self):
+        for segment in self.segments:
+            segment.close()
+        self.segments = []
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            manifest = None
+        except ValueError as e:
+            print(f"Ignoring unreadable search manifest {self.manifest_path}: {str(e)}")
+            manifest = None
+        if manifest is None or manifest.get("version") != _MANIFEST_VERSION:
+            manifest = {"log_offset": 0, "log_check": None, "next_segment": 0, "segments": []}
+        self.log_offset = manifest["log_offset"]
+        self.log_check = bytes.fromhex(manifest["log_check"]) if manifest["log_check"] else None
+        self.next_segment = manifest["next_segment"]
+        self.segments = [Segment(os.path.join(self.index_dir, name)) for name in manifest["segments"]]
+
+    def _save_manifest(self):
+        manifest = {
+            "version": _MANIFEST_VERSION,
+            "log_offset": self.log_offset,
+            "log_check": self.log_check.hex() if self.log_check else None,
+            "next_segment": self.next_segment,
+            "segments": [segment.name for segment in self.segments],
+        }
+        temp_path = f"{self.manifest_path}.temp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(temp_path, self.manifest_path)
+        # Segments left behind by merges or an interrupted update
+        names = set(manifest["segments"])
+        for name in os.listdir(self.index_dir):
+            if name.endswith(".seg") and name not in names:
+                os.remove(os.path.join(self.index_dir, name))
+
+    def _new_segment_path(self):
+        self.next_segment += 1
+        return os.path.join(self.index_dir, f"{self.next_segment:08d}.seg")
+
+    def __len__(self):
+        return sum(segment.count for segment in self.segments)
+
+    def _complete_end(self):
+        """Offset just past the last complete line in the log"""
+        try:
+            size = os.path.getsize(self.log_path)
+        except FileNotFoundError:
+            return 0
+        if size <= self.log_offset:
+            return size
+        with open(self.log_path, 'rb') as f:
+            # The writer may be part way through a line
+            position = size
+            while position > self.log_offset:
+                start = max(self.log_offset, position - (1 << 16))
+                f.seek(start)
+                chunk = f.read(position - start)
+                newline = chunk.rfind(b"\n")
+                if newline != -1:
+                    return start + newline + 1
+                position = start
+        return self.log_offset
+
+    def update(self):
+        """
+        Index the records appended to the log since the last update
+
+        Reads the log file directly without flushing anyone's buffers, so
+        it can run while the scraper is writing; records still in a buffer
+        or half written are picked up next time.
+
+        Returns:
+            int: Records added
+        """
+        if self.log_offset and log_check(self.log_path, self.log_offset) != self.log_check:
+            print(f"{self.log_path} was rewritten, rebuilding the search index")
+            for segment in self.segments:
+                segment.close()
+            self.segments = []
+            self.log_offset = 0
+
+        end = self._complete_end()
+        added = 0
+        offsets, dates, postings = array('Q'), array('I'), {}
+
+        def flush():
+            if offsets:
+                path = self._new_segment_path()
+                write_segment(path, offsets, dates, postings)
+                self.segments.append(Segment(path))
+                self._merge_tiers()
+
+        position = self.log_offset
+        if position < end:
+            with open(self.log_path, 'rb') as f:
+                f.seek(position)
+                while position < end:
+                    line = f.readline()
+                    offset = position
+                    position += len(line)
+                    try:
+                        msg = json.loads(line)
+                    except ValueError:
+                        continue
+                    number = len(offsets)
+                    offsets.append(offset)
+                    dates.append(_record_date(msg))
+                    terms = set(tokenize(msg.get("content") or ""))
+                    if msg.get("username"):
+                        terms.add(user_term(msg["username"]))
+                    for term in terms:
+                        postings.setdefault(term.encode('utf-8'), array('I')).append(number)
+                    added += 1
+                    if len(offsets) >= self.batch_size:
+                        flush()
+                        offsets, dates, postings = array('Q'), array('I'), {}
+            flush()
+
+        self.log_offset = end
+        self.log_check = log_check(self.log_path, end)
+        self._save_manifest()
+        return added
+
+    def _level(self, segment):
+        return int(math.log(max(segment.count, 1), self.merge_factor))
+
+    def _merge_tiers(self):
+        """Merge the newest segments while merge_factor of them are the same size class"""
+        while len(self.segments) >= self.merge_factor:
+            newest = self.segments[-self.merge_factor:]
+            if len({self._level(segment) for segment in newest}) != 1:
+                return
+            path = self._new_segment_path()
+            merge_segments(path, newest)
+            for segment in newest:
+                segment.close()
+            self.segments[-self.merge_factor:] = [Segment(path)]
+
+    def search(self, terms=(), phrases=(), username=None, since=None, until=None, limit=50):
+        """
+        Messages matching a query, newest first
+
+        Args:
+            terms (list, optional): Words that must all appear (case-insensitive)
+            phrases (list, optional): Texts whose words must appear consecutively
+            username (str, optional): Only messages by this user (case-insensitive)
+            since (str, optional): First date, YYYYMMDD
+            until (str, optional): Last date, YYYYMMDD
+            limit (int, optional): Most results, None for all
+
+        Returns:
+            list: Matching records, each with its log "offset" added
+        """
+        # Stored offsets only hold for the log they were read from; after a
+        # rewrite (e.g. delete_duplicates.py) rebuild before seeking
+        if self.log_offset and log_check(self.log_path, self.log_offset) != self.log_check:
+            self.update()
+
+        words = [word for term in terms for word in tokenize(term)]
+        phrase_words = [tokenize(phrase) for phrase in phrases]
+        required = set(words)
+        for phrase in phrase_words:
+            required.update(phrase)
+        required = sorted(required)
+        if username:
+            required.append(user_term(username))
+        since = int(since) if since else 0
+        until = int(until) if until else 0
+
+        results = []
+        with open(self.log_path, 'rb') as log:
+            for segment in reversed(self.segments):
+                if required:
+                    lists = [segment.postings(term) for term in required]
+                    candidates = _intersect_newest(lists) if all(lists) else ()
+                else:
+                    candidates = reversed(range(segment.count))
+                for number in candidates:
+                    date = segment.dates[number]
+                    if (since and date < since) or (until and date > until):
+                        continue
+                    log.seek(segment.offsets[number])
+                    msg = json.loads(log.readline())
+                    if phrase_words and not _contains_phrases(tokenize(msg.get("content") or ""), phrase_words):
+                        continue
+                    msg["offset"] = segment.offsets[number]
+                    results.append(msg)
+                    if limit is not None and len(results) >= limit:
+                        return results
+        return results
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
+        self.segments = []
+
+
+class BackgroundIndexer:
+    def __init__(self, index, interval=60.0):
+        """
+        Keep a search index up to date from a thread while the scraper runs
+
+        Updates run off the capture loop, since a merge of large segments
+        can take seconds. They only read the log, so they don't interfere
+        with the writer.
+
+        Args:
+            index (SearchIndex): Index to update
+            interval (float, optional): Seconds between updates
+        """
+        self.index = index
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="search-indexer", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.index.update()
+            except Exception as e:
+                print(f"Error updating search index: {str(e)}")
+            if self._stop.wait(self.interval):
+                return
+
+    def close(self):
+        """Index everything written so far and stop"""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        try:
+            self.index.update()
+        except Exception as e:
+            print(f"Error updating search index: {str(e)}")
+        self.index.close()
+
+
+def _contains_phrases(tokens, phrases):
+    for phrase in phrases:
+        if not any(tokens[i:i + len(phrase)] == phrase for i in range(len(tokens) - len(phrase) + 1)):
+            return False
+    return True
+
+
+def _numbered_terms(segment, index):
+    for i, term in enumerate(segment.terms()):
+        yield term, index, i
+
+
+def merge_segments(path, segments):
+    """
+    Write one segment holding several consecutive ones, in order
+
+    Args:
+        path (str): Segment file to create
+        segments (list): Segments, oldest first
+    """
+    offsets, dates = array('Q'), array('I')
+    bases = []
+    for segment in segments:
+        bases.append(len(offsets))
+        offsets.frombytes(segment.offsets.tobytes())
+        dates.frombytes(segment.dates.tobytes())
+
+    postings = {}
+    # Terms of every segment in sorted order; a term in several segments
+    # gets their postings concatenated, renumbered, oldest first
+    for term, index, i in merge(*(_numbered_terms(segment, index) for index, segment in enumerate(segments))):
+        values = segments[index].postings_at(i)
+        base = bases[index]
+        merged = postings.setdefault(term, array('I'))
+        if base:
+            merged.extend(value + base for value in values)
+        else:
+            merged.frombytes(values.tobytes())
+    write_segment(path, offsets, dates, postings)
+
+
+def print_results(results):
+    for msg in results:
+        reply_indicator = f"[REPLY to {msg['replied_to']}] " if msg.get("isReply") else ""
+        print(f"[{msg.get('date', '')} {msg.get('timestamp', '')}] {reply_indicator}{msg.get('username', '')}: "
+              f"{msg.get('content', '')[:100]}")
+
+
+def main():
+    from config import LOG_DIRECTORY
+
+    parser = argparse.ArgumentParser(description="Full-text search over the master log")
+    parser.add_argument("--log", default=os.path.join(LOG_DIRECTORY, "MASTER_LOG.jsonl"), help="JSONL master log")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("update", help="Index records appended since the last update")
+    query_parser = commands.add_parser("query", help="Search, newest first")
+    query_parser.add_argument("query", help='Words, "a phrase", user:NAME, since:YYYYMMDD, until:YYYYMMDD')
+    query_parser.add_argument("--limit", type=int, default=50, help="Most results to show")
+    query_parser.add_argument("--no-update", action="store_true", help="Don't index new records first")
+    args = parser.parse_args()
+
+    index = SearchIndex(args.log)
+    try:
+        if args.command == "update" or not args.no_update:
+            start = time.perf_counter()
+            added = index.update()
+            if args.command == "update" or added:
+                print(f"Indexed {added} new records in {time.perf_counter() - start:.1f} s, "
+                      f"{len(index)} in {len(index.segments)} segments")
+        if args.command == "query":
+            start = time.perf_counter()
+            results = index.search(limit=args.limit, **parse_query(args.query))
+            elapsed = (time.perf_counter() - start) * 1000
+            print_results(results)
+            print(f"\n{len(results)} results in {elapsed:.1f} ms")
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Offline sentiment scores for chat messages
+
+Messages are scored with a small lexicon of trading-chat words and emoji,
+with negation ("not bullish") and intensifiers ("very bearish") handled
+over the next few words, and the total squashed into [-1, 1]. It runs
+locally on the CPU with no model or network access, at tens of thousands
+of messages per second per core.
+
+Scores are cached in a binary file next to the master log, keyed by the
+message's 64-bit msg_key digest, so a rerun only scores messages it hasn't
+seen. The cache is dropped automatically when the lexicon changes. The
+first run over the archive scores in a process pool.
+
+Scores roll up per ticker (using ticker_mentions' rules for what counts as
+a mention) and per user.
+
+Usage:
+  python sentiment.py score [LOG ...] [--workers N]      score and cache new messages
+  python sentiment.py tickers [LOG ...] [--top N]        sentiment per ticker
+  python sentiment.py users [LOG ...] [--top N]          sentiment per user
+  python sentiment.py text "TEXT"                        score a single text
+"""
+import argparse
+import json
+import math
+import os
+import re
+import struct
+from concurrent.futures import ProcessPoolExecutor
+from hashlib import blake2b
+
+from message_ids import record_digest
+from storage import iter_records
+from ticker_mentions import STOPWORDS, message_tickers
+
+LEXICON = {
+    # Direction
+    "bullish": 2.0, "bull": 1.0, "bulls": 1.0, "bearish": -2.0, "bear": -1.0, "bears": -1.0,
+    "long": 0.5, "short": -0.5, "shorts": -0.5, "calls": 1.0, "puts": -1.0,
+    "buy": 1.0, "buying": 1.0, "bought": 0.5, "sell": -1.0, "selling": -1.0, "sold": -0.5,
+    "up": 0.5, "down": -0.5, "green": 1.0, "red": -1.0, "higher": 0.5, "lower": -0.5,
+    # Moves
+    "moon": 2.0, "mooning": 2.5, "rip": 1.5, "ripping": 2.0, "rally": 1.5, "rallying": 1.5,
+    "breakout": 1.5, "squeeze": 1.5, "soar": 2.0, "soaring": 2.0, "surge": 1.5, "pump": 1.0,
+    "pumping": 1.0, "jumped": 1.0, "run": 0.5, "runner": 1.0,
+    "dump": -1.5, "dumping": -1.5, "dumped": -1.5, "crash": -2.5, "crashing": -2.5, "tank": -2.0,
+    "tanking": -2.0, "tanked": -2.0, "drop": -1.0, "dropping": -1.0, "dip": -0.5, "plunge": -2.0,
+    "collapse": -2.5, "selloff": -2.0, "rug": -2.5, "rugged": -2.5, "bleeding": -2.0,
+    # News
+    "beat": 1.5, "beats": 1.5, "miss": -1.5, "missed": -1.5, "upgrade": 1.5, "upgraded": 1.5,
+    "downgrade": -1.5, "downgraded": -1.5, "approval": 2.0, "approved": 2.0, "crl": -2.5,
+    "rejected": -2.0, "rejection": -2.0, "fail": -2.0, "failed": -2.0, "dilution": -2.0,
+    "offering": -1.0, "bankrupt": -3.0, "bankruptcy": -3.0, "fraud": -3.0, "scam": -2.5,
+    "undervalued": 1.5, "overvalued": -1.5, "cheap": 0.5, "expensive": -0.5, "strong": 1.0,
+    "weak": -1.0, "growth": 1.0, "risk": -0.5, "risky": -1.0,
+    # Feelings
+    "good": 1.5, "great": 2.0, "love": 2.0, "nice": 1.5, "amazing": 2.5, "awesome": 2.5,
+    "happy": 1.5, "win": 1.5, "winning": 1.5, "gains": 1.5, "profit": 1.5, "profits": 1.5,
+    "bad": -1.5, "terrible": -2.5, "awful": -2.5, "hate": -2.0, "worst": -2.5, "ugly": -1.5,
+    "loss": -1.5, "losses": -1.5, "losing": -1.5, "lost": -1.5, "rekt": -2.5, "bagholder": -1.5,
+    "bagholding": -1.5, "bags": -1.0, "dead": -1.5, "scared": -1.5, "fear": -1.5, "panic": -2.0,
+    "worried": -1.5, "regret": -1.5, "pain": -1.5,
+    # Emoji
+    "\U0001F680": 2.0, "\U0001F4C8": 2.0, "\U0001F4C9": -2.0, "\U0001F315": 1.5, "\U0001F319": 1.0,
+    "\U0001F402": 1.5, "\U0001F43B": -1.5, "\U0001F48E": 1.0, "\U0001F525": 1.0, "\U0001F480": -1.0,
+    "\U0001F62D": -1.0, "\U0001F921": -1.5, "\U0001F4B0": 1.5,
+}
+
+NEGATIONS = frozenset({
+    "not", "no", "never", "nothing", "neither", "nor", "without", "don't", "dont", "doesn't", "doesnt",
+    "didn't", "didnt", "isn't", "isnt", "aren't", "arent", "wasn't", "wasnt", "won't", "wont", "can't",
+    "cant", "couldn't", "shouldn't", "wouldn't", "ain't",
+})
+
+INTENSIFIERS = {"very": 1.3, "really": 1.3, "super": 1.4, "so": 1.2, "extremely": 1.5, "insanely": 1.5,
+                "hugely": 1.4, "massively": 1.5, "slightly": 0.7, "somewhat": 0.8, "kinda": 0.8}
+
+# Words after a negation whose score is flipped (and damped)
+_NEGATION_WINDOW = 3
+_NEGATION_SCALE = -0.74
+# Squashes a summed score into [-1, 1]; higher makes single words count for less
+_NORMALIZATION = 15.0
+
+_TOKEN = re.compile(r"[a-z][a-z']*|[\U0001F300-\U0001FAFF\u2600-\u27BF]")
+# Ticker embed price changes and links carry no sentiment of their own
+_NOISE = re.compile(r"\n[+-]?\d+(?:\.\d+)?%|https?://\S+")
+
+_CACHE_MAGIC = b'GCMSENTI'
+_CACHE_VERSION = 1
+# magic, version, hash of the scoring rules
+_CACHE_HEADER = struct.Struct('<8sI16s')
+# digest, score
+_CACHE_ENTRY = struct.Struct('<Qf')
+
+
+def lexicon_hash():
+    """Hash of everything scores depend on, so a cache from other rules is dropped"""
+    rules = json.dumps([LEXICON, sorted(NEGATIONS), INTENSIFIERS, _NEGATION_WINDOW, _NEGATION_SCALE,
+                        _NORMALIZATION], sort_keys=True)
+    return blake2b(rules.encode('utf-8'), digest_size=16).digest()
+
+
+def score_text(text):
+    """
+    Sentiment of a message text
+
+    Returns:
+        float: From -1 (negative) to 1 (positive), 0 when no lexicon word appears
+    """
+    total = 0.0
+    negated = 0  # Words left in the current negation's window
+    boost = 1.0
+    for token in _TOKEN.findall(_NOISE.sub(" ", text).lower()):
+        if token in NEGATIONS:
+            negated = _NEGATION_WINDOW
+            continue
+        if token in INTENSIFIERS:
+            boost = INTENSIFIERS[token]
+            continue
+        value = LEXICON.get(token)
+        if value is not None:
+            value *= boost
+            if negated:
+                value *= _NEGATION_SCALE
+            total += value
+        boost = 1.0
+        negated = max(0, negated - 1)
+    if not total:
+        return 0.0
+    return total / math.sqrt(total * total + _NORMALIZATION)
+
+
+def score_texts(texts):
+    """Scores for a list of texts; the unit of work for the process pool"""
+    return [score_text(text) for text in texts]
+
+
+class SentimentCache:
+    def __init__(self, path):
+        """
+        Scores by message digest, persisted in an append-only file
+
+        Each score is a fixed 12-byte entry (digest, float32), appended as
+        it is computed, so an interrupted run keeps what it scored. A cache
+        written with a different lexicon is discarded on open.
+
+        Args:
+            path (str): Cache file
+        """
+        self.path = path
+        self.scores = {}
+        self._rules = lexicon_hash()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+        header = data[:_CACHE_HEADER.size]
+        if len(header) != _CACHE_HEADER.size or _CACHE_HEADER.unpack(header) != (_CACHE_MAGIC, _CACHE_VERSION,
+                                                                                   self._rules):
+            print(f"Discarding sentiment cache {self.path} from other scoring rules")
+            os.remove(self.path)
+            return
+        # A crash can leave a partial entry at the end
+        end = _CACHE_HEADER.size + (len(data) - _CACHE_HEADER.size) // _CACHE_ENTRY.size * _CACHE_ENTRY.size
+        for digest, score in _CACHE_ENTRY.iter_unpack(data[_CACHE_HEADER.size:end]):
+            self.scores[digest] = score
+        if end != len(data):
+            with open(self.path, 'r+b') as f:
+                f.truncate(end)
+
+    def __contains__(self, digest):
+        return digest in self.scores
+
+    def __len__(self):
+        return len(self.scores)
+
+    def get(self, digest):
+        return self.scores.get(digest)
+
+    def add(self, scored):
+        """
+        Add and persist scores
+
+        Args:
+            scored (list): (digest, score) pairs
+        """
+        if not scored:
+            return
+        new_file = not os.path.exists(self.path)
+        with open(self.path, 'ab') as f:
+            if new_file:
+                f.write(_CACHE_HEADER.pack(_CACHE_MAGIC, _CACHE_VERSION, self._rules))
+            for digest, score in scored:
+                entry = _CACHE_ENTRY.pack(digest, score)
+                f.write(entry)
+                # Stored as float32, so keep the rounded value that a reload would see
+                self.scores[digest] = _CACHE_ENTRY.unpack(entry)[1]
+
+
+def _records(log_paths):
+    """Distinct records across logs, with their digests"""
+    seen = set()
+    for path in log_paths:
+        for msg in iter_records(path):
+            digest = record_digest(msg)
+            if digest is None or digest in seen:
+                continue
+            seen.add(digest)
+            yield digest, msg
+
+
+def score_logs(log_paths, cache, workers=None, chunk_size=2000):
+    """
+    Score every message in the logs that isn't cached yet
+
+    Args:
+        log_paths (list): Logs to read
+        cache (SentimentCache): Cache to read from and add to
+        workers (int, optional): Processes to score in, None for one per CPU.
+            Fewer than two chunks are scored in this process.
+        chunk_size (int, optional): Messages per unit of work
+
+    Returns:
+        tuple: (messages scored, messages already cached)
+    """
+    pending = []
+    cached = 0
+    for digest, msg in _records(log_paths):
+        if digest in cache:
+            cached += 1
+        else:
+            pending.append((digest, msg.get("content") or ""))
+
+    chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+    if len(chunks) < 2 or workers == 1:
+        for chunk in chunks:
+            cache.add(list(zip([digest for digest, _ in chunk], score_texts([text for _, text in chunk]))))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(score_texts, [[text for _, text in chunk] for chunk in chunks])
+            for chunk, scores in zip(chunks, results):
+                cache.add(list(zip([digest for digest, _ in chunk], scores)))
+    return len(pending), cached
+
+
+def aggregate(log_paths, cache, since=None, until=None, batch_size=5000):
+    """
+    Roll cached scores up per ticker and per user
+
+    Messages without a cached score are skipped, so score the logs first.
+
+    Args:
+        log_paths (list): Logs to read
+        cache (SentimentCache): Scores
+        since (str, optional): First date to include, YYYYMMDD
+        until (str, optional): Last date to include, YYYYMMDD
+
+    Returns:
+        tuple: (tickers, users), each name -> {"messages", "mean", "positive", "negative"}
+    """
+    totals = {"tickers": {}, "users": {}}
+    known = set()
+
+    def add(group, name, score):
+        values = totals[group].setdefault(name, [0, 0.0, 0, 0])
+        values[0] += 1
+        values[1] += score
+        if score > 0:
+            values[2] += 1
+        elif score < 0:
+            values[3] += 1
+
+    def flush(batch):
+        tickers_by_message = message_tickers([msg.get("content") or "" for msg, _ in batch], known, STOPWORDS)
+        for (msg, score), tickers in zip(batch, tickers_by_message):
+            if msg.get("username"):
+                add("users", msg["username"], score)
+            for ticker in tickers:
+                add("tickers", ticker, score)
+
+    batch = []
+    for digest, msg in _records(log_paths):
+        score = cache.get(digest)
+        date = msg.get("date", "")
+        if score is None or (since and date < since) or (until and date > until):
+            continue
+        batch.append((msg, score))
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+    def summary(group):
+        return {name: {"messages": count, "mean": total / count, "positive": positive, "negative": negative}
+                for name, (count, total, positive, negative) in totals[group].items()}
+
+    return summary("tickers"), summary("users")
+
+
+def _print_table(rows, top, label):
+    ranked = sorted(rows.items(), key=lambda item: -item[1]["messages"])[:top]
+    print(f"{label:<20} {'messages':>8} {'mean':>7} {'pos':>6} {'neg':>6}")
+    for name, values in ranked:
+        print(f"{name:<20} {values['messages']:>8} {values['mean']:>+7.3f} {values['positive']:>6} "
+              f"{values['negative']:>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline sentiment scores for chat messages")
+    parser.add_argument("--cache", default=None, help="Score cache (default: next to the master log)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    score_parser = commands.add_parser("score", help="Score and cache messages not scored yet")
+    score_parser.add_argument("logs", nargs="*", help="Logs to read (default: the master log)")
+    score_parser.add_argument("--workers", type=int, default=None, help="Scoring processes (default: one per CPU)")
+    for name, label in (("tickers", "per ticker"), ("users", "per user")):
+        report_parser = commands.add_parser(name, help=f"Sentiment {label}")
+        report_parser.add_argument("logs", nargs="*", help="Logs to read (default: the master log)")
+        report_parser.add_argument("--top", type=int, default=20, help="Rows to show, most messages first")
+        report_parser.add_argument("--since", default=None, help="First date, YYYYMMDD")
+        report_parser.add_argument("--until", default=None, help="Last date, YYYYMMDD")
+    text_parser = commands.add_parser("text", help="Score a single text")
+    text_parser.add_argument("text")
+    args = parser.parse_args()
+
+    if args.command == "text":
+        print(f"{score_text(args.text):+.3f}")
+        return
+
+    from config import LOG_DIRECTORY
+    master_log = os.path.join(LOG_DIRECTORY, "MASTER_LOG.jsonl")
+    log_paths = args.logs or [master_log]
+    cache = SentimentCache(args.cache or f"{master_log}.sentiment")
+    if args.command == "score":
+        scored, cached = score_logs(log_paths, cache, args.workers)
+        print(f"Scored {scored} messages, {cached} already cached")
+    else:
+        tickers, users = aggregate(log_paths, cache, args.since, args.until)
+        _print_table(tickers if args.command == "tickers" else users, args.top,
+                     "ticker" if args.command == "tickers" else "user")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,9 @@ setup(
     install_requires=[
         "selenium>=4.0.0",
     ],
+    extras_require={
+        "analytics": ["pyarrow>=12.0.0"],
+    },
     author="Hayden",
     author_email="haydenwaffles@gmail.com",
     description="A tool to scrape and mine Godel Terminal chat messages",
@@ -0,0 +1,885 @@
+import atexit
+import json
+import os
+import queue
+import shutil
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from log_index import SidecarIndex
+from message_ids import digest_to_key, record_digest
+
+# Tells the BackgroundWriter thread to exit once the queue ahead of it is written
+_STOP = object()
+
+
+def _iter_json_array(f, chunk_size=1 << 16):
+    """Yield the elements of a JSON array one at a time without reading the whole file"""
+    decoder = json.JSONDecoder()
+    buffer = f.read(chunk_size).lstrip()
+    pos = 1  # Past the opening bracket
+    while True:
+        # Skip whitespace and separators, reading more if the buffer runs out
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos < len(buffer):
+                break
+            buffer = f.read(chunk_size)
+            pos = 0
+            if not buffer:
+                return
+
+        if buffer[pos] == ']':
+            return
+
+        try:
+            record, end = decoder.raw_decode(buffer, pos)
+        except ValueError:
+            # The record continues past the end of the buffer
+            more = f.read(chunk_size)
+            if not more:
+                raise
+            buffer = buffer[pos:] + more
+            pos = 0
+            continue
+
+        yield record
+        pos = end
+        if pos > chunk_size:
+            buffer = buffer[pos:]
+            pos = 0
+
+
+def iter_records(path):
+    """
+    Stream message records from a log file
+
+    Handles both the legacy pretty-printed JSON array format and the
+    append-only JSON Lines format, holding only one record at a time. A torn
+    trailing line in a JSONL file (e.g. from a crash mid-write) is skipped
+    with a warning.
+
+    Args:
+        path (str): Path to the log file
+
+    Yields:
+        dict: Message records in file order
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        first_char = ''
+        while True:
+            ch = f.read(1)
+            if not ch or not ch.isspace():
+                first_char = ch
+                break
+        f.seek(0)
+
+        if first_char == '[':
+            yield from _iter_json_array(f)
+            return
+
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                print(f"Skipping unreadable line {line_number} in {path}")
+
+
+def load_records(path):
+    """
+    Load every message record from a log file
+
+    Args:
+        path (str): Path to the log file, JSON array or JSON Lines
+
+    Returns:
+        list: Message records in file order
+    """
+    return list(iter_records(path))
+
+
+class RecordWriter:
+    def __init__(self, path):
+        """
+        Write a log one record at a time, replacing the file atomically on close
+
+        Files ending in .jsonl are written one JSON object per line, anything
+        else as a JSON array like the original logs. The data goes to a temp
+        file that replaces the log only when the writer closes without an
+        error, so a crash mid-write leaves the previous log intact.
+
+        Args:
+            path (str): Path of the log to write
+        """
+        self.path = path
+        self.count = 0
+        self._jsonl = path.endswith('.jsonl')
+        self._temp_path = f"{path}.temp"
+        self._file = open(self._temp_path, 'w', encoding='utf-8')
+        if not self._jsonl:
+            self._file.write('[')
+
+    def write(self, msg):
+        if self._jsonl:
+            self._file.write(json.dumps(msg, ensure_ascii=False) + '\n')
+        else:
+            # Same layout as json.dump(records, indent=2)
+            item = json.dumps(msg, indent=2, ensure_ascii=False).replace('\n', '\n  ')
+            self._file.write((',\n  ' if self.count else '\n  ') + item)
+        self.count += 1
+
+    def close(self):
+        if not self._jsonl:
+            self._file.write('\n]' if self.count else ']')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self._temp_path, self.path)
+
+    def abort(self):
+        """Discard everything written and leave the existing log untouched"""
+        self._file.close()
+        os.remove(self._temp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def write_records(path, records):
+    """
+    Atomically replace a log with the given records
+
+    Files ending in .jsonl are written one JSON object per line, anything
+    else as a JSON array like the original logs.
+    """
+    with RecordWriter(path) as writer:
+        for msg in records:
+            writer.write(msg)
+
+
+class MessageStore:
+    """
+    Base class for message storage backends
+
+    A backend owns one log and only ever receives the new records for a
+    poll, so the cost of a write scales with the number of new messages
+    rather than with the size of the history.
+    """
+
+    def load(self):
+        """Return all stored message records, oldest first"""
+        raise NotImplementedError
+
+    def iter_records(self, start=0, stop=None):
+        """
+        Stream stored records, oldest first
+
+        Args:
+            start (int, optional): Position to start at, as returned by tail()
+            stop (int, optional): Position to stop before, None for the end
+        """
+        return iter(self.load()[start:stop])
+
+    def tail(self, count):
+        """
+        Return the most recent records without loading the rest
+
+        Returns:
+            tuple: (position of the first returned record, list of records)
+        """
+        records = self.load()
+        start = max(0, len(records) - count)
+        return start, records[start:]
+
+    def iter_digests(self):
+        """Stream the digest of every stored record that has one"""
+        for msg in self.iter_records():
+            digest = record_digest(msg)
+            if digest is not None:
+                yield digest
+
+    def user_records(self, username, before=None, limit=None):
+        """
+        Return a user's records, oldest first
+
+        Args:
+            username (str): Author to look up
+            before (int, optional): Only records before this position, as returned by tail()
+            limit (int, optional): Only the most recent this many
+        """
+        records = [msg for msg in self.iter_records(stop=before) if msg.get("username") == username]
+        return records[-limit:] if limit else records
+
+    def append(self, messages):
+        """Persist a batch of new message records"""
+        raise NotImplementedError
+
+    def flush(self):
+        """Force any buffered records to durable storage"""
+
+    def backup(self):
+        """Copy the stored log aside and return its path, or None if unsupported"""
+        return None
+
+    def close(self):
+        """Flush and release any open resources"""
+        self.flush()
+
+
+class JsonlMessageStore(MessageStore):
+    def __init__(self, path, legacy_path=None, fsync_batch=50, fsync_interval=2.0, sidecar=True):
+        """
+        Append-only JSON Lines message log
+
+        The log is never rewritten while capturing, so byte offsets held by
+        the sidecar, the reply loader and the search index stay valid.
+        Duplicates are removed offline with chat_logs/delete_duplicates.py.
+
+        Args:
+            path (str): Path to the .jsonl log file
+            legacy_path (str, optional): Old JSON-array log to import on first load
+            fsync_batch (int, optional): Records written before forcing an fsync
+            fsync_interval (float, optional): Seconds after which the next append fsyncs
+                pending records. Every append is handed to the OS immediately,
+                so only a power loss, not a crash, can lose unsynced records.
+            sidecar (bool, optional): Maintain a SidecarIndex of digests, byte offsets
+                and per-user history in path + ".idx"
+        """
+        self.path = path
+        self.legacy_path = legacy_path
+        self.fsync_batch = fsync_batch
+        self.fsync_interval = fsync_interval
+
+        self.index = SidecarIndex(f"{path}.idx") if sidecar else None
+        self._index_synced = False
+
+        self._file = None
+        self._size = 0
+        self._pending = 0  # Records written but not yet fsynced
+        self._last_sync = time.monotonic()
+
+    def load(self):
+        """Load existing records, importing the legacy JSON-array log if needed"""
+        if os.path.exists(self.path):
+            return load_records(self.path)
+        return self._import_legacy()
+
+    def _import_legacy(self):
+        """Convert the legacy JSON-array log to JSONL if the JSONL log doesn't exist yet"""
+        if os.path.exists(self.path) or not (self.legacy_path and os.path.exists(self.legacy_path)):
+            return []
+        records = load_records(self.legacy_path)
+        self._write_all(records)
+        print(f"Imported {len(records)} messages from {self.legacy_path} into {self.path}")
+        return records
+
+    def size(self):
+        """Size of the log in bytes, i.e. the position the next record is written at"""
+        if self._file is not None:
+            self._file.flush()
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def iter_records(self, start=0, stop=None):
+        """
+        Stream records whose lines start at byte offsets in [start, stop)
+
+        Args:
+            start (int, optional): Byte offset of a line start, e.g. from tail()
+            stop (int, optional): Byte offset to stop before, None for the end
+        """
+        for _, _, msg in self._iter_lines(start, stop):
+            yield msg
+
+    def _iter_lines(self, start=0, stop=None):
+        """Yield (offset, end offset, record) for each readable line in [start, stop)"""
+        self._import_legacy()
+        if not os.path.exists(self.path):
+            return
+        if self._file is not None:
+            self._file.flush()
+        with open(self.path, 'rb') as f:
+            f.seek(start)
+            position = start
+            for line in f:
+                if stop is not None and position >= stop:
+                    return
+                offset = position
+                position += len(line)
+                if not line.strip():
+                    continue
+                try:
+                    msg = json.loads(line)
+                except ValueError:
+                    print(f"Skipping unreadable line at byte {offset} in {self.path}")
+                    continue
+                yield offset, position, msg
+
+    def _read_line_at(self, f, offset):
+        """Return (record, end offset) for the line at offset, or (None, None)"""
+        f.seek(offset)
+        line = f.readline()
+        try:
+            return json.loads(line), offset + len(line)
+        except ValueError:
+            return None, None
+
+    def sync_index(self):
+        """
+        Open the sidecar index and bring it up to date with the log
+
+        Entries for records appended without the index (e.g. before a crash)
+        are added; if the log was rewritten under it, it is rebuilt.
+
+        Returns:
+            SidecarIndex: The index, or None if this store has none
+        """
+        if self.index is None:
+            return None
+        if self._index_synced:
+            return self.index
+
+        self._import_legacy()
+        self.index.open()
+        start = 0
+        if self.index.count and os.path.exists(self.path):
+            digest, offset, _, _ = self.index.entry(self.index.count - 1)
+            with open(self.path, 'rb') as f:
+                msg, end = self._read_line_at(f, offset)
+            if msg is not None and (record_digest(msg) or 0) == digest:
+                start = end
+        if self.index.count and not start:
+            print(f"Rebuilding {self.index.path}, the log changed since it was written")
+            self.index.clear()
+
+        batch = []
+        for offset, _, msg in self._iter_lines(start):
+            batch.append((record_digest(msg), offset, msg.get("username", "")))
+            if len(batch) >= 10000:
+                self.index.append(batch)
+                batch = []
+        self.index.append(batch)
+        self._index_synced = True
+        return self.index
+
+    def iter_digests(self):
+        """Stream every record's digest, from the sidecar index if there is one"""
+        index = self.sync_index()
+        if index is None:
+            return super().iter_digests()
+        return index.digests()
+
+    def user_records(self, username, before=None, limit=None):
+        """
+        Return a user's records from the sidecar index, oldest first
+
+        Args:
+            username (str): Author to look up
+            before (int, optional): Only records starting before this byte offset
+            limit (int, optional): Only the most recent this many
+        """
+        index = self.sync_index()
+        if index is None:
+            return super().user_records(username, before, limit)
+
+        if self._file is not None:
+            self._file.flush()
+        records = []
+        with open(self.path, 'rb') as f:
+            for offset in reversed(index.user_offsets(username, before, limit)):
+                msg, _ = self._read_line_at(f, offset)
+                if msg is not None:
+                    records.append(msg)
+        return records
+
+    def tail(self, count, block_size=1 << 16):
+        """
+        Return the last count records, reading the log backwards from the end
+
+        Returns:
+            tuple: (byte offset of the first returned record, list of records)
+        """
+        self._import_legacy()
+        end = self.size()
+        if not end or count <= 0:
+            return end, []
+
+        with open(self.path, 'rb') as f:
+            position = end
+            data = b''
+            while position > 0 and data.count(b'\n') <= count:
+                step = min(block_size, position)
+                position -= step
+                f.seek(position)
+                data = f.read(step) + data
+
+        if position > 0:
+            # Drop the partial line the first block started in
+            cut = data.index(b'\n') + 1
+            position += cut
+            data = data[cut:]
+
+        lines = []
+        offset = position
+        for line in data.splitlines(keepends=True):
+            if line.strip():
+                lines.append((offset, line))
+            offset += len(line)
+        lines = lines[-count:]
+        if not lines:
+            return end, []
+
+        records = []
+        for offset, line in lines:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                print(f"Skipping unreadable line at byte {offset} in {self.path}")
+        return lines[0][0], records
+
+    def _open(self):
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, 'ab')
+            self._size = self._file.tell()
+        return self._file
+
+    def append(self, messages):
+        """Append new records as one JSON object per line"""
+        if not messages:
+            return
+
+        index = self.sync_index()
+        f = self._open()
+        lines = [(json.dumps(msg, ensure_ascii=False) + '\n').encode('utf-8') for msg in messages]
+        f.write(b''.join(lines))
+        # Hand the records to the OS right away so a crash of this process
+        # can't lose them; only the fsync is batched
+        f.flush()
+        if index is not None:
+            entries = []
+            for msg, line in zip(messages, lines):
+                entries.append((record_digest(msg), self._size, msg.get("username", "")))
+                self._size += len(line)
+            index.append(entries)
+        else:
+            self._size += sum(len(line) for line in lines)
+        self._pending += len(messages)
+
+        # Batch fsyncs so a burst of messages costs one disk sync instead of many
+        if self._pending >= self.fsync_batch or time.monotonic() - self._last_sync >= self.fsync_interval:
+            self.flush()
+
+    def flush(self):
+        """Flush buffered writes and fsync the log"""
+        if self._file is None:
+            return
+        self._file.flush()
+        if self._pending:
+            os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def compact(self):
+        """
+        Rewrite the log without duplicate messages or unreadable lines
+
+        Records are streamed into a temp file that atomically replaces the
+        log, keeping only a digest per message in memory, so a crash during
+        compaction leaves the previous log intact. This moves every byte
+        offset, so it isn't run while capturing; use it offline, when
+        nothing else has the log open.
+
+        Returns:
+            int: Number of records dropped
+        """
+        if not os.path.exists(self.path):
+            return 0
+
+        counts = {"read": 0, "kept": 0}
+
+        def distinct_records():
+            seen_digests = set()
+            for msg in iter_records(self.path):
+                counts["read"] += 1
+                digest = record_digest(msg)
+                if digest is not None:
+                    if digest in seen_digests:
+                        continue
+                    seen_digests.add(digest)
+                counts["kept"] += 1
+                yield msg
+
+        self.flush()
+        self._write_all(distinct_records())
+        return counts["read"] - counts["kept"]
+
+    def _write_all(self, records):
+        """Atomically replace the log with the given records (any iterable, streamed) and reindex it"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        write_records(self.path, records)
+        if self.index is not None and self._index_synced:
+            self.index.clear()
+            self._index_synced = False
+            self.sync_index()
+
+    def backup(self):
+        """Copy the current log aside, e.g. before recovering from a load error"""
+        if not os.path.exists(self.path):
+            return None
+        backup_file = f"{self.path}.backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        shutil.copy2(self.path, backup_file)
+        return backup_file
+
+    def close(self):
+        """Flush and close the log file and its sidecar index"""
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self.index is not None:
+            self.index.close()
+            self._index_synced = False
+
+
+class BackgroundWriter(MessageStore):
+    def __init__(self, stores, max_batch=500, max_delay=0.5, max_queued=1000, put_timeout=1.0, retries=3,
+                 retry_delay=0.5):
+        """
+        Write to one or more stores from a dedicated thread
+
+        append() only queues the records, so a slow disk never stalls
+        extraction. The writer thread group-commits: it collects queued
+        batches until it has max_batch records or the oldest has waited
+        max_delay seconds, then appends the group to every store and
+        flushes them once.
+
+        The queue is bounded. When the writer falls behind, append() warns
+        and blocks until there is room rather than dropping records. flush()
+        waits for everything queued so far to be committed, and close()
+        drains the queue before closing the stores; close() is also
+        registered with atexit so records aren't lost on an unexpected exit.
+
+        A failed write is retried with backoff. If a store still fails, its
+        records are kept and written ahead of the next group for that store,
+        and close() makes a last attempt; unwritten() reports what never made
+        it, so callers don't treat those messages as saved.
+
+        Args:
+            stores (list): MessageStores to write to, in order
+            max_batch (int, optional): Records per group commit
+            max_delay (float, optional): Seconds a queued record may wait for a group commit
+            max_queued (int, optional): Batches the queue holds before append() blocks
+            put_timeout (float, optional): Seconds append() waits before warning about backpressure
+            retries (int, optional): Extra attempts at a failed write before holding its records
+                for the next group
+            retry_delay (float, optional): Seconds before the first retry, doubled for each one after
+        """
+        self.stores = list(stores)
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.put_timeout = put_timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.errors = 0
+
+        self._unwritten = [[] for _ in self.stores]  # Records each store failed to write
+
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="message-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def load(self):
+        """Load records from the first store, after committing everything queued"""
+        self.flush()
+        return self.stores[0].load()
+
+    def append(self, messages):
+        """Queue a batch of records for the writer thread"""
+        if not messages:
+            return
+        if self._closed:
+            raise RuntimeError("BackgroundWriter is closed")
+        try:
+            self._queue.put(list(messages), timeout=self.put_timeout)
+        except queue.Full:
+            print(f"Message writer is falling behind ({self._queue.qsize()} batches queued), waiting")
+            self._queue.put(list(messages))
+
+    def pending(self):
+        """Number of batches queued but not yet committed"""
+        return self._queue.unfinished_tasks
+
+    def unwritten(self):
+        """Number of committed records some store has failed to write so far"""
+        return max((len(records) for records in self._unwritten), default=0)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                return
+
+            # Group commit: gather whatever else arrives within max_delay
+            group = item
+            taken = 1
+            deadline = time.monotonic() + self.max_delay
+            stop = False
+            while len(group) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                taken += 1
+                if item is _STOP:
+                    stop = True
+                    break
+                group.extend(item)
+
+            self._commit(group)
+            for _ in range(taken):
+                self._queue.task_done()
+            if stop:
+                return
+
+    def _commit(self, group):
+        for i, store in enumerate(self.stores):
+            # Records this store failed to write earlier go first, keeping log order
+            records = self._unwritten[i] + group
+            if not records:
+                continue
+            for attempt in range(self.retries + 1):
+                try:
+                    store.append(records)
+                    store.flush()
+                    self._unwritten[i] = []
+                    break
+                except Exception as e:
+                    self.errors += 1
+                    print(f"Error writing {len(records)} messages (attempt {attempt + 1}): {str(e)}")
+                    if attempt < self.retries:
+                        time.sleep(self.retry_delay * 2 ** attempt)
+            else:
+                self._unwritten[i] = records
+                print(f"Holding {len(records)} unwritten messages to retry with the next batch")
+
+    def flush(self):
+        """Block until every record queued so far is written and synced"""
+        if self._thread.is_alive():
+            self._queue.join()
+
+    def close(self):
+        """Commit everything still queued, stop the thread and close the stores"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+        if self.unwritten():
+            self._commit([])
+        for store in self.stores:
+            store.close()
+        atexit.unregister(self.close)
+
+
+# Record fields stored in their own columns, in record order; anything else
+# goes in the extra column as JSON
+_SQLITE_FIELDS = ("date", "timestamp", "username", "content", "isReply", "msg_key", "msg_id",
+                  "replied_to", "reply_msg_key", "reply_msg_id")
+_SQLITE_COLUMNS = ("date", "timestamp", "username", "content", "is_reply", "msg_key", "msg_id",
+                   "replied_to", "reply_msg_key", "reply_msg_id")
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    date TEXT,
+    timestamp TEXT,
+    username TEXT,
+    content TEXT,
+    is_reply INTEGER,
+    msg_key TEXT,
+    msg_id TEXT,
+    replied_to TEXT,
+    reply_msg_key TEXT,
+    reply_msg_id TEXT,
+    extra TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS messages_msg_key ON messages (msg_key);
+CREATE INDEX IF NOT EXISTS messages_date_timestamp ON messages (date, timestamp);
+CREATE INDEX IF NOT EXISTS messages_username ON messages (username);
+CREATE INDEX IF NOT EXISTS messages_reply_msg_id ON messages (reply_msg_id);
+CREATE INDEX IF NOT EXISTS messages_reply_msg_key ON messages (reply_msg_key);
+"""
+
+
+class SqliteMessageStore(MessageStore):
+    def __init__(self, path):
+        """
+        Message log in a SQLite database
+
+        Uses WAL mode so readers never block the writer, and inserts each
+        batch in one transaction. msg_key has a unique index, so duplicates
+        are dropped at insert time; records with only a msg_id get their
+        msg_key filled in. There are also indexes on (date, timestamp),
+        username and the reply links, so per-user history and reply lookups
+        are index lookups rather than scans.
+
+        Positions used by iter_records(), tail() and user_records() are row ids.
+        Fields set to None are not stored and come back missing.
+
+        Args:
+            path (str): Path to the database file
+        """
+        self.path = path
+        self.last_inserted = 0  # Records actually inserted by the last append
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Appends come from the BackgroundWriter thread, reads from the scraper
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SQLITE_SCHEMA)
+        self._conn.commit()
+
+    @staticmethod
+    def _row(msg):
+        values = [msg.get(field) for field in _SQLITE_FIELDS]
+        if values[5] is None:
+            # Key legacy records by their msg_id so they dedup too
+            digest = record_digest(msg)
+            values[5] = digest_to_key(digest) if digest is not None else None
+        extra = {key: value for key, value in msg.items() if key not in _SQLITE_FIELDS}
+        values.append(json.dumps(extra, ensure_ascii=False) if extra else None)
+        return values
+
+    @staticmethod
+    def _record(row):
+        msg = {}
+        for field, value in zip(_SQLITE_FIELDS, row):
+            if value is not None:
+                msg[field] = bool(value) if field == "isReply" else value
+        if row[-1]:
+            msg.update(json.loads(row[-1]))
+        return msg
+
+    def _query(self, where="", params=(), order="id", limit=None):
+        sql = f"SELECT {', '.join(_SQLITE_COLUMNS)}, extra, id FROM messages {where} ORDER BY {order}"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def load(self):
+        """Return all stored records, oldest first"""
+        return [self._record(row[:-1]) for row in self._query()]
+
+    def iter_records(self, start=0, stop=None, batch_size=5000):
+        """Stream records with row ids in [start, stop), a batch at a time"""
+        position = start
+        while True:
+            where = "WHERE id >= ?" + (" AND id < ?" if stop is not None else "")
+            params = (position, stop) if stop is not None else (position,)
+            rows = self._query(where, params, limit=batch_size)
+            for row in rows:
+                yield self._record(row[:-1])
+            if len(rows) < batch_size:
+                return
+            position = rows[-1][-1] + 1
+
+    def tail(self, count):
+        """Return (row id of the first returned record, the last count records)"""
+        rows = self._query(order="id DESC", limit=count)[::-1]
+        if not rows:
+            with self._lock:
+                next_id = self._conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM messages").fetchone()[0]
+            return next_id, []
+        return rows[0][-1], [self._record(row[:-1]) for row in rows]
+
+    def iter_digests(self):
+        """Stream the digest of every stored record, from the msg_key index"""
+        with self._lock:
+            keys = self._conn.execute("SELECT msg_key FROM messages WHERE msg_key IS NOT NULL").fetchall()
+        for (key,) in keys:
+            yield int(key, 16)
+
+    def user_records(self, username, before=None, limit=None):
+        """Return a user's records with row ids before `before`, oldest first"""
+        where = "WHERE username = ?" + (" AND id < ?" if before is not None else "")
+        params = (username, before) if before is not None else (username,)
+        rows = self._query(where, params, order="id DESC", limit=limit)
+        return [self._record(row[:-1]) for row in reversed(rows)]
+
+    def replies_to(self, msg_key=None, msg_id=None):
+        """Return the records replying to a message, by its msg_key or readable msg_id"""
+        if msg_key is not None:
+            rows = self._query("WHERE reply_msg_key = ?", (msg_key,))
+        else:
+            rows = self._query("WHERE reply_msg_id = ?", (msg_id,))
+        return [self._record(row[:-1]) for row in rows]
+
+    def __contains__(self, msg_key):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM messages WHERE msg_key = ?", (msg_key,)).fetchone() is not None
+
+    def append(self, messages):
+        """Insert a batch of records in one transaction, skipping known msg_keys"""
+        if not messages:
+            self.last_inserted = 0
+            return
+        placeholders = ", ".join("?" * (len(_SQLITE_COLUMNS) + 1))
+        with self._lock:
+            before = self._conn.total_changes
+            with self._conn:
+                self._conn.executemany(
+                    f"INSERT OR IGNORE INTO messages ({', '.join(_SQLITE_COLUMNS)}, extra) VALUES ({placeholders})",
+                    [self._row(msg) for msg in messages]
+                )
+            self.last_inserted = self._conn.total_changes - before
+
+    def count(self):
+        """Number of stored records"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+
+    def backup(self):
+        """Copy the database aside with SQLite's online backup"""
+        backup_file = f"{self.path}.backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        with self._lock:
+            target = sqlite3.connect(backup_file)
+            try:
+                self._conn.backup(target)
+            finally:
+                target.close()
+        return backup_file
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
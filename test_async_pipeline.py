@@ -0,0 +1,44 @@
+import asyncio
+
+from async_pipeline import AsyncPipeline
+from poll_scheduler import PollScheduler
+
+
+def _run(pipeline, seconds):
+    """Run the pipeline for a while; returns how many messages were written when it was stopped"""
+    written_at_stop = []
+
+    def stop():
+        written_at_stop.append(len(pipeline.scraper.saved))
+        pipeline.stop()
+
+    async def run():
+        asyncio.get_running_loop().call_later(seconds, stop)
+        await pipeline.run()
+    asyncio.run(run())
+    return written_at_stop[0]
+
+
+def test_slow_writes_do_not_stall_capture(make_scraper):
+    # Serves one new message per capture and writes slowly
+    scraper = make_scraper(write_delay=0.02)
+    scheduler = PollScheduler(min_interval=0.002, max_interval=0.002)
+    pipeline = AsyncPipeline(scraper, scheduler, queue_size=2, report_interval=None)
+    written = _run(pipeline, 0.3)
+
+    # Capture kept its pace while each write took ten poll intervals
+    assert scraper.captures > 3 * written
+    # and everything captured was written once stopped, in order
+    assert [msg["content"] for msg in scraper.saved] == [f"message {i}" for i in range(1, scraper.captures + 1)]
+    assert set(pipeline.depths()) == {"capture", "parse", "dedup", "link", "persist"}
+
+
+def test_failover_after_repeated_capture_errors(make_scraper):
+    scraper = make_scraper()
+    scraper.capture = lambda: 1 / 0
+    failovers = []
+    scheduler = PollScheduler(min_interval=0.001, max_interval=0.001)
+    pipeline = AsyncPipeline(scraper, scheduler, max_consecutive_errors=3, report_interval=None,
+                             failover=lambda: failovers.append(1) or [])
+    _run(pipeline, 0.1)
+    assert failovers
@@ -0,0 +1,103 @@
+import json
+from datetime import datetime
+
+from backfill import Backfiller
+from storage import load_records
+
+NOW = datetime(2026, 10, 16, 15, 0)
+
+
+def _entry(i):
+    entry = {"timestamp": f"{i // 60 % 12 + 1}:{i % 60:02d} PM", "username": f"user{i % 3}",
+             "content": f"history message {i}", "is_reply": False, "replied_to": "", "preview": ""}
+    if i % 10 == 5:
+        # Replies to the message five back, which can be on the next older page
+        entry.update(is_reply=True, replied_to=f"user{(i - 5) % 3}", preview=f"history message {i - 5}")
+    return entry
+
+
+class _ChatBackfiller(Backfiller):
+    """Serves a 20 message screen over a 100 message history, 15 messages per scroll"""
+
+    def __init__(self, scraper, output_path, entry=_entry, **kwargs):
+        super().__init__(scraper, output_path, page_delay=0, now=NOW, **kwargs)
+        self.entry = entry
+        self.bottom = 100
+
+    def _container(self):
+        return None
+
+    def read_page(self, container):
+        return [self.entry(i) for i in range(max(0, self.bottom - 20), self.bottom)]
+
+    def scroll_up(self, container):
+        if self.bottom <= 20:
+            return False
+        self.bottom -= 15
+        return True
+
+
+def _numbers(records):
+    return [int(msg["content"].split()[-1]) for msg in records]
+
+
+def test_backfill_fills_the_gap_and_stops_at_archived_history(tmp_path, make_scraper):
+    # An old run archived 0-29, the live scraper 80-99
+    scraper = make_scraper([_entry(i) for i in list(range(30)) + list(range(80, 100))])
+    output = tmp_path / "backfill.jsonl"
+    backfiller = _ChatBackfiller(scraper, str(output), checkpoint_path=str(tmp_path / "checkpoint.json"))
+    stats = backfiller.run()
+
+    assert backfiller.stopped_because == "reached archived history"
+    saved = load_records(str(output))
+    assert _numbers(saved) == list(range(30, 80))  # Oldest first
+    assert stats["written"] == 50
+    assert all(msg["backfilled"] and msg["date"] == "20261016" for msg in saved)
+    assert len(scraper.known) == 50  # The live dedup set is left alone
+    assert json.loads((tmp_path / "checkpoint.json").read_text())["complete"]
+
+    # Replies link to the older message even across page boundaries
+    keys = {msg["content"]: msg["msg_key"] for msg in saved}
+    for msg in saved:
+        if msg["isReply"]:
+            target = f"history message {int(msg['content'].split()[-1]) - 5}"
+            if target in keys:
+                assert msg["reply_msg_key"] == keys[target]
+
+
+def test_backfill_without_a_gap_stops_below_the_live_window(tmp_path, make_scraper):
+    scraper = make_scraper([_entry(i) for i in range(100)])
+    backfiller = _ChatBackfiller(scraper, str(tmp_path / "backfill.jsonl"))
+    stats = backfiller.run()
+    assert backfiller.stopped_because == "reached archived history"
+    assert stats["pages"] == 2 and stats["written"] == 0
+
+
+def test_backfill_dates_go_back_a_day_past_midnight(tmp_path, make_scraper):
+    def entry(i):
+        # 0-49 at 11:10-11:59 PM, 50-99 at 12:00-12:49 AM the next day
+        return dict(_entry(i), timestamp=f"11:{i + 10:02d} PM" if i < 50 else f"12:{i - 50:02d} AM",
+                    is_reply=False)
+
+    output = tmp_path / "backfill.jsonl"
+    _ChatBackfiller(make_scraper(), str(output), entry=entry).run()
+    dates = {int(msg["content"].split()[-1]): msg["date"] for msg in load_records(str(output))}
+    assert {dates[i] for i in range(50)} == {"20261015"}
+    assert {dates[i] for i in range(50, 100)} == {"20261016"}
+
+
+def test_interrupted_backfill_resumes_past_its_last_page(tmp_path, make_scraper):
+    checkpoint_path = str(tmp_path / "checkpoint.json")
+    output = str(tmp_path / "backfill.jsonl")
+    scraper = make_scraper([_entry(i) for i in range(80, 100)])
+    _ChatBackfiller(scraper, output, checkpoint_path=checkpoint_path, max_pages=3).run()
+    assert not json.loads(open(checkpoint_path).read())["complete"]
+    assert _numbers(load_records(output)) == list(range(50, 80))
+
+    # The resumed run picks up the first run's log from the checkpoint;
+    # scrolling back over what it wrote must not count as archived history
+    backfiller = _ChatBackfiller(scraper, str(tmp_path / "other.jsonl"), checkpoint_path=checkpoint_path)
+    backfiller.run()
+    assert backfiller.output_path == output
+    assert backfiller.stopped_because == "top of chat"
+    assert _numbers(load_records(output)) == list(range(80))
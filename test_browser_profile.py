@@ -0,0 +1,29 @@
+import pytest
+
+from browser_profile import LEAN_BLOCKED_URLS, chrome_profile
+
+
+def test_default_profile_keeps_original_options():
+    assert chrome_profile() == {"arguments": ["--window-size=900,800"], "prefs": {}, "blocked_urls": [],
+                                "capabilities": {}, "experimental": {}}
+    assert chrome_profile(headless=True)["arguments"][0] == "--headless"
+
+
+def test_lean_profile():
+    profile = chrome_profile("lean", headless=True, blocked_urls=["*quotes.example.com*"])
+    assert "--headless=new" in profile["arguments"]
+    assert "--disable-gpu" in profile["arguments"] and "--disable-extensions" in profile["arguments"]
+    assert "--window-size=800,600" in profile["arguments"]
+    assert profile["prefs"]["profile.managed_default_content_settings.images"] == 2
+    assert profile["blocked_urls"] == LEAN_BLOCKED_URLS + ["*quotes.example.com*"]
+
+
+def test_unknown_profile():
+    with pytest.raises(ValueError):
+        chrome_profile("tiny")
+
+
+def test_performance_log_for_network_capture():
+    profile = chrome_profile(performance_log=True)
+    assert profile["capabilities"] == {"goog:loggingPrefs": {"performance": "ALL"}}
+    assert profile["experimental"]["perfLoggingPrefs"]["enableNetwork"]
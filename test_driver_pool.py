@@ -0,0 +1,65 @@
+import time
+
+from driver_pool import DriverPool
+
+
+class _Driver:
+    def __init__(self, number):
+        self.number = number
+        self.quit_called = False
+        self.current_window_handle = f"window{number}"
+
+    def quit(self):
+        self.quit_called = True
+
+
+class _Scraper:
+    def __init__(self):
+        self.drivers = []
+        self.failovers = []
+
+    def create_driver(self):
+        self.drivers.append(_Driver(len(self.drivers)))
+        return self.drivers[-1]
+
+    def prepare_driver(self, driver):
+        return [driver.current_window_handle]
+
+    def failover(self, driver, window_handles, push_mode=False):
+        self.failovers.append((driver, window_handles))
+        return []
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_failover_uses_prepared_standby_and_replaces_it():
+    scraper = _Scraper()
+    pool = DriverPool(scraper, standby=1)
+    pool.start()
+    _wait_for(lambda: pool._ready)
+
+    pool.failover()
+    assert scraper.failovers == [(scraper.drivers[0], ["window0"])]
+    _wait_for(lambda: pool._ready)
+    assert len(scraper.drivers) == 2
+
+    pool.close()
+    assert scraper.drivers[1].quit_called
+    assert not scraper.drivers[0].quit_called
+
+
+def test_stale_standby_is_replaced():
+    scraper = _Scraper()
+    pool = DriverPool(scraper, standby=1, max_age=0.0)
+    pool.start()
+    _wait_for(lambda: pool._ready)
+    time.sleep(0.01)
+    pool.maintain()
+    assert scraper.drivers[0].quit_called
+    _wait_for(lambda: pool._ready)
+    pool.close()
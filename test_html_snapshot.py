@@ -0,0 +1,51 @@
+import os
+
+from html_snapshot import inner_text, parse_html, parse_snapshot, snapshot_items
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _read(*path):
+    with open(os.path.join(HERE, *path), 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def test_reply_message_from_fallback_selector():
+    items = snapshot_items(_read("chathtml.txt"))
+    assert items[0]["timestamp"] == "9:10 AM"
+    assert items[0]["username"] == "GGM"
+    assert (items[0]["is_reply"], items[0]["reply_to"], items[0]["preview"]) == (True, "Vinay", "Still bullish AI")
+
+    record = parse_snapshot(_read("chathtml.txt"), date="20250617")[0]
+    assert record["content"] == ("what does this mean though? Do you think the market is currently "
+                                 "UNDERestimating the value AI will bring or OVERestimating?")
+    assert record["isReply"] and record["replied_to"] == "Vinay"
+    # The message it quotes isn't in the snapshot
+    assert record["reply_msg_key"] is None
+
+
+def test_message_from_primary_selector():
+    records = parse_snapshot(_read("chat_logs", "examplemsg6-17-25.txt"), date="20250617", readable_ids=False)
+    assert records == [{
+        "date": "20250617",
+        "timestamp": "9:18 PM",
+        "username": "mash",
+        "content": "the surprise was dropping some fire poetry I guess",
+        "isReply": False,
+        "msg_key": records[0]["msg_key"],
+    }]
+
+
+def test_inner_text_blocks_and_whitespace():
+    root = parse_html('<div>a  <span>b\n c</span><div class="inline-block">d</div><div>e</div>&nbsp;f</div>')
+    assert inner_text(root) == "a b cd\ne\n f"
+
+
+def test_replies_resolve_within_snapshot():
+    message = ('<div class="group text-[#eaeaea] rounded">{reply}<div class="block pr-[20px] break-words">'
+               '<span style="color: grey; font-size: 8px;">9:1{n} AM</span>'
+               '<div class="inline-block"><div class="inline-flex relative">{user}</div>:&nbsp;</div>{text}</div></div>')
+    html = (message.format(reply="", n=1, user="alice", text="NVDA looks strong here")
+            + message.format(reply='<div><div>@alice: NVDA looks</div></div>', n=2, user="bob", text="agreed"))
+    first, second = parse_snapshot(html)
+    assert second["isReply"] and second["reply_msg_key"] == first["msg_key"]
@@ -0,0 +1,93 @@
+from collections import deque
+
+import pytest
+
+from log_index import load_startup_state
+from message_ids import KnownMessageSet, generate_message_id, message_digest
+from reply_index import ReplyIndex
+from storage import JsonlMessageStore
+
+
+@pytest.fixture
+def record(make_msg):
+    """Record i, from one of three users, with its msg_key"""
+    return lambda i: make_msg(f"message {i}", username=f"user{i % 3}", keyed=True)
+
+
+def _start(tmp_path, tail_size=10):
+    store = JsonlMessageStore(str(tmp_path / "MASTER_LOG.jsonl"))
+    replies = ReplyIndex(generate_message_id)
+    recent = deque()
+    known, scanned, indexed = load_startup_state(
+        store, str(tmp_path / "MASTER_LOG.jsonl.known"), KnownMessageSet(window=20, bloom_capacity=None),
+        replies, recent, tail_size
+    )
+    return store, known, replies, recent, scanned, indexed
+
+
+def test_restart_reads_index_and_only_newer_records(tmp_path, record):
+    store = JsonlMessageStore(str(tmp_path / "MASTER_LOG.jsonl"))
+    store.append([record(i) for i in range(100)])
+    store.close()
+
+    _, known, _, _, scanned, indexed = _start(tmp_path)
+    assert (scanned, indexed) == (100, False)
+
+    store = JsonlMessageStore(str(tmp_path / "MASTER_LOG.jsonl"))
+    store.append([record(i) for i in range(100, 105)])
+    store.close()
+
+    _, known, _, recent, scanned, indexed = _start(tmp_path)
+    assert (scanned, indexed) == (5, True)
+    assert all(message_digest(generate_message_id("5:03 PM", f"user{i % 3}", f"message {i}")) in known
+               for i in range(105))
+    assert list(recent) == [record(i) for i in range(95, 105)]
+
+
+def test_reply_before_tail_is_found_lazily(tmp_path, record):
+    store = JsonlMessageStore(str(tmp_path / "MASTER_LOG.jsonl"))
+    store.append([record(i) for i in range(100)])
+    store.close()
+
+    _, _, replies, _, _, _ = _start(tmp_path)
+    assert replies.find_reply_msg_id("user0", "message 30") == generate_message_id("5:03 PM", "user0", "message 30")
+
+
+def test_sidecar_tracks_appends_and_user_history(tmp_path, record):
+    path = str(tmp_path / "MASTER_LOG.jsonl")
+    store = JsonlMessageStore(path)
+    store.append([record(i) for i in range(10)])
+    store.append([record(i) for i in range(10, 12)])
+    store.close()
+
+    store = JsonlMessageStore(path)
+    index = store.sync_index()
+    assert index.count == 12
+    assert [msg["content"] for msg in store.user_records("user1", limit=2)] == ["message 7", "message 10"]
+    before = index.entry(9)[1]
+    assert [msg["content"] for msg in store.user_records("user0", before=before)] == \
+        ["message 0", "message 3", "message 6"]
+    store.close()
+
+
+def test_sidecar_rebuilds_after_rewrite_and_drops_torn_entry(tmp_path, record):
+    path = str(tmp_path / "MASTER_LOG.jsonl")
+    store = JsonlMessageStore(path)
+    store.append([record(i) for i in range(10)])
+    store.close()
+
+    # A crash mid-write leaves a partial entry
+    with open(f"{path}.idx", "ab") as f:
+        f.write(b"\x01\x02\x03")
+    store = JsonlMessageStore(path)
+    assert store.sync_index().count == 10
+    store.close()
+
+    # Rewritten by another tool, e.g. the dedup script
+    store = JsonlMessageStore(path, sidecar=False)
+    store._write_all([record(i) for i in range(5, 10)])
+    store = JsonlMessageStore(path)
+    index = store.sync_index()
+    assert index.count == 5
+    assert list(index.digests()) == [int(record(i)["msg_key"], 16) for i in range(5, 10)]
+    store.close()
@@ -0,0 +1,29 @@
+from message_ids import KnownMessageSet, generate_message_id, message_key, record_digest
+
+
+def test_message_id_and_key():
+    msg_id = generate_message_id("7:45 PM", "mas1", "ES1 (D)\n+0.04%")
+    assert msg_id == "7:45 PM_mas1_ES1 (D)\n[PRICE]%"
+    assert len(message_key(msg_id)) == 16
+    # Records with only a legacy msg_id and records with a msg_key agree
+    assert record_digest({"msg_id": msg_id}) == record_digest({"msg_key": message_key(msg_id)})
+    assert record_digest({"content": "no id"}) is None
+
+
+def test_known_set_archives_old_digests():
+    known = KnownMessageSet(window=10, bloom_capacity=None)
+    ids = [f"9:{i:02d} AM_mash_message {i}" for i in range(10000)]
+    for msg_id in ids:
+        known.add(msg_id)
+    assert len(known) == 10000
+    assert all(msg_id in known for msg_id in ids)
+    assert "9:00 AM_mash_never sent" not in known
+
+
+def test_bloom_archive():
+    known = KnownMessageSet(window=10, bloom_capacity=20000)
+    ids = [f"9:{i:02d} AM_mash_message {i}" for i in range(5000)]
+    for msg_id in ids:
+        known.add(msg_id)
+    assert all(msg_id in known for msg_id in ids)
+    assert sum(f"unseen {i}" in known for i in range(5000)) == 0
@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+from network_capture import ChatFrameDecoder, NetworkCapture, decode_log, read_fixture
+
+
+def _log_entry(method, params, timestamp=1750209480000):
+    return {"message": json.dumps({"message": {"method": method, "params": params}}), "timestamp": timestamp}
+
+
+def _frame(payload, request_id="1", opcode=1):
+    return _log_entry("Network.webSocketFrameReceived",
+                      {"requestId": request_id, "response": {"opcode": opcode, "payloadData": payload}})
+
+
+# Synthetic frames in a few common shapes; not recorded from the live site
+FRAMES = [
+    _log_entry("Network.webSocketCreated", {"requestId": "1", "url": "wss://example.test/chat"}),
+    _log_entry("Network.webSocketCreated", {"requestId": "2", "url": "wss://example.test/quotes"}),
+    _frame(json.dumps({"type": "message", "data": {"room": "chatbot_HHH", "user": {"name": "mash"},
+                                                   "text": "the surprise was dropping some fire poetry I guess",
+                                                   "created_at": "2025-06-17T21:18:05"}})),
+    _frame('42["chat", {"username": "GGM", "message": "what does this mean though?", '
+           '"ts": "2025-06-17T21:19:00", "replyTo": {"username": "Vinay", "message": "Still bullish AI"}}]'),
+    _frame(json.dumps({"room": "other_room", "username": "someone", "content": "not this room"})),
+    _frame(json.dumps({"symbol": "NVDA", "last": 142.1}), request_id="2"),
+    _frame("AAEC", opcode=2),
+]
+
+
+def test_decodes_messages_from_frames():
+    first, second = decode_log(FRAMES, ChatFrameDecoder(room="chatbot_HHH"))
+    assert first["username"] == "mash"
+    assert first["timestamp"] == "9:18 PM" and first["date"] == "20250617"
+    assert first["server_time"] == "2025-06-17T21:18:05"
+    assert (second["username"], second["content"]) == ("GGM", "what does this mean though?")
+    assert (second["is_reply"], second["replied_to"], second["preview"]) == (True, "Vinay", "Still bullish AI")
+
+
+def test_url_filter_and_replay_from_fixture(tmp_path):
+    fixture = tmp_path / "frames.jsonl"
+    fixture.write_text("".join(json.dumps(entry) + "\n" for entry in FRAMES))
+    entries = decode_log(read_fixture(str(fixture)), ChatFrameDecoder(url_filter="/quotes"))
+    assert entries == []
+    entries = decode_log(read_fixture(str(fixture)), ChatFrameDecoder(url_filter="/chat"))
+    assert [entry["username"] for entry in entries] == ["mash", "GGM", "someone"]
+
+
+def test_network_capture_needs_a_targeted_decoder():
+    with pytest.raises(ValueError):
+        NetworkCapture(object(), ChatFrameDecoder(room="chatbot_HHH"))
+    assert ChatFrameDecoder(url_filter="/chat").is_targeted()
+    assert ChatFrameDecoder(user_fields=("username",), text_fields=("message",)).is_targeted()
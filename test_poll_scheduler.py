@@ -0,0 +1,30 @@
+from poll_scheduler import PollScheduler
+
+
+def test_quiet_chat_backs_off_to_max():
+    scheduler = PollScheduler(min_interval=1.0, max_interval=8.0)
+    for _ in range(20):
+        scheduler.record_poll(0, seen=0, anchored=True)
+    assert scheduler.interval == 8.0
+
+
+def test_gap_tightens_to_min():
+    scheduler = PollScheduler(min_interval=1.0, max_interval=8.0)
+    for _ in range(20):
+        scheduler.record_poll(0, seen=0, anchored=True)
+    assert scheduler.record_poll(50, seen=50, gap=True) == 1.0
+    assert scheduler.gaps == 1
+
+
+def test_mostly_new_unanchored_poll_halves_interval():
+    scheduler = PollScheduler(min_interval=1.0, max_interval=60.0, target_new_per_poll=10 ** 6)
+    scheduler.interval = 16.0
+    assert scheduler.record_poll(9, seen=10) == 8.0
+    # The same poll anchored to the previous one missed nothing
+    scheduler.interval = 16.0
+    assert scheduler.record_poll(9, seen=9, anchored=True) > 8.0
+
+
+def test_error_backoff_is_exponential_and_capped():
+    scheduler = PollScheduler(min_interval=2.0, max_interval=30.0)
+    assert [scheduler.error_delay(n) for n in range(1, 6)] == [2.0, 4.0, 8.0, 16.0, 30.0]
@@ -0,0 +1,46 @@
+from reply_index import ReplyIndex
+
+
+def _id(timestamp, username, content):
+    return f"{timestamp}_{username}_{content[:50]}"
+
+
+def _index(*contents):
+    index = ReplyIndex(_id)
+    for i, content in enumerate(contents):
+        index.add({"timestamp": f"9:{i:02d} AM", "username": "mash", "content": content})
+    return index
+
+
+def test_prefix_match_returns_newest():
+    index = _index("Still bullish AI names", "unrelated", "Still bullish AI again")
+    assert index.find_reply_msg_id("mash", "still bullish ai") == "9:02 AM_mash_Still bullish AI again"
+
+
+def test_newer_mid_content_match_wins():
+    index = _index("Still bullish AI names", "I am still bullish ai honestly")
+    assert index.find_reply_msg_id("mash", "Still bullish AI") == "9:01 AM_mash_I am still bullish ai honestly"
+
+
+def test_falls_back_to_most_recent_message():
+    index = _index("first", "second")
+    assert index.find_reply_msg_id("mash", "nothing like this") == "9:01 AM_mash_second"
+    assert index.find_reply_msg_id("mash", "") == "9:01 AM_mash_second"
+    assert index.find_reply_msg_id("nobody", "first") is None
+
+
+def test_messages_added_after_a_lookup_are_searched():
+    index = _index("first message here")
+    index.find_reply_msg_id("mash", "first")
+    index.add({"timestamp": "9:05 AM", "username": "mash", "content": "later message here"})
+    assert index.find_reply_msg_id("mash", "later") == "9:05 AM_mash_later message here"
+
+
+def test_matches_across_chunks_and_bounded_history():
+    index = ReplyIndex(_id, max_messages_per_user=600)
+    for i in range(2000):
+        index.add({"timestamp": f"{i}", "username": "mash", "content": f"message number {i:04d}"})
+    assert index.find_reply_msg_id("mash", "number 1500") == "1500_mash_message number 1500"
+    assert index.find_reply_msg_id("mash", "message") == "1999_mash_message number 1999"
+    # Messages older than the bound fall back to the most recent one
+    assert index.find_reply_msg_id("mash", "number 0001") == "1999_mash_message number 1999"
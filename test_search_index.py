@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+from search_index import SearchIndex, parse_query
+
+
+def _append(path, records):
+    with open(path, 'a', encoding='utf-8') as f:
+        for msg in records:
+            f.write(json.dumps(msg) + "\n")
+
+
+@pytest.fixture
+def records(make_msg):
+    return [
+        make_msg("OKLO\n+4.20%\nshort squeeze incoming", username="alice", date="20250922"),
+        make_msg("squeeze the shorts? not likely", username="bob", date="20250922"),
+        make_msg("another short squeeze on QURE", username="Alice", date="20250923"),
+        make_msg("FDA news for QURE", username="carol", date="20250924"),
+        make_msg("short interest is huge, squeeze soon", username="bob", date="20250924"),
+    ]
+
+
+def _contents(results):
+    return [msg["content"] for msg in results]
+
+
+def test_term_phrase_user_and_date_queries(tmp_path, records):
+    log = str(tmp_path / "MASTER_LOG.jsonl")
+    _append(log, records)
+    index = SearchIndex(log)
+    assert index.update() == 5
+
+    # Newest first, case-insensitive, and the embed's price change isn't a word
+    assert _contents(index.search(terms=["SQUEEZE", "short"])) == [
+        records[4]["content"], records[2]["content"], records[0]["content"]]
+    assert index.search(terms=["4"]) == []
+    assert _contents(index.search(phrases=["short squeeze"])) == [records[2]["content"], records[0]["content"]]
+    assert _contents(index.search(**parse_query('qure user:alice'))) == [records[2]["content"]]
+    assert _contents(index.search(**parse_query("squeeze since:20250923 until:20250923"))) == [records[2]["content"]]
+    assert index.search(limit=2)[0]["offset"] > index.search(limit=2)[1]["offset"]
+    index.close()
+
+
+def test_incremental_updates_and_merges_match_a_full_build(tmp_path, records):
+    log = str(tmp_path / "MASTER_LOG.jsonl")
+    index = SearchIndex(log, batch_size=2, merge_factor=2)
+    for msg in records:
+        _append(log, [msg])
+        assert index.update() == 1
+    assert len(index.segments) < len(records)
+    index.close()
+
+    # A half-written line is left for the next update
+    with open(log, 'a', encoding='utf-8') as f:
+        f.write('{"username": "dave", "content": "squ')
+    index = SearchIndex(log, batch_size=2, merge_factor=2)
+    assert index.update() == 0
+    assert len(index) == len(records)
+    assert _contents(index.search(terms=["squeeze"], limit=None)) == _contents(
+        [records[4], records[2], records[1], records[0]])
+    index.close()
+
+
+def test_rebuilds_when_the_log_is_rewritten(tmp_path, records, make_msg):
+    log = str(tmp_path / "MASTER_LOG.jsonl")
+    _append(log, records)
+    index = SearchIndex(log)
+    index.update()
+
+    with open(log, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(make_msg("fresh start", username="erin")) + "\n")
+    assert index.update() == 1
+    assert len(index) == 1
+    assert index.search(terms=["squeeze"]) == []
+
+    # A search before the next update rebuilds rather than seeking stale offsets
+    with open(log, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(make_msg("squeeze again", username="frank")) + "\n")
+    assert _contents(index.search(terms=["squeeze"])) == ["squeeze again"]
+    index.close()
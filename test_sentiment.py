@@ -0,0 +1,48 @@
+import json
+
+import sentiment
+from sentiment import SentimentCache, aggregate, score_logs, score_text
+
+
+def _write_log(path, records):
+    path.write_text("".join(json.dumps(msg) + "\n" for msg in records))
+    return str(path)
+
+
+def test_score_text_handles_negation_and_intensifiers():
+    assert score_text("nothing to see here") == 0.0
+    assert score_text("bullish") > 0 > score_text("not bullish")
+    assert score_text("very bearish") < score_text("bearish") < 0
+    # The embedded price change isn't read as text
+    assert score_text("RGTI\n+13.08%") == 0.0
+    assert -1 < score_text("crash crash crash crash crash") < 0
+
+
+def test_cache_only_scores_new_messages(tmp_path, monkeypatch, make_msg):
+    log = _write_log(tmp_path / "log.jsonl", [make_msg("great"), make_msg("awful")])
+    cache_path = str(tmp_path / "log.sentiment")
+    assert score_logs([log], SentimentCache(cache_path)) == (2, 0)
+
+    log = _write_log(tmp_path / "log.jsonl", [make_msg("great"), make_msg("awful"), make_msg("meh")])
+    cache = SentimentCache(cache_path)
+    assert score_logs([log], cache) == (1, 2)
+    assert len(cache) == 3
+
+    # Changing the lexicon invalidates every cached score
+    monkeypatch.setitem(sentiment.LEXICON, "meh", -1.0)
+    assert len(SentimentCache(cache_path)) == 0
+
+
+def test_aggregate_per_ticker_and_user(tmp_path, make_msg):
+    log = _write_log(tmp_path / "log.jsonl", [
+        make_msg("OKLO\n+4.20%\nripping, love it", username="alice"),
+        make_msg("OKLO is a scam", username="bob"),
+        make_msg("$QURE looks great", username="bob"),
+    ])
+    cache = SentimentCache(str(tmp_path / "log.sentiment"))
+    score_logs([log], cache)
+    tickers, users = aggregate([log], cache)
+    assert tickers["OKLO"]["messages"] == 2
+    assert (tickers["OKLO"]["positive"], tickers["OKLO"]["negative"]) == (1, 1)
+    assert tickers["QURE"]["mean"] > 0
+    assert users["bob"]["messages"] == 2 and users["alice"]["positive"] == 1
@@ -0,0 +1,147 @@
+import json
+import io
+
+import pytest
+
+from storage import BackgroundWriter, JsonlMessageStore, MessageStore, SqliteMessageStore, _iter_json_array, load_records
+
+
+@pytest.fixture
+def record(make_msg):
+    return lambda i: make_msg(f"message {i}")
+
+
+def test_append_only_writes_new_records(tmp_path, record):
+    path = tmp_path / "MASTER_LOG.jsonl"
+    store = JsonlMessageStore(str(path))
+    store.append([record(0), record(1)])
+    store.append([record(2)])
+    store.close()
+
+    lines = path.read_text().splitlines()
+    assert len(lines) == 3
+    assert json.loads(lines[2]) == record(2)
+
+
+def test_legacy_json_array_is_imported(tmp_path, record):
+    legacy = tmp_path / "MASTER_LOG.json"
+    legacy.write_text(json.dumps([record(0), record(1)], indent=2))
+
+    store = JsonlMessageStore(str(tmp_path / "MASTER_LOG.jsonl"), legacy_path=str(legacy))
+    assert store.load() == [record(0), record(1)]
+    assert load_records(str(tmp_path / "MASTER_LOG.jsonl")) == [record(0), record(1)]
+
+
+def test_torn_trailing_line_is_skipped(tmp_path, record):
+    path = tmp_path / "MASTER_LOG.jsonl"
+    path.write_text(json.dumps(record(0)) + "\n" + '{"date": "2025')
+    assert load_records(str(path)) == [record(0)]
+
+
+def test_compaction_drops_duplicates(tmp_path, record):
+    path = tmp_path / "MASTER_LOG.jsonl"
+    store = JsonlMessageStore(str(path))
+    store.append([record(0), record(1), record(0)])
+    store.append([record(1)])
+    assert load_records(str(path)) == [record(0), record(1), record(0), record(1)]  # Never compacted while appending
+    assert store.compact() == 2
+    store.append([record(2)])
+    store.close()
+
+    assert load_records(str(path)) == [record(0), record(1), record(2)]
+
+
+def test_append_reaches_the_file_before_fsync(tmp_path, record):
+    path = tmp_path / "MASTER_LOG.jsonl"
+    store = JsonlMessageStore(str(path), fsync_batch=1000, fsync_interval=3600)
+    store.append([record(0)])
+    # Still open and not fsynced, but already visible to another reader
+    assert load_records(str(path)) == [record(0)]
+    store.close()
+
+
+def test_json_array_streams_across_chunk_boundaries(record):
+    records = [record(i) for i in range(20)]
+    text = json.dumps(records, indent=2)
+    for chunk_size in (1, 7, 64, 4096):
+        assert list(_iter_json_array(io.StringIO(text), chunk_size)) == records
+
+
+class _RecordingStore(MessageStore):
+    def __init__(self):
+        self.batches = []
+        self.closed = False
+
+    def append(self, messages):
+        self.batches.append(list(messages))
+
+    def close(self):
+        self.closed = True
+
+
+def test_background_writer_group_commits_and_drains_on_close(record):
+    store = _RecordingStore()
+    writer = BackgroundWriter([store], max_batch=1000, max_delay=0.2)
+    for i in range(10):
+        writer.append([record(i)])
+    writer.flush()
+    # Batches queued within max_delay of each other are committed together
+    assert len(store.batches) < 10
+    assert [msg for batch in store.batches for msg in batch] == [record(i) for i in range(10)]
+
+    writer.append([record(10)])
+    writer.close()
+    assert store.batches[-1] == [record(10)]
+    assert store.closed
+
+
+class _FailingStore(_RecordingStore):
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+
+    def append(self, messages):
+        if self.failures:
+            self.failures -= 1
+            raise OSError("disk full")
+        super().append(messages)
+
+
+def test_background_writer_retries_failed_writes(record):
+    # One retry isn't enough for the first group, so it is held and written
+    # ahead of the next one
+    store = _FailingStore(failures=2)
+    writer = BackgroundWriter([store], max_delay=0, retries=1, retry_delay=0)
+    writer.append([record(0)])
+    writer.flush()
+    assert writer.unwritten() == 1 and store.batches == []
+
+    writer.append([record(1)])
+    writer.close()
+    assert store.batches == [[record(0), record(1)]]
+    assert writer.unwritten() == 0 and writer.errors == 2
+
+    # A store that never recovers is reported as unwritten after close
+    store = _FailingStore(failures=100)
+    writer = BackgroundWriter([store], max_delay=0, retries=0, retry_delay=0)
+    writer.append([record(0)])
+    writer.close()
+    assert writer.unwritten() == 1
+
+
+def test_sqlite_store_dedups_on_insert_and_reads_by_user(tmp_path, record):
+    store = SqliteMessageStore(str(tmp_path / "MASTER_LOG.sqlite3"))
+    store.append([record(0), record(1)])
+    store.append([record(1), record(2), dict(record(3), username="olo")])
+    assert store.last_inserted == 2
+    assert store.count() == 4
+
+    # Legacy records only have msg_id; their msg_key is filled in
+    loaded = store.load()
+    assert [msg["content"] for msg in loaded] == [f"message {i}" for i in range(4)]
+    assert all(msg["msg_key"] for msg in loaded)
+
+    start, tail = store.tail(2)
+    assert [msg["content"] for msg in tail] == ["message 2", "message 3"]
+    assert [msg["content"] for msg in store.user_records("VirtualEdge", before=start)] == ["message 0", "message 1"]
+    store.close()
@@ -1,45 +1,48 @@
-import re
-
-def _remove_ticker_content(content):
-    if '\n' in content and '%' in content:
-        pattern = r'([A-Z]+)\n[+-]?\d+\.?\d*%'
-        pattern_with_delay = r'([A-Z]+\s*\([A-Z]\))\n[+-]?\d+\.?\d*%'
-        pattern_futures = r'([A-Z0-9]+\s*\([A-Z]\))\n[+-]?\d+\.?\d*%'
-        pattern_any_parens = r'([A-Z0-9]+\s*\([^)]+\))\n[+-]?\d+\.?\d*%'
-        
-        cleaned_content = re.sub(pattern, r'\1\n[PRICE]%', content)
-        cleaned_content = re.sub(pattern_with_delay, r'\1\n[PRICE]%', cleaned_content)
-        cleaned_content = re.sub(pattern_futures, r'\1\n[PRICE]%', cleaned_content)
-        cleaned_content = re.sub(pattern_any_parens, r'\1\n[PRICE]%', cleaned_content)
-        
-        return cleaned_content
-    return content
-
-# Test the specific case
-content1 = 'ES1 (D)\n+0.04%'
-content2 = 'ES1 (D)\n+0.05%'
-
-cleaned1 = _remove_ticker_content(content1)
-cleaned2 = _remove_ticker_content(content2)
-
-print(f'Original 1: {repr(content1)}')
-print(f'Original 2: {repr(content2)}')
-print(f'Cleaned 1:  {repr(cleaned1)}')
-print(f'Cleaned 2:  {repr(cleaned2)}')
-print(f'Equal: {cleaned1 == cleaned2}')
-
-# Test message ID generation
+import json
+import random
+
+from ticker_normalizer import remove_ticker_content
+from ticker_reference import GOLDEN_FILE, legacy_remove_ticker_content
+
+
 def _generate_message_id(timestamp, username, content):
-    id_content = _remove_ticker_content(content)
+    id_content = remove_ticker_content(content)
     content_hash = id_content[:50] if len(id_content) > 50 else id_content
     return f"{timestamp}_{username}_{content_hash}"
 
-timestamp = "7:45 PM"
-username = "mas1"
-
-id1 = _generate_message_id(timestamp, username, content1)
-id2 = _generate_message_id(timestamp, username, content2)
 
-print(f'\nMessage ID 1: {id1}')
-print(f'Message ID 2: {id2}')
-print(f'IDs are equal: {id1 == id2} (should be True)') 
\ No newline at end of file
+def test_ticker_content_removal():
+    test_cases = [
+        ("ES1 (D)\n+0.04%", "ES1 (D)\n[PRICE]%"),
+        ("ES1 (D)\n+0.05%", "ES1 (D)\n[PRICE]%"),
+        ("ES1 (D)\n-0.12%", "ES1 (D)\n[PRICE]%"),
+        ("VIX (D)\n+5.23%", "VIX (D)\n[PRICE]%"),
+        ("SPY\n+1.45%", "SPY\n[PRICE]%"),
+        ("Hello world", "Hello world"),  # Should not change
+        ("ES1 (D)\n+0.04%\nSome additional text", "ES1 (D)\n[PRICE]%\nSome additional text"),
+    ]
+    for original, expected in test_cases:
+        assert remove_ticker_content(original) == expected
+
+
+def test_message_id_ignores_price_changes():
+    id1 = _generate_message_id("7:45 PM", "mas1", "ES1 (D)\n+0.04%")
+    id2 = _generate_message_id("7:45 PM", "mas1", "ES1 (D)\n+0.05%")
+    assert id1 == id2
+
+
+def test_golden_corpus():
+    """Messages from the session logs, normalized by the original four-pass version"""
+    with open(GOLDEN_FILE, encoding="utf-8") as f:
+        corpus = json.load(f)
+    assert corpus
+    for case in corpus:
+        assert remove_ticker_content(case["content"]) == case["normalized"], case["content"]
+
+
+def test_matches_four_pass_version_on_random_input():
+    rng = random.Random(0)
+    alphabet = "AB1 ()\n\n+-.%%55x"
+    for _ in range(20000):
+        content = "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 25)))
+        assert remove_ticker_content(content) == legacy_remove_ticker_content(content), repr(content)
@@ -0,0 +1,70 @@
+import json
+
+from storage import JsonlMessageStore
+from ticker_mentions import FIRST, HIGH, LAST, LOW, MENTIONS, SAMPLES, MentionSeries, extract_batch, extract_mentions
+
+
+def test_extract_mentions_finds_embeds_cashtags_and_words():
+    mentions = extract_mentions("hawking\nRGTI\n+13.08%\nES1 (D)\n-0.12%\nand $bbai, BBAI at 9 AM")
+    assert mentions == [
+        ("embed", "RGTI", 13.08),
+        ("embed", "ES1", -0.12),
+        ("cashtag", "BBAI", None),
+        ("word", "BBAI", None),
+        ("word", "AM", None),
+    ]
+    # Matches never run across the messages of a batch
+    assert extract_batch(["ends with NVDA", "\n+1.5% is not an embed"]) == [(0, "word", "NVDA", None)]
+
+
+def test_series_counts_messages_per_minute_and_tracks_changes(make_msg):
+    series = MentionSeries()
+    series.update([
+        make_msg("RGTI is moving", "9:30 AM"),  # Counted, RGTI is embedded later in the batch
+        make_msg("RGTI\n+2.00%\nand RGTI again", "9:30 AM"),
+        make_msg("RGTI\n+3.50%", "9:30 AM"),
+        make_msg("RGTI\n+1.00%", "9:31 AM"),
+        make_msg("GM everyone, AM or PM", "9:31 AM"),
+    ])
+    minute = series.series["RGTI"]["2025-09-23T09:30"]
+    assert minute[MENTIONS] == 3 and minute[SAMPLES] == 2
+    assert (minute[FIRST], minute[LAST], minute[LOW], minute[HIGH]) == (2.0, 3.5, 2.0, 3.5)
+    assert series.totals() == {"RGTI": 4}
+
+
+def test_update_from_store_reads_only_new_records(tmp_path, make_msg):
+    store = JsonlMessageStore(str(tmp_path / "MASTER_LOG.jsonl"), sidecar=False)
+    store.append([make_msg("$OKLO up", "1:00 PM"), make_msg("OKLO\n+4.20%", "1:00 PM")])
+    store.flush()
+    state = str(tmp_path / "mentions.json")
+
+    series = MentionSeries()
+    assert series.update_from_store(store) == 2
+    series.save(state)
+
+    store.append([make_msg("OKLO again", "1:05 PM")])
+    store.flush()
+    series = MentionSeries.load(state)
+    assert series.update_from_store(store) == 1
+    assert [row[1:3] for row in series.rows("OKLO")] == [("2025-09-23T13:00", 2), ("2025-09-23T13:05", 1)]
+    store.close()
+
+
+def test_rewritten_log_resets_the_series_but_keeps_known_tickers(tmp_path, make_msg):
+    path = str(tmp_path / "MASTER_LOG.jsonl")
+    store = JsonlMessageStore(path, sidecar=False)
+    store.append([make_msg("NVDA and $OKLO", "1:00 PM")])
+    store.flush()
+    series = MentionSeries(known={"NVDA"})
+    series.update_from_store(store)
+    assert series.totals() == {"NVDA": 1, "OKLO": 1}
+    store.close()
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(make_msg("NVDA and OKLO, a longer line after compaction", "2:00 PM")) + "\n")
+    store = JsonlMessageStore(path, sidecar=False)
+    series.update_from_store(store)
+    # OKLO was only known from the old log; NVDA was passed in
+    assert series.totals() == {"NVDA": 1}
+    assert series.messages == 1
+    store.close()
@@ -0,0 +1,46 @@
+"""
+Shared ticker normalization for message IDs
+
+Godel renders ticker embeds in message text as the symbol, a newline and
+the live price change, e.g. "SPY\n+1.45%" or "ES1 (D)\n+0.04%". The price
+changes as the quote updates, so it is replaced with a placeholder before
+a message ID is built. Used by the scraper, the dedup tool and the tests so
+they all agree on what counts as the same message.
+"""
+import re
+from functools import lru_cache
+
+# A price change following either a ticker with a parenthesised suffix
+# ("VIX (D)", "ES1 (D)") or a plain upper-case ticker ("SPY", "US10Y").
+# One pass of this pattern gives the same result as the four separate
+# re.sub passes it replaces.
+_TICKER_PRICE = re.compile(
+    r'(?P<ticker>[A-Z0-9]+\s*\([^)]+\)|[A-Z])\n[+-]?\d+\.?\d*%'
+)
+
+# A parenthesised suffix can span a plain ticker embed, which the old
+# passes had already replaced before matching the suffix form
+_PLAIN_TICKER_PRICE = re.compile(r'([A-Z])\n[+-]?\d+\.?\d*%')
+
+PRICE_PLACEHOLDER = '[PRICE]'
+
+
+def _replace_price(match):
+    ticker = match.group('ticker')
+    if '\n' in ticker:
+        ticker = _PLAIN_TICKER_PRICE.sub(lambda m: f"{m.group(1)}\n{PRICE_PLACEHOLDER}%", ticker)
+    return f"{ticker}\n{PRICE_PLACEHOLDER}%"
+
+
+@lru_cache(maxsize=4096)
+def remove_ticker_content(content):
+    """
+    Remove ticker content (data between newline and percentage sign) from message
+    to create a stable message ID that won't change when prices update
+
+    Results are memoized, since the same content is normalized again for
+    every poll that sees it and for every reply that points at it.
+    """
+    if '\n' in content and '%' in content:
+        return _TICKER_PRICE.sub(_replace_price, content)
+    return content
@@ -0,0 +1,26 @@
+"""
+Reference data for checking ticker_normalizer
+
+Holds the original four-pass implementation that the single-pass
+normalizer has to match, and the location of the golden corpus built from
+the session logs. Used by test_ticker.py and bench_ticker.py.
+"""
+import os
+import re
+
+GOLDEN_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_ticker_golden.json")
+
+
+def legacy_remove_ticker_content(content):
+    """The original four-pass ChatScraper._remove_ticker_content"""
+    if '\n' in content and '%' in content:
+        pattern = r'([A-Z]+)\n[+-]?\d+\.?\d*%'
+        pattern_with_delay = r'([A-Z]+\s*\([A-Z]\))\n[+-]?\d+\.?\d*%'
+        pattern_futures = r'([A-Z0-9]+\s*\([A-Z]\))\n[+-]?\d+\.?\d*%'
+        pattern_any_parens = r'([A-Z0-9]+\s*\([^)]+\))\n[+-]?\d+\.?\d*%'
+        cleaned_content = re.sub(pattern, r'\1\n[PRICE]%', content)
+        cleaned_content = re.sub(pattern_with_delay, r'\1\n[PRICE]%', cleaned_content)
+        cleaned_content = re.sub(pattern_futures, r'\1\n[PRICE]%', cleaned_content)
+        cleaned_content = re.sub(pattern_any_parens, r'\1\n[PRICE]%', cleaned_content)
+        return cleaned_content
+    return content